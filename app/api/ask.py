@@ -4,40 +4,237 @@
 - FastAPI のルーティング（エンドポイント）を定義する。
 - /ask エンドポイントでユーザーの質問を受け取り、
   ベクトル検索 → Gemini回答生成 → 回答を返す、というRAGの流れを実行。
+- /ask/stream では同じ流れを Server-Sent Events で実行し、
+  根拠文書の情報 → 生成途中の回答テキスト の順に逐次送信する。
+- /ask/batch では複数の質問をまとめて受け取り、質問のベクトル化とベクトル検索を
+  まとめて1回で行ってから、回答生成を同時実行数の上限付きで並行に行う。
 """
 
+import asyncio
+import json
+import logging
+import time
+
 # FastAPIのルーティングを管理するためのクラス
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 # 入出力データ型（schema）を読み込み
-from app.models.schema import QuestionInput, AnswerResponse
+from app.models.schema import (
+    QuestionInput, AnswerResponse, SourceInfo, BatchQuestionInput, BatchAnswerResponse,
+)
 # ベクトル検索サービスをインポート（関連文書を探す）
-from app.services.search_service import search_related_docs
+from app.services.search_service import search_documents_async, search_documents_batch
 # 生成サービスをインポート（回答を生成する）
-from app.services.generate_service import generate_answer
+from app.services.generate_service import generate_answer_async, generate_answer_stream
+# 回答キャッシュ（同じ質問には検索・生成なしで答える）
+from app.services import answer_cache
+# 検索結果をトークン予算の範囲でプロンプト用に詰め直す
+from app.services.context_service import pack_context
+# 同時処理数の上限
+from app.core.concurrency import ask_semaphore, run_blocking
+from app.core.config import ASK_BATCH_MAX_QUESTIONS, ASK_BATCH_CONCURRENCY, EMBED_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
 
 # FastAPIのルーターインスタンスを作成
 router = APIRouter()
 
 # POSTリクエスト /ask を受け取るルートを定義
 @router.post("/ask", response_model=AnswerResponse)
-def ask_question(input: QuestionInput):
+async def ask_question(input: QuestionInput):
+    # 同時処理数の上限を超えた質問は空きが出るまで待機
+    async with ask_semaphore:
+        return await _answer_question(input)
+
+async def _answer_question(input: QuestionInput) -> dict:
     # ユーザーの質問内容をログに出力
-    print(f"\n検索クエリ: {input.question}")
+    logger.info("検索クエリ: %s", input.question)
     
-    # ベクトル検索：関連文書を取得
-    related_docs = search_related_docs(input.question)
+    # 同じ質問・同じコーパスでの回答があればそのまま返す
+    cache_key = answer_cache.make_key(input.question)
+    cached_answer = answer_cache.get(cache_key)
+    if cached_answer is not None:
+        logger.info("回答キャッシュにヒットしました")
+        return {"answer": cached_answer}
+    
+    # 検索：キーワード検索とベクトル検索を並行に実行して関連文書を取得
+    # （メタデータも受け取り、回答生成でプロンプトの選択に使う）
+    related_docs = await search_documents_async(input.question)
     
     # デバッグ用：検索結果を表示
-    print(f"検索結果: {len(related_docs)}件のドキュメントが見つかりました")
-    for i, doc in enumerate(related_docs):
-        print(f"------- ドキュメント {i+1} -------")
-        print(doc[:200] + "..." if len(doc) > 200 else doc)
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, doc in enumerate(related_docs):
+            text = doc["text"]
+            logger.debug("ドキュメント %d: %s", i + 1, text[:200] + "..." if len(text) > 200 else text)
+    
+    # 重なり・重複を除き、トークン予算の範囲で文脈に詰める
+    context_docs, context_stats = pack_context(related_docs)
+    logger.info("文脈: %s", context_stats)
     
     # Geminiで回答を生成
-    answer = generate_answer(related_docs, input.question)
+    answer = await generate_answer_async(context_docs, input.question)
     
     # 生成された回答をログに出力
-    print(f"生成された回答: {answer[:100]}...")
+    logger.debug("生成された回答: %s...", answer[:100])
+    
+    # 検索前のコーパスバージョンで保存する
+    answer_cache.put(cache_key, answer)
     
     # 回答を JSON として返す（FastAPIが自動的にJSONに変換）
-    return {"answer": answer}
+    return {"answer": answer, "context_tokens": context_stats["tokens"]}
+
+def _sse(event: str, data) -> str:
+    """Server-Sent Events の1イベント分の文字列を作る"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# POSTリクエスト /ask/stream を受け取るルートを定義
+@router.post("/ask/stream")
+async def ask_question_stream(input: QuestionInput):
+    """
+    回答を Server-Sent Events で逐次返す
+    
+    イベントの順序:
+      sources（根拠文書の情報と文脈の見積もりトークン数） → token（回答の断片、複数回） → done（回答全文）
+    途中で失敗した場合は error イベントを送って終了する。
+    """
+    return StreamingResponse(
+        _stream_answer(input),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _stream_answer(input: QuestionInput):
+    async with ask_semaphore:
+        logger.info("検索クエリ(ストリーミング): %s", input.question)
+        cache_key = answer_cache.make_key(input.question)
+        
+        try:
+            # 検索：プロンプトに入れる根拠文書の情報を最初のイベントとして送る
+            docs = await search_documents_async(input.question)
+            context_docs, context_stats = pack_context(docs)
+            sources = [
+                SourceInfo(
+                    filename=doc["metadata"].get("filename", ""),
+                    document_id=doc["metadata"].get("document_id", ""),
+                    score=doc["score"],
+                    content_type=doc["metadata"].get("content_type"),
+                ).model_dump()
+                for doc in context_docs
+            ]
+            yield _sse("sources", {"sources": sources, "context_tokens": context_stats["tokens"]})
+            
+            # 生成：モデルが出力した順に送る
+            parts = []
+            async for text in generate_answer_stream(context_docs, input.question):
+                parts.append(text)
+                yield _sse("token", {"text": text})
+        except Exception:
+            logger.exception("ストリーミング回答中にエラーが発生しました")
+            yield _sse("error", {"message": "回答の生成中にエラーが発生しました"})
+            return
+        
+        answer = "".join(parts).strip() or "回答を生成できませんでした。"
+        answer_cache.put(cache_key, answer)
+        yield _sse("done", {"answer": answer})
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+# POSTリクエスト /ask/batch を受け取るルートを定義
+@router.post("/ask/batch", response_model=BatchAnswerResponse)
+async def ask_question_batch(input: BatchQuestionInput):
+    """
+    複数の質問にまとめて回答する（夜間の評価・キャッシュの事前作成向け）
+    
+    - 回答キャッシュにある質問は検索・生成を行わない
+    - 正規化すると同じになる質問は1回だけ検索・生成し、同じ回答をそれぞれの位置に返す
+    - 残りの質問は EMBED_BATCH_SIZE 件ずつ、ベクトル化とベクトル検索を1回にまとめて行う
+    - 回答生成は ASK_BATCH_CONCURRENCY 件まで並行に行い、次のグループの検索と重ねる
+    - 結果は質問と同じ順に返す。1問の失敗は全体を止めず、その質問の error に入る
+    """
+    questions = [item.question for item in input.questions]
+    if len(questions) > ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度に送れる質問は {ASK_BATCH_MAX_QUESTIONS} 件までです"
+        )
+    logger.info("まとめて質問: %d件", len(questions))
+    
+    started = time.perf_counter()
+    answers = [None] * len(questions)
+    
+    # 回答キャッシュにある質問はそのまま返す。残りは同じキーの質問をまとめる（キー → 位置のリスト）
+    pending = {}
+    for i, question in enumerate(questions):
+        cache_key = answer_cache.make_key(question)
+        if cache_key in pending:
+            pending[cache_key][0].append(i)
+            continue
+        cached_answer = answer_cache.get(cache_key)
+        if cached_answer is not None:
+            answers[i] = {
+                "question": question, "answer": cached_answer, "cached": True,
+                "timings": {"total_ms": _elapsed_ms(started)},
+            }
+        else:
+            pending[cache_key] = ([i], question)
+    pending = [(indices, question, cache_key) for cache_key, (indices, question) in pending.items()]
+    
+    generate_semaphore = asyncio.Semaphore(max(1, ASK_BATCH_CONCURRENCY))
+    tasks = []
+    for start in range(0, len(pending), EMBED_BATCH_SIZE):
+        group = pending[start:start + EMBED_BATCH_SIZE]
+        
+        # 検索：グループ内の質問をまとめてベクトル化・検索する
+        search_started = time.perf_counter()
+        try:
+            docs_list = await run_blocking(search_documents_batch, [question for _, question, _ in group])
+        except Exception:
+            logger.exception("まとめて検索中にエラーが発生しました")
+            for indices, _, _ in group:
+                for i in indices:
+                    answers[i] = {
+                        "question": questions[i], "error": "関連文書の検索中にエラーが発生しました",
+                        "timings": {"total_ms": _elapsed_ms(started)},
+                    }
+            continue
+        search_ms = _elapsed_ms(search_started)
+        
+        # 生成：検索の終わった質問から並行に回答を生成する
+        for (indices, question, cache_key), docs in zip(group, docs_list):
+            tasks.append(asyncio.create_task(_generate_batch_answer(
+                answers, questions, indices, question, cache_key, docs, search_ms, started, generate_semaphore
+            )))
+    
+    await asyncio.gather(*tasks)
+    total_ms = _elapsed_ms(started)
+    logger.info("まとめて質問: %d件を %.0fms で処理しました", len(questions), total_ms)
+    return {"answers": answers, "total_ms": total_ms}
+
+async def _generate_batch_answer(
+    answers: list,
+    questions: list,
+    indices: list,
+    question: str,
+    cache_key,
+    docs: list,
+    search_ms: float,
+    started: float,
+    generate_semaphore: asyncio.Semaphore,
+):
+    """まとめて質問した1問分の回答を生成し、同じ質問のすべての位置（indices）に結果を入れる"""
+    context_docs, context_stats = pack_context(docs)
+    item = {"question": question, "context_tokens": context_stats["tokens"]}
+    async with generate_semaphore, ask_semaphore:
+        generate_started = time.perf_counter()
+        try:
+            answer = await generate_answer_async(context_docs, question)
+            answer_cache.put(cache_key, answer)
+            item["answer"] = answer
+        except Exception:
+            logger.exception("回答生成中にエラーが発生しました（%s）", question)
+            item["error"] = "回答の生成中にエラーが発生しました"
+        generate_ms = _elapsed_ms(generate_started)
+    item["timings"] = {"search_ms": search_ms, "generate_ms": generate_ms, "total_ms": _elapsed_ms(started)}
+    for i in indices:
+        answers[i] = {**item, "question": questions[i]}
@@ -0,0 +1,38 @@
+"""
+【cache.py の役割】
+-----------------------------------------------------
+- 検索・生成まわりのキャッシュの状態確認と破棄を行うエンドポイント
+"""
+
+from fastapi import APIRouter
+
+from app.core import embedding_cache
+from app.core.chromadb_client import get_corpus_version, bump_corpus_version
+from app.services import answer_cache
+from app.services.search_service import get_query_embedding_cache_stats
+
+router = APIRouter()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """
+    各キャッシュの件数とヒット/ミス数を返す
+    """
+    return {
+        "corpus_version": get_corpus_version(),
+        "answer": answer_cache.stats(),
+        "query_embedding": get_query_embedding_cache_stats(),
+        "embedding_store": embedding_cache.stats(),
+    }
+
+@router.delete("/cache/answers")
+async def flush_answer_cache():
+    """
+    回答キャッシュをすべて破棄する
+
+    回答キャッシュはワーカーごとに持つので、このワーカーの分を消すだけでなく
+    コーパスバージョンを進め、他のワーカー・プロセスのキャッシュ済みの回答も使われないようにする。
+    """
+    answer_cache.clear()
+    version = bump_corpus_version()
+    return {"message": "回答キャッシュを破棄しました", "corpus_version": version}
@@ -0,0 +1,20 @@
+"""
+【metrics.py の役割】
+-----------------------------------------------------
+- 処理段階ごとの所要時間のヒストグラムを Prometheus 形式で返すエンドポイント
+- Prometheus の慣例に合わせ、/api ではなく /metrics で公開する
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    段階ごとの所要時間（rag_stage_duration_seconds）を返す
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -2,18 +2,27 @@
 【upload.py の役割】
 -----------------------------------------------------
 - ファイルアップロードを処理するエンドポイント
-- アップロードされたファイルを保存し、ベクトルDBに登録
+- アップロードされたファイルを保存し、ベクトルDBへの登録ジョブを投入する
+  （登録はバックグラウンドで行い、進捗は /upload/jobs/{job_id} で確認する）
+- ファイルの内容はメモリに読み込まずに返す（FileResponse）。ETag / Last-Modified による
+  304 Not Modified と Range リクエストに対応し、/files/{filename}/chunks で登録済みチャンクも見られる
 """
 
 import os
 import shutil
-from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, PlainTextResponse
+from email.utils import parsedate_to_datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 
-from app.models.schema import DeleteFilesRequest, FileListResponse, FileInfoResponse
-from app.services.embed_service import embed_content
+from app.models.schema import (
+    DeleteFilesRequest, FileListResponse, FileInfoResponse, FileChunksResponse,
+    UploadResponse, IngestJobResponse, IngestJobListResponse,
+)
+from app.services import ingest_service
+from app.core import file_manifest
 
 router = APIRouter()
 
@@ -21,10 +30,52 @@ router = APIRouter()
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-@router.post("/upload")
+# ファイル一覧の1ページの件数（既定・上限）
+FILE_LIST_LIMIT = 100
+FILE_LIST_MAX_LIMIT = 1000
+
+# チャンク表示の1ページの件数（既定・上限）
+CHUNK_VIEW_LIMIT = 100
+CHUNK_VIEW_MAX_LIMIT = 1000
+
+# 記録の無いファイルをカタログへ追加したか（プロセスごとに最初の一覧取得で1回だけ）
+_catalog_checked = False
+
+def _upload_path(filename: str) -> Path:
+    """アップロードディレクトリ内のファイルのパス（無ければ 404）"""
+    file_path = UPLOAD_DIR / filename
+    if file_path.name != filename or not file_path.is_file():
+        raise HTTPException(
+            status_code=404,
+            detail=f"ファイル '{filename}' が見つかりません"
+        )
+    return file_path
+
+def _not_modified(request: Request, etag: str, last_modified: str) -> bool:
+    """条件付きリクエスト（If-None-Match / If-Modified-Since）に対して 304 を返せるか"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _save_upload(src, file_path: Path):
+    """アップロード内容を一時ファイルに書き出してから置き換える"""
+    tmp_path = file_path.with_name(f".{file_path.name}.uploading")
+    with tmp_path.open("wb") as f:
+        shutil.copyfileobj(src, f)
+    os.replace(tmp_path, file_path)
+
+@router.post("/upload", response_model=UploadResponse)
 async def upload_file(file: UploadFile = File(...)):
     """
-    テキストファイルをアップロードしてベクトルDBに保存
+    テキストファイルをアップロードし、ベクトルDBへの登録ジョブを投入する
     """
     # .txtファイルのみ受け付ける
     if not file.filename.endswith('.txt'):
@@ -33,61 +84,145 @@ async def upload_file(file: UploadFile = File(...)):
             detail="テキストファイル(.txt)のみアップロード可能です"
         )
     
+    # 登録待ちが上限に達している場合は受け付けない
+    if not ingest_service.has_capacity():
+        raise HTTPException(
+            status_code=503,
+            detail="登録処理が混み合っています。しばらくしてから再度アップロードしてください"
+        )
+    
     # ファイルパスを作成
     file_path = UPLOAD_DIR / file.filename
     
-    # 既に同名のファイルが存在する場合は上書き
-    if file_path.exists():
-        file_path.unlink()
-    
-    # ファイルを保存
-    with file_path.open("wb") as f:
-        shutil.copyfileobj(file.file, f)
+    # ファイルを保存（既に同名のファイルが存在する場合は上書き）
+    await run_in_threadpool(_save_upload, file.file, file_path)
+    file_manifest.mark_uploaded(file.filename, file_path.stat())
     
-    # ファイルの内容を読み込む
-    content = file_path.read_text(encoding="utf-8")
+    # ベクトルDBへの登録はバックグラウンドで行う
+    try:
+        job = ingest_service.submit(file_path)
+    except ingest_service.IngestQueueFullError as e:
+        file_manifest.set_status(file.filename, file_manifest.STATUS_FAILED, str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     
-    # ベクトルDBに保存
-    embed_content(content, file.filename)
-    
-    return {"message": f"ファイル '{file.filename}' がアップロードされ、ベクトルDBに登録されました"}
+    return {
+        "message": f"ファイル '{file.filename}' がアップロードされました。ベクトルDBへの登録を開始します",
+        "job_id": job["job_id"]
+    }
+
+@router.get("/upload/jobs", response_model=IngestJobListResponse)
+async def list_upload_jobs():
+    """
+    ベクトルDB登録ジョブの一覧を取得
+    """
+    return {"jobs": ingest_service.list_jobs()}
+
+@router.get("/upload/jobs/{job_id}", response_model=IngestJobResponse)
+async def get_upload_job(job_id: str):
+    """
+    ベクトルDB登録ジョブの状態と進捗（登録済みチャンク数 / 総チャンク数）を取得
+    """
+    job = ingest_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"ジョブ '{job_id}' が見つかりません"
+        )
+    return job
 
 @router.get("/files", response_model=FileListResponse)
-async def list_files():
+async def list_files(
+    limit: int = Query(FILE_LIST_LIMIT, ge=1, le=FILE_LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    sort: Literal["modified", "size", "name"] = "modified",
+    order: Literal["asc", "desc"] = "desc",
+    prefix: str = "",
+):
     """
-    アップロードされたファイル一覧を取得
+    アップロードされたファイル一覧を取得（既定は更新日時の新しい順）
+    
+    ファイルのカタログ（file_manifest）から1ページ分を返す。続きは next_cursor を
+    cursor に指定して取得する（sort・order・prefix は同じ値を指定すること）。
     """
-    files = []
-    for file_path in UPLOAD_DIR.glob("*.txt"):
-        size = file_path.stat().st_size
-        modified = file_path.stat().st_mtime
-        files.append({
-            "filename": file_path.name,
-            "size": size,
-            "modified": modified
-        })
-    
-    # 更新日時の新しい順にソート
-    files.sort(key=lambda x: x["modified"], reverse=True)
-    
-    return {"files": files}
-
-@router.get("/files/{filename}", response_class=PlainTextResponse)
-async def get_file_content(filename: str):
+    global _catalog_checked
+    if not _catalog_checked:
+        # カタログ導入前からあるファイルも一覧に出す
+        await run_in_threadpool(file_manifest.add_missing, UPLOAD_DIR)
+        _catalog_checked = True
+    
+    try:
+        records, next_cursor = await run_in_threadpool(
+            file_manifest.list_page, limit, cursor, sort, order == "desc", prefix
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    files = [
+        {
+            "filename": r["filename"],
+            "size": r["size"],
+            "modified": r["mtime"],
+            "chunks": r["chunks"],
+            "status": r["status"],
+            "error": r["error"],
+        }
+        for r in records
+    ]
+    return {"files": files, "next_cursor": next_cursor}
+
+@router.get("/files/{filename}", response_class=FileResponse)
+async def get_file_content(filename: str, request: Request):
     """
     指定されたファイルの内容を取得
+    
+    ファイルはメモリに読み込まずにそのまま送る（Range リクエストにも対応）。
+    ETag・Last-Modified はサイズと更新日時から作り、変わっていなければ 304 を返す。
     """
-    file_path = UPLOAD_DIR / filename
+    file_path = _upload_path(filename)
+    stat = await run_in_threadpool(file_path.stat)
+    
+    response = FileResponse(
+        file_path,
+        media_type="text/plain; charset=utf-8",
+        stat_result=stat,
+        # 同名のファイルが上書きされうるので、使う前に毎回 ETag で確認させる
+        headers={"Cache-Control": "no-cache"},
+    )
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+    if _not_modified(request, etag, last_modified):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "no-cache"},
+        )
+    return response
+
+@router.get("/files/{filename}/chunks", response_model=FileChunksResponse)
+async def get_file_chunks(
+    filename: str,
+    start: int = Query(0, ge=0),
+    limit: int = Query(CHUNK_VIEW_LIMIT, ge=1, le=CHUNK_VIEW_MAX_LIMIT),
+):
+    """
+    指定されたファイルの登録済みチャンクを取得（chunk_index が start から limit 個分）
     
-    if not file_path.exists():
+    続きは next_index を start に指定して取得する。
+    """
+    from app.services.embed_service import get_file_chunks as fetch_chunks
+    
+    record = await run_in_threadpool(file_manifest.get, filename)
+    if record is None and not (UPLOAD_DIR / filename).is_file():
         raise HTTPException(
             status_code=404,
             detail=f"ファイル '{filename}' が見つかりません"
         )
     
-    # ファイル内容を読み込んで返す
-    content = file_path.read_text(encoding="utf-8")
-    return content
+    chunks = await run_in_threadpool(fetch_chunks, filename, start, limit)
+    total = record["chunks"] if record and record["status"] == file_manifest.STATUS_COMPLETED else None
+    if total is not None:
+        next_index = start + limit if start + limit < total else None
+    else:
+        next_index = start + limit if chunks else None
+    return {"filename": filename, "chunks": chunks, "total_chunks": total, "next_index": next_index}
 
 @router.delete("/files", response_model=FileInfoResponse)
 async def delete_files(request: DeleteFilesRequest):
@@ -111,12 +246,9 @@ async def delete_files(request: DeleteFilesRequest):
             continue
         
         try:
-            # ファイルを削除
-            file_path.unlink()
-            
-            # ベクトルDBからも削除（これはサービス層で実装する必要があります）
-            from app.services.embed_service import delete_from_vectordb
-            delete_from_vectordb(filename)
+            # ファイルを削除し、ベクトルDBとカタログからも削除
+            # （登録中のジョブや書き込みロックを待つことがあるのでスレッドプールで実行）
+            await run_in_threadpool(ingest_service.delete_file, file_path)
             
             deleted_files.append(filename)
         except Exception as e:
@@ -0,0 +1,45 @@
+"""
+【chroma_server.py の役割】
+-----------------------------------------------------
+- VECTOR_DB_DIR を開く Chroma サーバーの起動と、稼働しているかの確認を行う。
+- run.py --prod（サーバーを起動してワーカーを接続させる）と reindex.py（稼働中のサーバーが
+  あればそこへ接続する）の両方から使う。ベクトルDBのクライアントは作らないので、
+  CHROMA_MODE を決める前に import してよい。
+"""
+
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+# Chroma サーバーの起動を待つ最大秒数
+CHROMA_STARTUP_TIMEOUT = 30
+
+
+def is_running(host: str, port: int) -> bool:
+    """host:port で Chroma サーバーが応答するか"""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/api/v2/heartbeat", timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def start(path: str, host: str, port: int) -> subprocess.Popen:
+    """VECTOR_DB_DIR を開く Chroma サーバーを子プロセスとして起動し、応答するまで待つ"""
+    os.makedirs(path, exist_ok=True)
+    command = [
+        sys.executable, "-c",
+        "import sys; from chromadb.cli.cli import app; sys.argv[0] = 'chroma'; app()",
+        "run", "--path", path, "--host", host, "--port", str(port),
+    ]
+    process = subprocess.Popen(command)
+    deadline = time.monotonic() + CHROMA_STARTUP_TIMEOUT
+    while not is_running(host, port):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.terminate()
+            raise RuntimeError(f"Chroma サーバーを起動できませんでした（{host}:{port}）")
+        time.sleep(0.2)
+    print(f"Chroma サーバーを起動しました: {host}:{port}（{path}）")
+    return process
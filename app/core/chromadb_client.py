@@ -6,22 +6,159 @@
     ・ベクトルの保存先（VECTOR_DB_DIR）を一元管理
     ・検索対象コレクション（VECTOR_COLLECTION_NAME）を共通利用
 - DBは shared_data/chroma_db にローカル永続化される。
-- 意味ベクトルの登録・検索のすべてはこの collection に対して行う。
+  CHROMA_MODE=http の場合は、同じディレクトリを開いた Chroma サーバーに接続する
+  （複数ワーカーで動かすときは、書き込みをサーバー1か所に集めるためこちらを使う）。
+- 意味ベクトルの登録・検索のすべては get_collection() が返す collection に対して行う。
+  （reindex.py による再構築後は、新しいコレクションに自動で切り替わる）
 """
 
+import os
+import threading
+import time
+
 import chromadb
 from chromadb.config import Settings
-from app.core.config import VECTOR_DB_DIR, VECTOR_COLLECTION_NAME
+from app.core.config import (
+    VECTOR_DB_DIR, VECTOR_COLLECTION_NAME, CHROMA_MODE, CHROMA_HOST, CHROMA_PORT,
+)
+
+def create_client():
+    """CHROMA_MODE に応じたクライアントを作る"""
+    settings = Settings(anonymized_telemetry=False)  # 使用状況の送信を無効化
+    if CHROMA_MODE == "embedded":
+        return chromadb.PersistentClient(
+            path=VECTOR_DB_DIR,  # ベクトルDBの保存先（.envで設定）
+            settings=settings
+        )
+    if CHROMA_MODE == "http":
+        return chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT, settings=settings)
+    raise ValueError(f"不明な CHROMA_MODE です: {CHROMA_MODE}（embedded / http）")
 
 # chromadbの初期化
-client = chromadb.PersistentClient(
-    path=VECTOR_DB_DIR,  # ベクトルDBの保存先（.envで設定）
-    settings=Settings(anonymized_telemetry=False)  # 使用状況の送信を無効化
-)
+client = create_client()
+
+# 現在検索に使っているコレクション名（reindex.py が新コレクションを構築し終えたときに切り替える）
+# 別プロセスからの切り替えも検知できるよう、ファイルに保存する。無ければ VECTOR_COLLECTION_NAME
+ACTIVE_COLLECTION_PATH = os.path.join(VECTOR_DB_DIR, "active_collection")
+
+_collection_lock = threading.Lock()
+_active_name_cache = (None, VECTOR_COLLECTION_NAME)  # (ファイルのmtime_ns, コレクション名)
+_collections = {}
+
+def get_active_collection_name() -> str:
+    """検索・登録の対象となるコレクション名を返す"""
+    global _active_name_cache
+    try:
+        mtime_ns = os.stat(ACTIVE_COLLECTION_PATH).st_mtime_ns
+    except OSError:
+        return VECTOR_COLLECTION_NAME
+    with _collection_lock:
+        if _active_name_cache[0] != mtime_ns:
+            try:
+                with open(ACTIVE_COLLECTION_PATH, encoding="utf-8") as f:
+                    name = f.read().strip() or VECTOR_COLLECTION_NAME
+            except OSError:
+                name = VECTOR_COLLECTION_NAME
+            _active_name_cache = (mtime_ns, name)
+        return _active_name_cache[1]
+
+def set_active_collection_name(name: str):
+    """検索・登録の対象コレクションを切り替える（一時ファイル経由で置き換え）"""
+    os.makedirs(VECTOR_DB_DIR, exist_ok=True)
+    tmp_path = f"{ACTIVE_COLLECTION_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(tmp_path, ACTIVE_COLLECTION_PATH)
+
+def get_collection(name: str = None):
+    """
+    コレクションを取得、無ければ自動作成
+    
+    name を省略すると現在検索に使っているコレクションを返す。
+    取得したコレクションはプロセス内で使い回す。
+    """
+    name = name or get_active_collection_name()
+    with _collection_lock:
+        collection = _collections.get(name)
+        if collection is None:
+            collection = _collections[name] = client.get_or_create_collection(name)
+        return collection
+
+def drop_collection(name: str):
+    """コレクションを削除する（存在しなければ何もしない）"""
+    with _collection_lock:
+        _collections.pop(name, None)
+    try:
+        client.delete_collection(name)
+    except Exception as e:
+        print(f"コレクション '{name}' の削除をスキップしました: {e}")
+
+# 検索対象のコレクションを取得、無ければ自動作成
+get_collection()
+
+# コーパスのバージョン（アップロード・削除・再インデックスのたびに増える）
+# reindex.py など別プロセスからの更新も検知できるよう、ファイルに保存する
+CORPUS_VERSION_PATH = os.path.join(VECTOR_DB_DIR, "corpus_version")
+
+_version_lock = threading.Lock()
+# (ファイルの (inode, mtime_ns), バージョン)。ファイルは置き換えで更新するので、
+# 更新日時の分解能内に続けて書き換えられても inode が変わり、読み直しが漏れない
+_version_cache = (None, 0)
+
+def get_corpus_version() -> int:
+    """現在のコーパスバージョンを返す（ファイルが変わっていなければ読み直さない）"""
+    global _version_cache
+    try:
+        stat = os.stat(CORPUS_VERSION_PATH)
+    except OSError:
+        return 0
+    key = (stat.st_ino, stat.st_mtime_ns)
+    with _version_lock:
+        if _version_cache[0] != key:
+            try:
+                with open(CORPUS_VERSION_PATH, encoding="utf-8") as f:
+                    version = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                version = 0
+            _version_cache = (key, version)
+        return _version_cache[1]
+
+def bump_corpus_version() -> int:
+    """コーパスバージョンを進める（前の値と現在時刻[ns]の大きい方 + 1）"""
+    global _version_cache
+    version = max(get_corpus_version(), time.time_ns()) + 1
+    os.makedirs(VECTOR_DB_DIR, exist_ok=True)
+    tmp_path = f"{CORPUS_VERSION_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(version))
+    # 置き換えても inode と更新日時は変わらないので、書いたファイルの stat でキャッシュしておく
+    stat = os.stat(tmp_path)
+    os.replace(tmp_path, CORPUS_VERSION_PATH)
+    with _version_lock:
+        _version_cache = ((stat.st_ino, stat.st_mtime_ns), version)
+    return version
+
+# コレクション統計のキャッシュ（コーパスバージョンが変わるまで使い回す）
+_stats_lock = threading.Lock()
+_stats_cache = None
 
-def get_collection():
-    """rag_docsコレクションを取得、無ければ自動作成"""
-    return client.get_or_create_collection(VECTOR_COLLECTION_NAME)
+def get_collection_stats() -> dict:
+    """
+    コレクションの統計情報（登録チャンク数とコーパスバージョン）を返す
+    
+    全件取得（collection.get()）ではなく count() を使い、
+    結果はコーパスバージョンが変わるまで使い回す。
+    """
+    global _stats_cache
+    version = get_corpus_version()
+    with _stats_lock:
+        if _stats_cache is None or _stats_cache["version"] != version:
+            _stats_cache = {"count": get_collection().count(), "version": version}
+        return dict(_stats_cache)
 
-# rag_docsを取得、無ければ自動作成
-collection = get_collection()
\ No newline at end of file
+def mark_corpus_changed():
+    """コレクションの内容が変わったときに呼び出し、バージョンを進めて統計キャッシュを破棄する"""
+    global _stats_cache
+    bump_corpus_version()
+    with _stats_lock:
+        _stats_cache = None
@@ -0,0 +1,33 @@
+"""
+【concurrency.py の役割】
+-----------------------------------------------------
+- 非同期エンドポイントからブロッキング処理（Chroma・SQLite・埋め込みAPI）を
+  呼び出すための、上限付きスレッドプールを提供する。
+- /ask の同時処理数を制限するセマフォもここで一元管理する。
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import BLOCKING_IO_WORKERS, ASK_MAX_CONCURRENCY
+
+# ブロッキング処理専用のスレッドプール（FastAPI既定のスレッドプールとは別枠）
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="rag-io")
+
+# 同時に処理する質問数の上限（超えた分は空きが出るまで待機する）
+ask_semaphore = asyncio.Semaphore(ASK_MAX_CONCURRENCY)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    ブロッキング関数をスレッドプールで実行し、結果を待つ
+    
+    呼び出し元のコンテキスト変数（リクエストごとの計測結果など）を引き継いで実行する。
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor, functools.partial(context.run, func, *args, **kwargs)
+    )
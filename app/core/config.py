@@ -17,13 +17,87 @@ LLM_GEN_MODEL = os.getenv("LLM_GEN_MODEL")
 VECTOR_DB_DIR = os.getenv("VECTOR_DB_DIR")
 VECTOR_COLLECTION_NAME = os.getenv("VECTOR_COLLECTION_NAME")
 
+# 埋め込みバックエンド（gemini: 埋め込みAPI / hashing: 文字n-gramハッシュでローカル計算）
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "gemini")
+# hashing バックエンドのベクトル次元数
+EMBED_HASH_DIM = int(os.getenv("EMBED_HASH_DIM", "1024"))
+
+# ベクトルDBへの接続方式
+#   embedded: このプロセス内で VECTOR_DB_DIR を直接開く（1プロセス向け。既定）
+#   http    : Chroma サーバー（CHROMA_HOST:CHROMA_PORT）に接続する（複数ワーカー向け）
+CHROMA_MODE = os.getenv("CHROMA_MODE", "embedded")
+CHROMA_HOST = os.getenv("CHROMA_HOST", "127.0.0.1")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8001"))
+
 # 必須項目のバリデーション
-for name, value in {
+required = {
     "LLM_API_KEY": LLM_API_KEY,
-    "LLM_EMBED_MODEL": LLM_EMBED_MODEL,
     "LLM_GEN_MODEL": LLM_GEN_MODEL,
     "VECTOR_DB_DIR": VECTOR_DB_DIR,
     "VECTOR_COLLECTION_NAME": VECTOR_COLLECTION_NAME,
-}.items():
+}
+# 埋め込みAPIを使う場合だけモデル名が必要
+if EMBED_BACKEND == "gemini":
+    required["LLM_EMBED_MODEL"] = LLM_EMBED_MODEL
+for name, value in required.items():
     if not value:
-        raise ValueError(f"{name} が .env に設定されていません。")
\ No newline at end of file
+        raise ValueError(f"{name} が .env に設定されていません。")
+
+# 埋め込みAPIに1リクエストでまとめて送るチャンク数（任意設定）
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+
+# 埋め込みキャッシュ（SQLite）に保持する最大件数（0でキャッシュ無効）
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+
+# 質問ベクトルのプロセス内LRUキャッシュ（件数上限・有効期限[秒]。0で無効/期限なし）
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1024"))
+QUERY_EMBED_CACHE_TTL = float(os.getenv("QUERY_EMBED_CACHE_TTL", "3600"))
+
+# 回答キャッシュ（質問 + コーパスバージョン単位）の件数上限と合計サイズ上限[バイト]
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# キーワード照合結果（キーワード → チャンクID集合）のプロセス内キャッシュの件数上限と合計サイズ上限[バイト]
+KEYWORD_MATCH_CACHE_SIZE = int(os.getenv("KEYWORD_MATCH_CACHE_SIZE", "256"))
+KEYWORD_MATCH_CACHE_MAX_BYTES = int(os.getenv("KEYWORD_MATCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# /ask の同時処理数の上限と、Chroma等のブロッキング処理に使うスレッド数
+ASK_MAX_CONCURRENCY = int(os.getenv("ASK_MAX_CONCURRENCY", "256"))
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "32"))
+
+# /ask/batch で1回に受け付ける質問数の上限と、回答生成の同時実行数
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "1000"))
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "8"))
+
+# バックグラウンド登録（/api/upload）の同時実行数と、待機できるジョブ数の上限
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "100"))
+
+# 回答生成のパラメータ（GEN_MAX_OUTPUT_TOKENS は0でモデルの既定値）
+GEN_TEMPERATURE = float(os.getenv("GEN_TEMPERATURE", "0.2"))
+GEN_TOP_P = float(os.getenv("GEN_TOP_P", "0.95"))
+GEN_TOP_K = int(os.getenv("GEN_TOP_K", "40"))
+GEN_MAX_OUTPUT_TOKENS = int(os.getenv("GEN_MAX_OUTPUT_TOKENS", "0"))
+
+# 回答生成のプロンプトに入れる関連文書の見積もりトークン数の上限（0で無制限）
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+# 関連文書の検索方式
+#   legacy: ファイル名・キーワード一致の点数とベクトル距離の点数を足し合わせる（従来どおり）
+#   hybrid: 文字バイグラムの BM25 とベクトル検索の順位を Reciprocal Rank Fusion で統合する
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "legacy")
+# Reciprocal Rank Fusion の定数 k（大きいほど下位の順位も効く）
+RRF_K = int(os.getenv("RRF_K", "60"))
+# ベクトル検索・BM25 で取り出す候補数（top_k の何倍か）
+SEARCH_CANDIDATE_FACTOR = int(os.getenv("SEARCH_CANDIDATE_FACTOR", "3"))
+# 検索結果に含める同じ文書のチャンク数の上限（0で無制限）
+MAX_CHUNKS_PER_DOCUMENT = int(os.getenv("MAX_CHUNKS_PER_DOCUMENT", "2"))
+
+# 埋め込みAPIのリクエスト数上限[回/分]（0で無制限。reindex.py は --rate で上書き可能）
+EMBED_RATE_LIMIT_PER_MIN = float(os.getenv("EMBED_RATE_LIMIT_PER_MIN", "0"))
+
+# run.py --prod で起動するワーカープロセス数（0でCPUコア数）
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "0"))
+
+# ログの出力レベル（DEBUG にすると検索結果の各文書やキーワード一致も出力する）
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -0,0 +1,125 @@
+"""
+【embedding_cache.py の役割】
+-----------------------------------------------------
+- 埋め込みベクトルをローカルディスク（SQLite）にキャッシュする。
+- キーは hash(モデル名, task_type, テキスト) なので、同じ内容のチャンクや
+  質問は再アップロード・再インデックス時でも埋め込みAPIを呼ばずに済む。
+- 件数が上限（EMBED_CACHE_MAX_ENTRIES）を超えたら、最終利用が古いものから削除する。
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from app.core.config import VECTOR_DB_DIR, EMBED_CACHE_MAX_ENTRIES
+
+# キャッシュの保存先（ベクトルDBと同じディレクトリに置く）
+CACHE_PATH = os.path.join(VECTOR_DB_DIR, "embedding_cache.sqlite3")
+
+# SQLiteのプレースホルダ数の上限に収まるよう、IN句は分割して発行する
+_SQL_BATCH = 500
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_approx_count = 0
+
+
+def enabled() -> bool:
+    return EMBED_CACHE_MAX_ENTRIES > 0
+
+
+def make_key(model: str, task_type: str, text: str) -> str:
+    """モデル名・タスク種別・テキストからキャッシュキーを作る"""
+    digest = hashlib.sha256()
+    for part in (model or "", task_type or "", text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn, _approx_count
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        conn.commit()
+        _approx_count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        _conn = conn
+    return _conn
+
+
+def get_many(keys: List[str]) -> Dict[str, List[float]]:
+    """キャッシュ済みのベクトルを返す（見つからないキーは含まれない）"""
+    if not enabled() or not keys:
+        return {}
+    found = {}
+    unique_keys = list(dict.fromkeys(keys))
+    with _lock:
+        conn = _connect()
+        now = time.time()
+        for start in range(0, len(unique_keys), _SQL_BATCH):
+            part = unique_keys[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(part))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+            if rows:
+                hit_keys = [key for key, _ in rows]
+                conn.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                    [now, *hit_keys],
+                )
+        conn.commit()
+    return found
+
+
+def put_many(items: Dict[str, List[float]]):
+    """ベクトルを保存し、上限を超えていれば古いものから削除する"""
+    global _approx_count
+    if not enabled() or not items:
+        return
+    with _lock:
+        conn = _connect()
+        now = time.time()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+        )
+        _approx_count += len(items)
+        if _approx_count > EMBED_CACHE_MAX_ENTRIES:
+            # 概算件数が上限を超えたときだけ正確に数え直して削除する
+            count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = count - EMBED_CACHE_MAX_ENTRIES
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                count -= overflow
+            _approx_count = count
+        conn.commit()
+
+
+def stats() -> dict:
+    """キャッシュの件数と上限"""
+    if not enabled():
+        return {"entries": 0, "max_entries": 0}
+    with _lock:
+        count = _connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    return {"entries": count, "max_entries": EMBED_CACHE_MAX_ENTRIES}
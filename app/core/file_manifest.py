@@ -0,0 +1,303 @@
+"""
+【file_manifest.py の役割】
+-----------------------------------------------------
+- uploads/ のファイルがベクトルDBにどの状態で登録されているかを記録する（SQLite）。
+- ファイル名ごとに サイズ・更新日時・内容のハッシュ・チャンク数 を持ち、
+  増分同期（reindex.py --sync）で追加・変更・削除されたファイルの検出に使う。
+- アップロード・削除・再インデックスのたびに更新される。
+- 登録の状態（status）も持ち、/api/files のファイル一覧（カタログ）としても使う。
+  一覧は更新日時・サイズ・ファイル名の索引を使い、カーソル（前ページの最後の行）から
+  続きを取り出すので、ファイル数が増えてもディレクトリを走査しない。
+"""
+
+import base64
+import codecs
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.config import VECTOR_DB_DIR
+
+# マニフェストの保存先
+MANIFEST_PATH = os.path.join(VECTOR_DB_DIR, "file_manifest.sqlite3")
+
+# ファイルを読み込むときの1回あたりのバイト数
+_READ_BLOCK_SIZE = 1024 * 1024
+
+# 登録の状態
+STATUS_QUEUED = "queued"          # アップロード済み・登録待ち
+STATUS_PROCESSING = "processing"  # 登録中
+STATUS_COMPLETED = "completed"    # 登録済み
+STATUS_FAILED = "failed"          # 登録に失敗
+STATUS_UNKNOWN = "unknown"        # 記録が無かったファイル（reindex.py --sync で登録し直す）
+
+# 一覧の並べ替えに使える項目 → 列名（いずれも (列, filename) の索引がある）
+SORT_COLUMNS = {"modified": "mtime", "size": "size", "name": "filename"}
+
+# 前方一致の上限に使う文字（どの文字よりも後ろに並ぶ）
+_MAX_CHAR = "\U0010ffff"
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+        conn = sqlite3.connect(MANIFEST_PATH, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " filename TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime REAL NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " chunks INTEGER NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'completed',"
+            " error TEXT)"
+        )
+        # 状態の列が無い以前の形式なら追加する（既存の記録はすべて登録済み）
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(files)")}
+        if "status" not in columns:
+            conn.execute("ALTER TABLE files ADD COLUMN status TEXT NOT NULL DEFAULT 'completed'")
+            conn.execute("ALTER TABLE files ADD COLUMN error TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime, filename)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_size ON files (size, filename)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def read_file(file_path: Path, block_size: int = _READ_BLOCK_SIZE) -> Tuple[os.stat_result, Any, Iterator[str]]:
+    """
+    ファイルの stat・内容のハッシュ・テキストを少しずつ読み出すイテレータを返す
+    
+    ファイル全体をメモリに載せずに済むよう、テキストは block_size バイトずつ読んで返す。
+    ハッシュは読み進めながら計算するので、hexdigest() はイテレータを最後まで
+    読み終えてから呼ぶこと（stat は読み込み前に取る）。
+    """
+    stat = file_path.stat()
+    digest = hashlib.sha256()
+    
+    def blocks() -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        with file_path.open("rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+                text = decoder.decode(block)
+                if text:
+                    yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+    
+    return stat, digest, blocks()
+
+
+def hash_file(file_path: Path) -> str:
+    """ファイル内容のハッシュ（大きなファイルも少しずつ読む）"""
+    digest = hashlib.sha256()
+    with file_path.open("rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def record(filename: str, stat: os.stat_result, sha256: str, chunks: int):
+    """ファイルの登録状態を記録する"""
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO files (filename, size, mtime, sha256, chunks, status, error)"
+            " VALUES (?, ?, ?, ?, ?, ?, NULL)",
+            (filename, stat.st_size, stat.st_mtime, sha256, chunks, STATUS_COMPLETED),
+        )
+        conn.commit()
+
+
+def mark_uploaded(filename: str, stat: os.stat_result):
+    """
+    アップロードされたファイルを登録待ちとして記録する
+
+    内容のハッシュは空にしておき、登録が終わらないまま残った場合も
+    増分同期で「変更あり」として登録し直されるようにする。
+    """
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT INTO files (filename, size, mtime, sha256, chunks, status, error)"
+            " VALUES (?, ?, ?, '', 0, ?, NULL)"
+            " ON CONFLICT (filename) DO UPDATE SET"
+            " size = excluded.size, mtime = excluded.mtime, sha256 = '',"
+            " status = excluded.status, error = NULL",
+            (filename, stat.st_size, stat.st_mtime, STATUS_QUEUED),
+        )
+        conn.commit()
+
+
+def set_status(filename: str, status: str, error: Optional[str] = None):
+    """登録の状態を更新する"""
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "UPDATE files SET status = ?, error = ? WHERE filename = ?",
+            (status, error, filename),
+        )
+        conn.commit()
+
+
+def add_missing(upload_dir: Path) -> int:
+    """
+    記録の無いファイルを状態不明として追加する（カタログ導入前からあるファイル向け）
+
+    Returns:
+        追加したファイル数
+    """
+    with _lock:
+        conn = _connect()
+        known = {row[0] for row in conn.execute("SELECT filename FROM files")}
+    rows = []
+    with os.scandir(upload_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".txt") and entry.is_file() and entry.name not in known:
+                stat = entry.stat()
+                rows.append((entry.name, stat.st_size, stat.st_mtime, STATUS_UNKNOWN))
+    if rows:
+        with _lock:
+            conn = _connect()
+            conn.executemany(
+                "INSERT OR IGNORE INTO files (filename, size, mtime, sha256, chunks, status)"
+                " VALUES (?, ?, ?, '', 0, ?)",
+                rows,
+            )
+            conn.commit()
+    return len(rows)
+
+
+def touch(filename: str, stat: os.stat_result):
+    """内容は同じで更新日時だけ変わったファイルの stat を更新する"""
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "UPDATE files SET size = ?, mtime = ? WHERE filename = ?",
+            (stat.st_size, stat.st_mtime, filename),
+        )
+        conn.commit()
+
+
+def remove(filename: str):
+    """ファイルの記録を削除する"""
+    with _lock:
+        conn = _connect()
+        conn.execute("DELETE FROM files WHERE filename = ?", (filename,))
+        conn.commit()
+
+
+def merge(entries: Dict[str, dict], removed: Iterable[str] = ()):
+    """
+    記録をまとめて反映する（再インデックス完了時）
+
+    entries のファイルは登録済みとして記録し直し、removed のファイルの記録は削除する。
+    それ以外のファイルの記録（切り替えと並行して処理中のアップロードなど）はそのまま残す。
+    """
+    with _lock:
+        conn = _connect()
+        conn.executemany(
+            "INSERT OR REPLACE INTO files (filename, size, mtime, sha256, chunks, status, error)"
+            " VALUES (?, ?, ?, ?, ?, ?, NULL)",
+            [
+                (name, e["size"], e["mtime"], e["sha256"], e["chunks"], STATUS_COMPLETED)
+                for name, e in entries.items()
+            ],
+        )
+        conn.executemany("DELETE FROM files WHERE filename = ?", [(name,) for name in removed])
+        conn.commit()
+
+
+def get(filename: str) -> Optional[dict]:
+    """ファイルの記録（無ければ None）"""
+    with _lock:
+        row = _connect().execute("SELECT * FROM files WHERE filename = ?", (filename,)).fetchone()
+    return dict(row) if row else None
+
+
+def get_all() -> Dict[str, dict]:
+    """ファイル名 → 記録 の辞書"""
+    with _lock:
+        rows = _connect().execute("SELECT * FROM files").fetchall()
+    return {row["filename"]: dict(row) for row in rows}
+
+
+def _encode_cursor(value, filename: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, filename]).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        value, filename = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("カーソルの形式が正しくありません")
+    return value, filename
+
+
+def list_page(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: str = "modified",
+    descending: bool = True,
+    prefix: str = "",
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    ファイルの記録を1ページ分返す
+
+    Args:
+        limit: 1ページの件数
+        cursor: 前のページの next_cursor（省略時は先頭から）
+        sort: 並べ替えの項目（modified / size / name）。同じ値の中はファイル名順
+        descending: 降順にする
+        prefix: ファイル名の前方一致で絞り込む
+
+    Returns:
+        (記録のリスト, 次のページのカーソル。最後のページなら None)
+
+    Raises:
+        ValueError: sort や cursor が正しくない場合
+    """
+    column = SORT_COLUMNS.get(sort)
+    if column is None:
+        raise ValueError(f"並べ替えの項目が正しくありません: {sort}（{' / '.join(SORT_COLUMNS)}）")
+    direction = "DESC" if descending else "ASC"
+    keys = ("filename",) if column == "filename" else (column, "filename")
+
+    conditions, params = [], []
+    if prefix:
+        conditions.append("filename >= ? AND filename < ?")
+        params += [prefix, prefix + _MAX_CHAR]
+    if cursor:
+        value, filename = _decode_cursor(cursor)
+        after = (filename,) if column == "filename" else (value, filename)
+        conditions.append(
+            f"({', '.join(keys)}) {'<' if descending else '>'} ({', '.join('?' * len(keys))})"
+        )
+        params += after
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    order = ", ".join(f"{key} {direction}" for key in keys)
+
+    with _lock:
+        rows = _connect().execute(
+            f"SELECT filename, size, mtime, chunks, status, error FROM files {where}"
+            f"ORDER BY {order} LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+    records = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = records[-1]
+        next_cursor = _encode_cursor(last[column], last["filename"])
+    return records, next_cursor
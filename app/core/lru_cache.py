@@ -0,0 +1,90 @@
+"""
+【lru_cache.py の役割】
+-----------------------------------------------------
+- プロセス内で使う、スレッドセーフなLRUキャッシュ。
+- 件数上限・合計サイズ上限・有効期限（TTL）を持ち、ヒット/ミス数を記録する。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """件数上限・サイズ上限・TTL付きのLRUキャッシュ"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float = 0,
+        max_bytes: int = 0,
+        sizeof: Optional[Callable[[Hashable, Any], int]] = None,
+    ):
+        # max_entries が0以下ならキャッシュしない。ttl・max_bytes が0以下なら制限なし
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda key, value: 0)
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """値を返す。無い・期限切れの場合は None"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        """値を保存し、上限を超えた分は古いものから捨てる"""
+        if self.max_entries <= 0:
+            return
+        size = self._sizeof(key, value)
+        if self.max_bytes > 0 and size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._discard(key)
+            self._items[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._items) > self.max_entries or (
+                self.max_bytes > 0 and self._bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._items.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def _discard(self, key: Hashable):
+        entry = self._items.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def clear(self):
+        """すべてのエントリを削除する（統計はそのまま）"""
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """件数とヒット/ミス数"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,150 @@
+"""
+【metrics.py の役割】
+-----------------------------------------------------
+- /ask の処理段階（質問の正規化、ファイル名検索、質問のベクトル化、Chroma検索、
+  結果の統合、プロンプト作成、回答生成など）ごとの所要時間を計測する。
+- 計測値は段階ごとのヒストグラムに集計し、/metrics で Prometheus 形式で公開する。
+- 1リクエスト内で計測した時間は Server-Timing レスポンスヘッダーにも載せる
+  （ServerTimingMiddleware。ストリーミング応答ではヘッダー送信時点までの分だけ）。
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# ヒストグラムのバケット上限[秒]
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """所要時間の累積ヒストグラム（スレッドセーフ）"""
+
+    def __init__(self, buckets: Tuple[float, ...] = _BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # 最後は +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+
+_lock = threading.Lock()
+_histograms: Dict[str, Histogram] = {}
+
+# リクエストごとの計測結果（段階名, 秒）。ServerTimingMiddleware がリクエストの開始時に用意する
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def _histogram(stage: str) -> Histogram:
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(stage, Histogram())
+    return histogram
+
+
+def observe(stage: str, seconds: float):
+    """段階の所要時間を記録する"""
+    _histogram(stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    """with ブロックの所要時間を stage の時間として記録する（例外で抜けた場合も記録する）"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def render_prometheus() -> str:
+    """全段階のヒストグラムを Prometheus のテキスト形式で返す"""
+    lines = [
+        "# HELP rag_stage_duration_seconds Time spent in each stage of the RAG pipeline.",
+        "# TYPE rag_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        stages = sorted(_histograms.items())
+    for stage, histogram in stages:
+        counts, count, total = histogram.snapshot()
+        cumulative = 0
+        for upper, bucket_count in zip(histogram.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if upper == float("inf") else repr(upper)
+            lines.append(f'rag_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'rag_stage_duration_seconds_sum{{stage="{stage}"}} {total}')
+        lines.append(f'rag_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def stage_stats() -> Dict[str, dict]:
+    """段階ごとの計測回数（count）と合計秒数（sum）"""
+    with _lock:
+        stages = sorted(_histograms.items())
+    stats = {}
+    for stage, histogram in stages:
+        _, count, total = histogram.snapshot()
+        stats[stage] = {"count": count, "sum": total}
+    return stats
+
+
+def reset():
+    """計測値をすべて破棄する"""
+    with _lock:
+        _histograms.clear()
+
+
+def _server_timing(timings: List[Tuple[str, float]]) -> str:
+    """段階ごとの合計時間を Server-Timing ヘッダーの値にする（記録順、ミリ秒）"""
+    totals: Dict[str, float] = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+class ServerTimingMiddleware:
+    """リクエスト内で計測した時間を Server-Timing ヘッダーとして返す ASGI ミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                value = _server_timing(timings + [("total", time.perf_counter() - started)])
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", value.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
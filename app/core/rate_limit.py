@@ -0,0 +1,35 @@
+"""
+【rate_limit.py の役割】
+-----------------------------------------------------
+- 外部API（埋め込みAPIなど）の呼び出し頻度を制限するトークンバケット。
+- 複数スレッドから共有でき、トークンが足りないときは補充されるまで待機する。
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """1分あたり rate_per_min 回まで（最大 burst 回の連続呼び出し可）に制限する"""
+
+    def __init__(self, rate_per_min: float, burst: int = 1):
+        self.rate_per_sec = rate_per_min / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """トークンを消費する。足りなければ補充されるまで待つ"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate_per_sec
+                )
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate_per_sec
+            time.sleep(wait)
@@ -0,0 +1,93 @@
+"""
+【write_lock.py の役割】
+-----------------------------------------------------
+- 検索対象のベクトルDB・キーワードインデックス・コーパスバージョンへの書き込みを、
+  プロセスをまたいで同時に1つだけにするロック（VECTOR_DB_DIR 配下のファイルロック）。
+- 複数ワーカー（run.py --prod）や reindex.py が同時にアップロード・削除・切り替えを行っても、
+  ベクトルDBとキーワードインデックスの更新が食い違わないようにする。
+- 検索（読み込み）はロックを取らない。キーワードインデックスは SQLite なので、
+  他プロセスの書き込みはコミットされた時点でそのまま見える。
+- 同じファイル名の登録ジョブと削除を1つずつ行うための、ファイル名ごとのロック（file_lock）も提供する。
+"""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from app.core.config import VECTOR_DB_DIR
+
+# ロックファイル（中身は使わない）
+LOCK_PATH = os.path.join(VECTOR_DB_DIR, "write.lock")
+
+# ファイル名ごとのロックファイルを置くディレクトリ
+FILE_LOCK_DIR = os.path.join(VECTOR_DB_DIR, "file_locks")
+
+# 同じスレッドからの入れ子の取得を許すため、取得済みかをスレッドごとに持つ
+_local = threading.local()
+
+
+def _acquire(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    # msvcrt.locking は約10秒で諦めて OSError になるので、取れるまで繰り返す
+    while True:
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _release(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def write_lock():
+    """
+    書き込みの間、他のスレッド・プロセスの書き込みを待たせる
+
+    同じスレッドの中では入れ子にしてよい（外側で取得済みならそのまま通す）。
+    """
+    if getattr(_local, "held", False):
+        yield
+        return
+    os.makedirs(VECTOR_DB_DIR, exist_ok=True)
+    with open(LOCK_PATH, "a+b") as f:
+        _acquire(f)
+        _local.held = True
+        try:
+            yield
+        finally:
+            _local.held = False
+            _release(f)
+
+
+@contextmanager
+def file_lock(filename: str):
+    """
+    同じファイル名の登録・削除を、スレッド・プロセスをまたいで1つずつ行う
+
+    write_lock より先に取ること（write_lock を持ったまま待たない）。入れ子にはできない。
+    """
+    os.makedirs(FILE_LOCK_DIR, exist_ok=True)
+    digest = hashlib.sha256(filename.encode("utf-8")).hexdigest()[:32]
+    with open(os.path.join(FILE_LOCK_DIR, f"{digest}.lock"), "a+b") as f:
+        _acquire(f)
+        try:
+            yield
+        finally:
+            _release(f)
@@ -4,13 +4,27 @@
 - FastAPIアプリ本体を起動するエントリーポイント。
 - ルーティング（api/ask.pyで定義したAPI）をこのアプリに統合する。
 - uvicornでこのファイルを実行することで、サーバーが起動する。
+- ログの出力レベル（LOG_LEVEL）の設定と、処理段階ごとの所要時間の計測
+  （/metrics と Server-Timing ヘッダー）もここで有効にする。
 """
 
+import logging
+
 # FastAPI本体のクラスをインポート（Webアプリの土台）
 from fastapi import FastAPI
+from app.core.config import LOG_LEVEL
+from app.core.metrics import ServerTimingMiddleware
 # api/ask.py で定義したルーター（/askエンドポイント）を読み込む
 from app.api.ask import router as ask_router
 from app.api.upload import router as upload_router
+from app.api.cache import router as cache_router
+from app.api.metrics import router as metrics_router
+
+# ログの出力形式とレベル（DEBUG で検索結果の詳細も出力する）
+logging.basicConfig(
+    level=LOG_LEVEL,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
 
 # FastAPIアプリケーションのインスタンスを作成
 app = FastAPI(
@@ -19,6 +33,13 @@ app = FastAPI(
     version="1.0.0"                                 # バージョン表記
 )
 
-# /api/ask と /api/upload を有効にする
+# /api/ask と /api/upload、/api/cache を有効にする
 app.include_router(ask_router, prefix="/api")
-app.include_router(upload_router, prefix="/api")
\ No newline at end of file
+app.include_router(upload_router, prefix="/api")
+app.include_router(cache_router, prefix="/api")
+
+# 処理段階ごとの所要時間（Prometheus形式）は /metrics で公開する
+app.include_router(metrics_router)
+
+# リクエスト内で計測した時間を Server-Timing ヘッダーで返す
+app.add_middleware(ServerTimingMiddleware)
@@ -13,19 +13,90 @@ from pydantic import BaseModel
 class QuestionInput(BaseModel):
     question: str
 
-# 返答形式定義
+# 返答形式定義（context_tokens はプロンプトに入れた関連文書の見積もりトークン数。キャッシュから返した場合は None）
 class AnswerResponse(BaseModel):
     answer: str
+    context_tokens: Optional[int] = None
+
+# まとめて質問する入力（/ask/batch）
+class BatchQuestionInput(BaseModel):
+    questions: List[QuestionInput]
+
+# 質問ごとの処理時間[ミリ秒]（search_ms はまとめて検索した時間で、同じグループの質問で共通）
+class AnswerTimings(BaseModel):
+    search_ms: float = 0.0
+    generate_ms: float = 0.0
+    total_ms: float = 0.0
+
+# まとめて質問したときの1問分の結果（失敗した質問は error に理由が入る）
+class BatchAnswerItem(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+    context_tokens: Optional[int] = None
+    timings: AnswerTimings
+
+# まとめて質問したときの返答形式
+class BatchAnswerResponse(BaseModel):
+    answers: List[BatchAnswerItem]
+    total_ms: float
+
+# 回答の根拠となった文書の情報（ストリーミング回答の最初に送る）
+class SourceInfo(BaseModel):
+    filename: str
+    document_id: str
+    score: float
+    content_type: Optional[str] = None
+
+# アップロード受付レスポンス
+class UploadResponse(BaseModel):
+    message: str
+    job_id: str
+
+# ベクトルDB登録ジョブの状態（status: queued / processing / completed / failed）
+# chunks_total は完了までファイルサイズからの見積もり
+class IngestJobResponse(BaseModel):
+    job_id: str
+    filename: str
+    status: str
+    chunks_embedded: int
+    chunks_total: int
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+# 登録ジョブ一覧レスポンス
+class IngestJobListResponse(BaseModel):
+    jobs: List[IngestJobResponse]
 
 # ファイル情報
 class FileInfo(BaseModel):
     filename: str
     size: int
     modified: float
+    chunks: Optional[int] = None
+    status: Optional[str] = None  # queued / processing / completed / failed / unknown
+    error: Optional[str] = None
 
 # ファイル一覧レスポンス
 class FileListResponse(BaseModel):
     files: List[FileInfo]
+    next_cursor: Optional[str] = None  # 次のページの取得に使う（最後のページなら None）
+
+# 登録済みチャンク
+class FileChunk(BaseModel):
+    chunk_id: str
+    chunk_index: int
+    content_type: Optional[str] = None
+    text: str
+
+# ファイルのチャンク一覧レスポンス
+class FileChunksResponse(BaseModel):
+    filename: str
+    chunks: List[FileChunk]
+    total_chunks: Optional[int] = None  # 登録時のチャンク数（記録が無ければ None）
+    next_index: Optional[int] = None    # 次のページの start（最後のページなら None）
 
 # ファイル削除リクエスト
 class DeleteFilesRequest(BaseModel):
@@ -0,0 +1,52 @@
+"""
+【answer_cache.py の役割】
+-----------------------------------------------------
+- 同じ質問に対する回答を、検索・生成を行わずに返すためのキャッシュ。
+- キーは（正規化した質問, コーパスバージョン）。アップロード・削除・再インデックスで
+  バージョンが進むため、古いコーパスに基づく回答が返ることはない。
+- 件数と合計バイト数の両方で上限を設け、超えた分は古いものから捨てる。
+"""
+
+from typing import Optional, Tuple
+
+from app.core.config import ANSWER_CACHE_SIZE, ANSWER_CACHE_MAX_BYTES
+from app.core.chromadb_client import get_corpus_version
+from app.core.lru_cache import LRUCache
+from app.services.search_service import normalize_question
+
+
+def _sizeof(key: Tuple[str, int], answer: str) -> int:
+    return len(key[0].encode("utf-8")) + len(answer.encode("utf-8"))
+
+
+_cache = LRUCache(ANSWER_CACHE_SIZE, max_bytes=ANSWER_CACHE_MAX_BYTES, sizeof=_sizeof)
+
+
+def make_key(question: str) -> Tuple[str, int]:
+    """質問と現在のコーパスバージョンからキーを作る"""
+    return (normalize_question(question), get_corpus_version())
+
+
+def get(key: Tuple[str, int]) -> Optional[str]:
+    """キャッシュ済みの回答（無ければ None）"""
+    return _cache.get(key)
+
+
+def put(key: Tuple[str, int], answer: str):
+    """
+    回答を保存する
+    
+    キーは検索前に make_key() で取っておいたものを渡す。処理中にコーパスが
+    更新されても古いバージョンのキーで保存されるため、新しいコーパスでは使われない。
+    """
+    _cache.put(key, answer)
+
+
+def clear():
+    """すべての回答を破棄する"""
+    _cache.clear()
+
+
+def stats() -> dict:
+    """件数・バイト数とヒット/ミス数"""
+    return _cache.stats()
@@ -0,0 +1,130 @@
+"""
+【context_service.py の役割】
+-----------------------------------------------------
+- 検索結果（関連文書）を、回答生成のプロンプトに入れる「文脈」に詰め直す。
+- 文書のトークン数を見積もり、スコア順に CONTEXT_TOKEN_BUDGET の範囲で詰める
+  （入りきらない文書は途中で切るか、あきらめる）。
+- 同じ文書の隣り合うチャンクが重なっている部分（チャンク分割時の重なり）や、
+  まったく同じ内容のチャンクは取り除き、同じ文章を二度送らないようにする。
+"""
+
+from app.core import metrics
+from app.core.config import CONTEXT_TOKEN_BUDGET
+from app.services.embed_service import CHUNK_OVERLAP
+
+# 重なりとみなす最短の文字数（短い一致は偶然の可能性が高いので取り除かない）
+_MIN_OVERLAP = 10
+
+# 途中で切ってでも入れる文書の最小トークン数（残りがこれ未満なら入れない）
+_MIN_TRUNCATED_TOKENS = 64
+
+# 途中で切った文書の末尾に付ける印
+_TRUNCATED_MARK = "…"
+
+# プロンプト内で文書どうしをつなぐ区切り（generate_service.build_prompt と同じ）
+_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのトークン数を見積もる
+
+    日本語などの非ASCII文字は1文字1トークン、ASCII文字は4文字1トークンとして数える
+    （実際のトークナイザーより多めに見積もる）。
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return len(text) - ascii_chars + (ascii_chars + 3) // 4
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """見積もりトークン数が max_tokens に収まるよう、末尾を切る"""
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) + 1 <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + _TRUNCATED_MARK
+
+
+def _remove_overlap(text: str, others: list) -> str:
+    """同じ文書の採用済みチャンクと重なる先頭・末尾の部分を取り除く"""
+    limit = CHUNK_OVERLAP + _MIN_OVERLAP
+    for other in others:
+        for size in range(min(limit, len(text), len(other)), _MIN_OVERLAP - 1, -1):
+            # 直前のチャンクの末尾が、このチャンクの先頭に重なっている
+            if other.endswith(text[:size]):
+                text = text[size:]
+                break
+            # このチャンクの末尾が、直後のチャンクの先頭に重なっている
+            if other.startswith(text[-size:]):
+                text = text[:-size]
+                break
+    return text.strip()
+
+
+def pack_context(docs: list, budget: int = CONTEXT_TOKEN_BUDGET) -> tuple:
+    """
+    スコア順の検索結果をトークン予算の範囲で詰め直す
+
+    Args:
+        docs: 検索結果（text・metadata・score を持つ辞書）のリスト（スコア順）
+        budget: 文脈に使うトークン数の上限（0以下で無制限）
+
+    Returns:
+        (詰め直した検索結果のリスト, 集計) のタプル。集計は
+        tokens（見積もりトークン数）・documents（採用した文書数）・
+        dropped（予算不足で外した文書数）・duplicates（重複で外した文書数）・
+        overlap_chars（取り除いた重なりの文字数）・truncated（途中で切った文書数）
+    """
+    with metrics.span("context_pack"):
+        return _pack(docs, budget)
+
+
+def _pack(docs: list, budget: int) -> tuple:
+    packed = []
+    used = 0
+    stats = {"tokens": 0, "documents": 0, "dropped": 0, "duplicates": 0,
+             "overlap_chars": 0, "truncated": 0}
+    # 文書ID → 採用済みチャンクの本文（重なりの判定用）と、採用済みの本文の集合
+    included = {}
+    seen_texts = set()
+
+    for doc in docs:
+        text = doc["text"]
+        metadata = doc.get("metadata", {})
+        document_id = metadata.get("document_id", "")
+        same_document = included.get(document_id, [])
+
+        # 採用済みの文章に含まれるチャンクは送らない
+        if text in seen_texts or any(text in other for other in same_document):
+            stats["duplicates"] += 1
+            continue
+        if metadata.get("content_type") != "qa_pair":
+            trimmed = _remove_overlap(text, same_document)
+            stats["overlap_chars"] += len(text) - len(trimmed)
+            text = trimmed
+        if not text:
+            stats["duplicates"] += 1
+            continue
+
+        separator_tokens = estimate_tokens(_SEPARATOR) if packed else 0
+        tokens = estimate_tokens(text) + separator_tokens
+        if budget > 0 and used + tokens > budget:
+            remaining = budget - used - separator_tokens
+            if remaining < _MIN_TRUNCATED_TOKENS:
+                stats["dropped"] += 1
+                continue
+            text = _truncate(text, remaining)
+            tokens = estimate_tokens(text) + separator_tokens
+            stats["truncated"] += 1
+
+        used += tokens
+        seen_texts.add(doc["text"])
+        included.setdefault(document_id, []).append(doc["text"])
+        packed.append({**doc, "text": text})
+
+    stats["tokens"] = used
+    stats["documents"] = len(packed)
+    return packed, stats
@@ -5,169 +5,526 @@
 - ベクトルDBからドキュメントを削除する
 """
 
+import hashlib
+import itertools
 import os
 import re
-from typing import List, Dict, Tuple
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 # ベクトルDBクライアント
-from app.core.chromadb_client import collection
-# Google AI APIの設定
-from app.core.config import LLM_EMBED_MODEL
-import google.generativeai as genai
+from app.core.chromadb_client import get_collection, mark_corpus_changed
+from app.core.write_lock import write_lock
+# キーワード検索用の転置インデックス
+from app.services import keyword_index
+# 埋め込みの設定
+from app.core.config import EMBED_BATCH_SIZE, EMBED_RATE_LIMIT_PER_MIN
+# 埋め込みAPIの呼び出し頻度制限
+from app.core.rate_limit import TokenBucket
+# 埋め込みベクトルのディスクキャッシュ
+from app.core import embedding_cache
+# 埋め込みバックエンド（Gemini API / ローカル）
+from app.services.embedder import get_embedder
 
 # チャンクサイズの設定
 MAX_CHUNK_SIZE = 400
 CHUNK_OVERLAP = 50
 
+# 改行の無い行をこの文字数ごとに区切って読む
+_MAX_LINE_LENGTH = 64 * 1024
+
+class StaleContentError(Exception):
+    """登録中に元のファイルが変更・削除された（無くなったチャンクの削除はしていない）"""
+
+# 埋め込みAPIのリクエスト数制限（None なら無制限）
+_rate_limiter = TokenBucket(EMBED_RATE_LIMIT_PER_MIN) if EMBED_RATE_LIMIT_PER_MIN > 0 else None
+
+def set_embed_rate_limit(requests_per_min: float, burst: int = 1):
+    """埋め込みAPIのリクエスト数を1分あたり requests_per_min 回に制限する（0以下で無制限）"""
+    global _rate_limiter
+    _rate_limiter = TokenBucket(requests_per_min, burst) if requests_per_min > 0 else None
+
+# QA形式の行頭パターン（1行ずつ照合するのでDOTALLや複数行にまたがる検索は使わない）
+_QUESTION_LINE = re.compile(r'^\s*(?:###\s*)?(?:Q\d*|質問\d*|問)\s*[:：]\s*(.*)$')   # Q1: / 質問: / ### Q: / 問:
+_ANSWER_LINE = re.compile(r'^\s*(?:A\d*|回答\d*|答)\s*[:：]\s*(.*)$')                # A1: / 回答: / 答:
+_SEPARATOR_LINE = re.compile(r'^\s*---\s*$')                                      # QAの区切り線
+
 def detect_qa_format(text: str) -> bool:
-    """テキストがQA形式かどうかを検出する"""
-    # QA形式の可能性が高いパターン
-    qa_patterns = [
-        r'Q\d*[:：].*\nA\d*[:：]',  # Q1: ... A1:
-        r'Q[:：].*\nA[:：]',        # Q: ... A:
-        r'質問\d*[:：].*\n回答\d*[:：]',  # 質問1: ... 回答1:
-        r'質問[:：].*\n回答[:：]',        # 質問: ... 回答:
-        r'^\s*問[:：].*\n\s*答[:：]',     # 問: ... 答:
-        r'###\s*Q[:：].*\nA[:：]',       # ### Q: ... A:
-        r'申請方法|アクセス|方法|利用|手続き|手順|ガイド|フロー', # 社内手続き関連キーワード
-    ]
-    
-    for pattern in qa_patterns:
-        if re.search(pattern, text, re.MULTILINE):
+    """テキストがQA形式か（質問行の後に回答行が現れるか）を検出する"""
+    seen_question = False
+    for line in text.splitlines():
+        if _QUESTION_LINE.match(line):
+            seen_question = True
+        elif seen_question and _ANSWER_LINE.match(line):
             return True
-    
     return False
 
-def split_qa_into_chunks(text: str) -> List[Dict]:
-    """QA形式のテキストを質問と回答のペアごとにチャンク化する"""
-    # 異なるQAの区切り記号を検出（---などの区切り線）
-    sections = re.split(r'\n---\n', text)
-    chunks = []
+def _strip_marker(pattern: re.Pattern, lines: List[str]) -> str:
+    """先頭行の「Q:」「A:」などのマーカーを除いて、複数行を1つのテキストにまとめる"""
+    first = pattern.match(lines[0]).group(1)
+    return "\n".join([first] + [line.rstrip("\r\n") for line in lines[1:]]).strip()
+
+def _qa_chunk(question_lines: List[str], answer_lines: List[str]) -> Dict:
+    """質問行・回答行（先頭行はマーカー付きのまま）からQAペアのチャンクを作る"""
+    question = _strip_marker(_QUESTION_LINE, question_lines)
+    answer = _strip_marker(_ANSWER_LINE, answer_lines)
+    return {
+        "text": f"質問: {question}\n回答: {answer}",
+        "metadata": {
+            "content_type": "qa_pair",
+            "question": question,
+            "answer": answer
+        }
+    }
+
+class _TextChunker:
+    """
+    テキストを少しずつ受け取り、文（「。」区切り）をまとめたチャンクを順に返す
+    
+    チャンクの最大長と重なり（直前のチャンク末尾 overlap 文字を次のチャンクの先頭に付ける）は
+    従来の split_into_chunks と同じ。「。」を含まない長い文は max_len 文字ごとに区切るので、
+    保持するテキストは常にチャンク数個分に収まる。
+    """
+    
+    def __init__(self, max_len: int = MAX_CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+        self.max_len = max_len
+        self.overlap = overlap
+        self._pending = ""   # まだ「。」が現れていない文
+        self._current = ""   # 組み立て中のチャンク
     
-    for section in sections:
-        # 複数のQAパターンに対応
-        qa_matches = re.search(r'(?:###\s*)?(?:Q\d*[:：]|質問\d*[:：]|問[:：])(.*?)(?:\n)(?:A\d*[:：]|回答\d*[:：]|答[:：])(.*?)(?:\n|$)', section, re.DOTALL)
+    def _add(self, sentence: str, terminator: str) -> Iterator[str]:
+        if len(self._current) + len(sentence) <= self.max_len:
+            self._current += sentence + terminator
+            return
+        chunk = self._current.strip()
+        if chunk:
+            yield chunk
+        tail = self._current[-self.overlap:] if self.overlap > 0 else ""
+        self._current = tail + sentence + terminator
+    
+    def feed(self, text: str) -> Iterator[str]:
+        """テキストを追加し、確定したチャンクを返す"""
+        sentences = (self._pending + text).split("。")
+        self._pending = sentences.pop()
+        for sentence in sentences:
+            while len(sentence) > self.max_len:
+                yield from self._add(sentence[:self.max_len], "")
+                sentence = sentence[self.max_len:]
+            yield from self._add(sentence, "。")
+        while len(self._pending) > self.max_len:
+            yield from self._add(self._pending[:self.max_len], "")
+            self._pending = self._pending[self.max_len:]
+    
+    def flush(self) -> Iterator[str]:
+        """残りのテキストをチャンクとして返し、状態を空に戻す"""
+        if self._pending:
+            yield from self._add(self._pending, "")
+        chunk = self._current.strip()
+        if chunk:
+            yield chunk
+        self._pending, self._current = "", ""
+
+def _text_chunk(chunk: str) -> Dict:
+    return {"text": chunk, "metadata": {"content_type": "text"}}
+
+def iter_lines(blocks: Iterable[str], max_line: int = _MAX_LINE_LENGTH) -> Iterator[str]:
+    """
+    テキストの断片を改行付きの行に組み直して返す
+    
+    改行の無い極端に長い行は max_line 文字ごとに区切って返す（末尾に改行が無い断片は行の途中）。
+    """
+    pending = ""
+    for block in blocks:
+        pending += block
+        start = 0
+        while True:
+            end = pending.find("\n", start)
+            if end < 0:
+                break
+            yield pending[start:end + 1]
+            start = end + 1
+        pending = pending[start:]
+        while len(pending) > max_line:
+            yield pending[:max_line]
+            pending = pending[max_line:]
+    if pending:
+        yield pending
+
+def iter_qa_chunks(lines: Iterable[str], max_len: int = MAX_CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    テキストを1行ずつ1回だけ走査し、QAペアと通常テキストのチャンクを順に返す
+    
+    - 質問行（Q: / 質問: / 問: など）から回答行（A: / 回答: / 答: など）までを質問、
+      回答行から次の質問行・区切り線（---）・空行・末尾までを回答として1チャンクにする
+    - 回答が max_len 文字を超えたら、そこでQAペアを確定させ、残りは通常のテキストとして扱う。
+      回答の無いまま max_len 文字を超えた質問も通常のテキストとして扱う
+    - QAに属さない部分は通常のテキストとして _TextChunker で分割する
+      （QA形式でない文書は split_into_chunks(text) と同じ結果になる）
+    - 通常テキストはその場でチャンク化するため、保持するのは組み立て中のQAペア
+      （質問・回答それぞれ max_len 文字まで）とチャンク数個分のテキストだけ
+    
+    Args:
+        lines: 改行付きの行（iter_lines の戻り値やファイルオブジェクト）
+        max_len: 質問・回答それぞれの最大文字数
+    """
+    chunker = _TextChunker()
+    question_lines: Optional[List[str]] = None
+    answer_lines: Optional[List[str]] = None
+    question_len = answer_len = 0
+    at_line_start = True
+    
+    def flush_question() -> Iterator[Dict]:
+        # 回答の無い質問は通常のテキストとして扱う
+        for text in question_lines or ():
+            yield from map(_text_chunk, chunker.feed(text))
+    
+    for line in lines:
+        # 長い行の途中の断片は、行頭パターンを照合せず直前の部分に続ける
+        line_start, at_line_start = at_line_start, line.endswith("\n")
         
-        if qa_matches:
-            question = qa_matches.group(1).strip()
-            answer = qa_matches.group(2).strip()
-            
-            # QAペアをメタデータ付きで保存
-            chunks.append({
-                "text": f"質問: {question}\n回答: {answer}",
-                "metadata": {
-                    "content_type": "qa_pair", 
-                    "question": question,
-                    "answer": answer
-                }
-            })
-        else:
-            # 従来のパターンでも試す
-            qa_splits = re.split(r'(?:^|\n)(?:###\s*)?(?:Q\d*[:：]|質問\d*[:：]|問[:：])', section)
-            
-            # 最初の分割が空の場合は除去
-            if qa_splits and not qa_splits[0].strip():
-                qa_splits = qa_splits[1:]
-            
-            for qa_text in qa_splits:
-                if not qa_text.strip():
-                    continue
-                    
-                # 回答部分を分離
-                parts = re.split(r'(?:^|\n)(?:A\d*[:：]|回答\d*[:：]|答[:：])', qa_text, 1)
-                
-                if len(parts) == 2:
-                    question = parts[0].strip()
-                    answer = parts[1].strip()
-                    
-                    # QAペアをメタデータ付きで保存
-                    chunks.append({
-                        "text": f"質問: {question}\n回答: {answer}",
-                        "metadata": {
-                            "content_type": "qa_pair", 
-                            "question": question,
-                            "answer": answer
-                        }
-                    })
-                else:
-                    # 回答部分が見つからない場合は通常のテキストとして扱う
-                    chunks.append({
-                        "text": qa_text.strip(),
-                        "metadata": {"content_type": "text"}
-                    })
+        if line_start and _QUESTION_LINE.match(line):
+            # 新しい質問の開始：直前のQAペアまたは通常テキストを確定させる
+            if answer_lines is not None:
+                yield _qa_chunk(question_lines, answer_lines)
+            else:
+                yield from flush_question()
+                yield from map(_text_chunk, chunker.flush())
+            question_lines, answer_lines = [line], None
+            question_len = len(line)
+            continue
+        
+        if question_lines is not None and answer_lines is None:
+            if line_start and _ANSWER_LINE.match(line):
+                # 回答行が1行で max_len を超える場合は、超えた部分を通常のテキストにする
+                answer_lines, overflow = [line[:max_len]], line[max_len:]
+                answer_len = len(answer_lines[0])
+                if overflow:
+                    yield _qa_chunk(question_lines, answer_lines)
+                    question_lines, answer_lines = None, None
+                    yield from map(_text_chunk, chunker.feed(overflow))
+            elif question_len + len(line) > max_len:
+                yield from flush_question()
+                question_lines = None
+                yield from map(_text_chunk, chunker.feed(line))
+            else:
+                question_lines.append(line)
+                question_len += len(line)
+            continue
+        
+        if answer_lines is not None:
+            ended = line_start and (
+                _SEPARATOR_LINE.match(line)
+                or (not line.strip() and _strip_marker(_ANSWER_LINE, answer_lines))
+            )
+            if ended:
+                yield _qa_chunk(question_lines, answer_lines)
+                question_lines, answer_lines = None, None
+            elif answer_len + len(line) > max_len:
+                yield _qa_chunk(question_lines, answer_lines)
+                question_lines, answer_lines = None, None
+                yield from map(_text_chunk, chunker.feed(line))
+            else:
+                answer_lines.append(line)
+                answer_len += len(line)
+            continue
+        
+        yield from map(_text_chunk, chunker.feed(line))
     
-    return chunks
+    if answer_lines is not None:
+        yield _qa_chunk(question_lines, answer_lines)
+    else:
+        yield from flush_question()
+    yield from map(_text_chunk, chunker.flush())
+
+def split_qa_into_chunks(text: str) -> List[Dict]:
+    """QA形式のテキストを質問と回答のペアごとにチャンク化する"""
+    return list(iter_qa_chunks(iter_lines([text])))
 
 def split_into_chunks(text: str, max_len=MAX_CHUNK_SIZE, overlap=CHUNK_OVERLAP) -> List[str]:
     """テキストをチャンクに分割する"""
-    sentences = text.split("。")
-    chunks, current = [], ""
-    for sentence in sentences:
-        if len(current) + len(sentence) <= max_len:
-            current += sentence + "。"
-        else:
-            chunks.append(current.strip())
-            current = current[-overlap:] + sentence + "。"
-    if current:
-        chunks.append(current.strip())
-    return chunks
+    chunker = _TextChunker(max_len, overlap)
+    return list(chunker.feed(text)) + list(chunker.flush())
+
+def embed_texts(texts: List[str], task_type: str = "retrieval_document") -> List[List[float]]:
+    """
+    複数のテキストを1回のAPIリクエストでまとめてベクトル化する
+    
+    埋め込みキャッシュにあるテキストはAPIに送らず、キャッシュの値を使う。
+    ローカルで計算するバックエンドはキャッシュを引くより速いので、そのまま計算する。
+    """
+    if not texts:
+        return []
+    
+    embedder = get_embedder()
+    if not embedder.remote:
+        return embedder.embed(texts, task_type=task_type)
+    
+    keys = [embedding_cache.make_key(embedder.name, task_type, text) for text in texts]
+    vectors = embedding_cache.get_many(keys)
+    
+    # キャッシュに無いテキストだけを（重複を除いて）まとめてベクトル化
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            missing.setdefault(key, text)
+    if missing:
+        if _rate_limiter is not None:
+            _rate_limiter.acquire()
+        embeddings = embedder.embed(list(missing.values()), task_type=task_type)
+        new_vectors = dict(zip(missing.keys(), embeddings))
+        embedding_cache.put_many(new_vectors)
+        vectors.update(new_vectors)
+    
+    return [vectors[key] for key in keys]
 
-def embed_content(content: str, filename: str) -> int:
+def chunk_hash(text: str) -> str:
+    """チャンク本文のハッシュ（チャンクIDと差分判定に使う）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _delete_ids(collection, ids: List[str], batch_size: int = EMBED_BATCH_SIZE):
+    """チャンクをバッチ単位で削除する（一度に大量のIDを渡すとDBの上限を超えるため）"""
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start:start + batch_size])
+
+def embed_content(
+    content: Union[str, Iterable[str]],
+    filename: str,
+    batch_size: int = EMBED_BATCH_SIZE,
+    progress_callback: Optional[Callable[[int], None]] = None,
+    collection=None,
+    is_current: Optional[Callable[[], bool]] = None,
+) -> int:
     """
     テキストコンテンツをベクトル化して保存する
     
+    テキストは先頭から順にチャンク化し、batch_size 件たまるごとにベクトル化して書き込む。
+    ファイルから少しずつ読んだ断片（file_manifest.read_file）を渡せば、
+    ファイル全体をメモリに載せずに巨大なファイルも登録できる。
+    
+    チャンクIDは本文のハッシュから作るため、同じファイルを登録し直した場合は
+    登録済みのチャンクと比較して、新しく現れたチャンクだけをベクトル化・追加し、
+    無くなったチャンクを削除する（位置だけ変わったチャンクはメタデータのみ更新）。
+    
     Args:
-        content: 埋め込むテキストコンテンツ
+        content: 埋め込むテキストコンテンツ（文字列、またはテキストの断片のイテラブル）
         filename: ファイル名（ドキュメントID生成に使用）
+        batch_size: 1回の埋め込みリクエスト・DB書き込みで扱うチャンク数
+        progress_callback: バッチ処理ごとに登録済みチャンク数で呼ばれる
+        collection: 登録先コレクション（省略時は検索中のコレクション）。
+            再インデックス用の構築中コレクションを渡した場合は、
+            キーワードインデックスとコーパスバージョンは更新しない
+        is_current: 読んでいる内容がまだ最新か（元のファイルが変わっていないか）を返す関数。
+            バッチごとと、無くなったチャンクを削除する直前（書き込みロックの中）に確かめる
     
     Returns:
-        生成されたチャンク数
+        登録したチャンク数（同じ本文のチャンクは1つに数える。chunk_index は 0 からこの数の手前までの連番）
+    
+    Raises:
+        StaleContentError: is_current が False を返した場合（そこで登録をやめ、
+            無くなったチャンクの削除は行わない）
     """
+    if collection is not None:
+        return _embed_content(content, filename, batch_size, progress_callback, collection, False, is_current)
+    keyword_index.ensure_ready()
+    return _embed_content(content, filename, batch_size, progress_callback, get_collection(), True, is_current)
+
+def _embed_content(
+    content: Union[str, Iterable[str]],
+    filename: str,
+    batch_size: int,
+    progress_callback: Optional[Callable[[int], None]],
+    collection,
+    serving: bool,
+    is_current: Optional[Callable[[], bool]],
+) -> int:
     # 文書IDはファイル名ベースで定義
     document_id = os.path.splitext(filename)[0]
     
-    # コンテンツをチャンクに分割
-    chunks = split_into_chunks(content)
+    if isinstance(content, str):
+        content = [content]
+    # コンテンツを先頭から順にチャンク化（QA形式の部分は質問・回答ペアごと）
+    chunks = iter_qa_chunks(iter_lines(content))
     
-    # 各チャンクをベクトル化して登録
-    for idx, chunk in enumerate(chunks):
-        result = genai.embed_content(
-            model=LLM_EMBED_MODEL,
-            content=chunk,
-            task_type="retrieval_document"
-        )
-        collection.add(
-            documents=[chunk],
-            ids=[f"{document_id}_chunk_{idx}"],
-            metadatas=[{"document_id": document_id, "filename": filename}],
-            embeddings=[result["embedding"]]
-        )
+    # 登録済みかどうかの判定と重複の除外に使うID（本文は保持しない）
+    seen_ids = set()
+    kept = added = 0
+    changed = False
+    embed_seconds = 0.0
+    batch_size = max(1, batch_size)
+    
+    def check_current():
+        if is_current is None or is_current():
+            return
+        # 書き込み済みのバッチがあれば、それまでの回答キャッシュは使えない
+        if changed:
+            with write_lock():
+                mark_corpus_changed()
+        raise StaleContentError(f"{filename} は登録中に変更または削除されました")
+    
+    while True:
+        batch = list(itertools.islice(chunks, batch_size))
+        if not batch:
+            break
+        check_current()
+        
+        # 本文ハッシュをIDにする（同じ文書内で全く同じ本文のチャンクは1つにまとめる）
+        entries = {}
+        for chunk in batch:
+            digest = chunk_hash(chunk["text"])
+            chunk_id = f"{document_id}_chunk_{digest[:16]}"
+            if chunk_id not in seen_ids:
+                entries[chunk_id] = (chunk["text"], {
+                    **chunk["metadata"],
+                    "document_id": document_id,
+                    "filename": filename,
+                    "chunk_index": len(seen_ids),
+                    "content_hash": digest,
+                })
+                seen_ids.add(chunk_id)
+        
+        # このバッチのチャンクのうち登録済みのものと比較する（メタデータだけ取得すればよい）
+        existing = collection.get(ids=list(entries), include=["metadatas"])
+        existing_meta = dict(zip(existing["ids"], existing["metadatas"]))
+        added_ids = [chunk_id for chunk_id in entries if chunk_id not in existing_meta]
+        moved_ids = [
+            chunk_id for chunk_id in entries
+            if chunk_id in existing_meta and existing_meta[chunk_id] != entries[chunk_id][1]
+        ]
+        kept += len(entries) - len(added_ids)
+        added += len(added_ids)
+        
+        # 新しいチャンクだけをベクトル化する（APIの待ち時間はロックの外）
+        if added_ids:
+            started = time.perf_counter()
+            documents = [entries[chunk_id][0] for chunk_id in added_ids]
+            embeddings = embed_texts(documents, task_type="retrieval_document")
+            embed_seconds += time.perf_counter() - started
+        
+        # 検索中のコレクションへの書き込みは、バッチごとにキーワードインデックスの更新と合わせて
+        # ロックの中で行う（他のプロセスの書き込みと混ざらず、ベクトル化は並行して進められる）。
+        # ロックを離している間に再インデックスで切り替わることがあるので、書き込み先は毎回引き直し、
+        # 確認後に他のプロセスが登録したチャンクとも衝突しないよう upsert で書き込む
+        changed_ids = added_ids + moved_ids
+        with write_lock() if serving else nullcontext():
+            if serving:
+                collection = get_collection()
+            if added_ids:
+                collection.upsert(
+                    documents=documents,
+                    ids=added_ids,
+                    metadatas=[entries[chunk_id][1] for chunk_id in added_ids],
+                    embeddings=embeddings
+                )
+            # 位置が変わっただけのチャンクはメタデータのみ更新
+            if moved_ids:
+                collection.update(ids=moved_ids, metadatas=[entries[chunk_id][1] for chunk_id in moved_ids])
+            if serving and changed_ids:
+                keyword_index.update_chunks(
+                    changed_ids,
+                    [entries[chunk_id][0] for chunk_id in changed_ids],
+                    [entries[chunk_id][1] for chunk_id in changed_ids],
+                )
+                changed = True
+        if progress_callback:
+            progress_callback(len(seen_ids))
+    
+    # 無くなったチャンクを削除し（IDだけ取得すればよい）、キーワードインデックスからも削除して
+    # コーパスバージョンを進める。読んだ内容が古くなっていれば、新しい内容のチャンクを消さないよう削除しない
+    with write_lock() if serving else nullcontext():
+        check_current()
+        if serving:
+            collection = get_collection()
+        existing_ids = collection.get(where={"document_id": document_id}, include=[])["ids"]
+        removed_ids = [chunk_id for chunk_id in existing_ids if chunk_id not in seen_ids]
+        _delete_ids(collection, removed_ids, batch_size)
+        if serving and (changed or removed_ids):
+            if removed_ids:
+                keyword_index.remove_chunks(removed_ids)
+            mark_corpus_changed()
     
-    return len(chunks)
+    if added:
+        print(f"{filename}: {added}チャンクを登録 "
+              f"({embed_seconds:.2f}秒, {added / max(embed_seconds, 1e-9):.1f} chunks/sec)")
+    if kept or removed_ids:
+        print(f"{filename}: 変更なし {kept} / 追加 {added} / 削除 {len(removed_ids)} チャンク")
+    
+    return len(seen_ids)
 
-def delete_from_vectordb(filename: str) -> int:
+def delete_from_vectordb(filename: str, collection=None) -> int:
     """
     ファイル名に関連するすべてのチャンクをベクトルDBから削除する
     
     Args:
         filename: 削除するファイル名
+        collection: 削除元コレクション（省略時は検索中のコレクション）。
+            再インデックス用の構築中コレクションを渡した場合は、
+            キーワードインデックスとコーパスバージョンは更新しない
     
     Returns:
         削除されたチャンク数
     """
     # ファイル名からドキュメントIDを生成
     document_id = os.path.splitext(filename)[0]
+    serving = collection is None
     
-    # ドキュメントIDに関連するすべてのチャンクを検索
-    results = collection.get(
-        where={"document_id": document_id}
-    )
-    
-    # 削除するIDのリストを作成
-    ids_to_delete = results["ids"]
-    
-    # IDリストが空でなければ削除を実行
-    if ids_to_delete:
-        collection.delete(ids=ids_to_delete)
+    # 検索中のコレクションへの書き込みは、プロセスをまたいで1つずつ行う
+    if serving:
+        keyword_index.ensure_ready()
+    with write_lock() if serving else nullcontext():
+        # ドキュメントIDに関連するすべてのチャンクを検索（IDだけ取得すればよい）
+        if serving:
+            collection = get_collection()
+        results = collection.get(
+            where={"document_id": document_id},
+            include=[]
+        )
+        
+        # 削除するIDのリストを作成
+        ids_to_delete = results["ids"]
+        
+        # IDリストが空でなければ削除を実行
+        if ids_to_delete:
+            _delete_ids(collection, ids_to_delete)
+            if serving:
+                keyword_index.remove_chunks(ids_to_delete)
+                mark_corpus_changed()
     
-    return len(ids_to_delete) 
\ No newline at end of file
+    return len(ids_to_delete) 
+
+
+def get_file_chunks(filename: str, start: int = 0, limit: int = 100) -> List[Dict]:
+    """
+    ファイルの登録済みチャンクを chunk_index の範囲で取得する（ファイルの先頭から順）
+
+    範囲で絞ってから取得するので、大きなファイルでも1ページ分しか読み込まない。
+    chunk_index は登録したチャンク（同じ本文は1つにまとめる）の 0 からの連番。
+
+    Args:
+        filename: ファイル名
+        start: 取得する最初の chunk_index
+        limit: 取得する chunk_index の幅
+
+    Returns:
+        {"chunk_id", "chunk_index", "content_type", "text"} のリスト
+    """
+    document_id = os.path.splitext(filename)[0]
+    results = get_collection().get(
+        where={"$and": [
+            {"document_id": document_id},
+            {"chunk_index": {"$gte": start}},
+            {"chunk_index": {"$lt": start + limit}},
+        ]},
+        include=["documents", "metadatas"],
+    )
+    chunks = [
+        {
+            "chunk_id": chunk_id,
+            "chunk_index": meta.get("chunk_index", 0),
+            "content_type": meta.get("content_type"),
+            "text": document,
+        }
+        for chunk_id, document, meta in zip(results["ids"], results["documents"], results["metadatas"])
+    ]
+    chunks.sort(key=lambda chunk: chunk["chunk_index"])
+    return chunks
@@ -0,0 +1,142 @@
+"""
+【embedder.py の役割】
+-----------------------------------------------------
+- テキストをベクトルに変換する「埋め込みバックエンド」を切り替えられるようにする。
+- EMBED_BACKEND で選択する:
+    gemini  : Gemini の埋め込みAPI（LLM_EMBED_MODEL）を呼び出す（既定）
+    hashing : 文字n-gramのハッシュでCPUだけでベクトルを作る（ネットワーク不要・決定的）
+- embed_service（文書の登録）と search_service（質問のベクトル化）は
+  get_embedder() で取得したバックエンドだけを使う。
+- バックエンドを切り替えるとベクトルの次元と意味が変わるため、
+  切り替えた後は python reindex.py --fresh でベクトルDBを作り直すこと。
+"""
+
+import unicodedata
+from typing import List, Optional
+
+import numpy as np
+import google.generativeai as genai
+
+from app.core.config import LLM_API_KEY, LLM_EMBED_MODEL, EMBED_BACKEND, EMBED_HASH_DIM
+
+# APIキーの設定
+genai.configure(api_key=LLM_API_KEY)
+
+
+class GeminiEmbedder:
+    """Gemini の埋め込みAPIでベクトル化する"""
+
+    # APIを呼び出すので、結果は埋め込みキャッシュに保存し、呼び出し頻度も制限する
+    remote = True
+
+    def __init__(self, model: str = LLM_EMBED_MODEL):
+        self.model = model
+        self.name = model
+
+    def embed(self, texts: List[str], task_type: str = "retrieval_document") -> List[List[float]]:
+        """複数のテキストを1回のAPIリクエストでまとめてベクトル化する"""
+        result = genai.embed_content(
+            model=self.model,
+            content=texts,
+            task_type=task_type
+        )
+        return result["embedding"]
+
+
+class HashingEmbedder:
+    """
+    文字n-gram（1〜3文字）のハッシュでベクトル化する（feature hashing）
+
+    分かち書きをしない日本語でも、文字の並びが似ている文ほど近いベクトルになる。
+    各n-gramをハッシュで次元に割り当て、符号付きで数えて L2 正規化する。
+    ハッシュ計算と集計は NumPy でまとめて行うので、質問1件なら1ミリ秒もかからない。
+    """
+
+    remote = False
+
+    # 使う n-gram の長さ
+    NGRAM_SIZES = (1, 2, 3)
+
+    # n-gram ごとにハッシュを変えるための係数（64bit の奇数）
+    _MULTIPLIERS = np.array(
+        [0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9],
+        dtype=np.uint64,
+    )
+
+    def __init__(self, dim: int = EMBED_HASH_DIM):
+        self.dim = dim
+        self.name = f"hashing-char-ngram-{dim}"
+
+    @staticmethod
+    def _codepoints(text: str) -> np.ndarray:
+        """NFKC正規化・小文字化したテキストのコードポイント列"""
+        text = unicodedata.normalize("NFKC", text).lower()
+        return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+
+    def _ngram_hashes(self, codes: np.ndarray) -> np.ndarray:
+        """コードポイント列に含まれる全 n-gram の64bitハッシュ"""
+        hashes = []
+        for n in self.NGRAM_SIZES:
+            if len(codes) < n:
+                break
+            count = len(codes) - n + 1
+            h = np.full(count, n, dtype=np.uint64)
+            for offset in range(n):
+                h = (h ^ codes[offset:offset + count]) * self._MULTIPLIERS[offset]
+            # 上位ビットを下位ビットに混ぜる（splitmix64 の仕上げ）
+            h ^= h >> np.uint64(31)
+            h *= np.uint64(0x94D049BB133111EB)
+            h ^= h >> np.uint64(29)
+            hashes.append(h)
+        return np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """テキストごとのベクトルを (件数, 次元) の配列で返す"""
+        hashes = [self._ngram_hashes(self._codepoints(text)) for text in texts]
+        rows = np.repeat(np.arange(len(texts)), [len(h) for h in hashes])
+        h = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+
+        # ハッシュの下位ビットで次元、最上位ビットで符号を決める
+        columns = (h % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where(h >> np.uint64(63), -1.0, 1.0)
+        vectors = np.bincount(
+            rows * self.dim + columns,
+            weights=signs,
+            minlength=len(texts) * self.dim,
+        ).reshape(len(texts), self.dim)
+
+        # 出現回数の多いn-gramが支配しないよう対数で抑え、長さで正規化する
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def embed(self, texts: List[str], task_type: str = "retrieval_document") -> List[List[float]]:
+        """複数のテキストをまとめてベクトル化する（task_type は使わない）"""
+        return self.embed_array(texts).tolist()
+
+
+_embedder = None
+
+
+def create_embedder(backend: str = EMBED_BACKEND):
+    """バックエンド名から埋め込みバックエンドを作る"""
+    if backend == "gemini":
+        return GeminiEmbedder()
+    if backend == "hashing":
+        return HashingEmbedder()
+    raise ValueError(f"不明な EMBED_BACKEND です: {backend}（gemini / hashing）")
+
+
+def get_embedder():
+    """設定で選択された埋め込みバックエンド（プロセス内で1つ）"""
+    global _embedder
+    if _embedder is None:
+        _embedder = create_embedder()
+    return _embedder
+
+
+def set_embedder(embedder: Optional[object]):
+    """埋め込みバックエンドを差し替える（ベンチマーク等。None で設定値に戻す）"""
+    global _embedder
+    _embedder = embedder
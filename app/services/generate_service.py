@@ -5,26 +5,20 @@
   生成AIを使って自然な回答文を生成する役割を担う。
 """
 
+import time
+
 import google.generativeai as genai
-from app.core.config import LLM_API_KEY, LLM_GEN_MODEL
+from app.core import metrics
+from app.core.config import (
+    LLM_API_KEY, LLM_GEN_MODEL,
+    GEN_TEMPERATURE, GEN_TOP_P, GEN_TOP_K, GEN_MAX_OUTPUT_TOKENS,
+)
 
 # APIキーの設定
 genai.configure(api_key=LLM_API_KEY)
 
-# 関連文章と質問を渡して、自然文で回答を作る
-def generate_answer(context_docs: list[str], question: str) -> str:
-    # 関連文章を1つのテキスト結合
-    context = "\n\n".join(context_docs).strip()
-
-    # QAペアが含まれているかチェック
-    contains_qa_pairs = "質問:" in context and "回答:" in context
-    contains_original_query = "元の質問:" in context
-    
-    # LLMに渡すプロンプトを作成
-    if contains_qa_pairs:
-        if contains_original_query:
-            # 改良版QA用プロンプト（元の質問情報を活用）
-            prompt = f"""
+# 改良版QA用プロンプト（元の質問情報を活用）
+QA_WITH_ORIGINAL_QUESTION_TEMPLATE = """
             以下の関連QAデータと、ユーザーの新しい質問を見て、適切な回答を作成してください。
 
             #関連QAデータ:
@@ -40,9 +34,9 @@ def generate_answer(context_docs: list[str], question: str) -> str:
             4. 関連QAデータにない情報は含めないでください。
             5. マニュアルやガイドラインの正確な手順や連絡先など、具体的な情報を優先して回答に含めてください。
             """
-        else:
-            # 標準QA用プロンプト
-            prompt = f"""
+
+# 標準QA用プロンプト
+QA_TEMPLATE = """
             以下の関連QAデータと、ユーザーの新しい質問を見て、適切な回答を作成してください。
 
             #関連QAデータ:
@@ -58,9 +52,9 @@ def generate_answer(context_docs: list[str], question: str) -> str:
             4. 関連QAデータにない情報は含めないでください。
             5. マニュアルやガイドラインの正確な手順や連絡先など、具体的な情報を優先して回答に含めてください。
             """
-    else:
-        # 通常テキスト用プロンプト
-        prompt = f"""
+
+# 通常テキスト用プロンプト
+TEXT_TEMPLATE = """
         以下の関連文章をもとに、ユーザーの質問に回答してください。
         #関連文章:
         {context}
@@ -70,19 +64,97 @@ def generate_answer(context_docs: list[str], question: str) -> str:
         
         #関連文書の内容に沿って、正確かつ簡潔に答えてください。具体的な手順や連絡先など、実用的な情報を優先して含めてください。
         """
+
+# 生成パラメータ（GEN_MAX_OUTPUT_TOKENS が0ならモデルの既定値）
+GENERATION_CONFIG = {
+    "temperature": GEN_TEMPERATURE,  # より事実に基づいた回答のため低めの温度設定
+    "top_p": GEN_TOP_P,
+    "top_k": GEN_TOP_K,
+}
+if GEN_MAX_OUTPUT_TOKENS > 0:
+    GENERATION_CONFIG["max_output_tokens"] = GEN_MAX_OUTPUT_TOKENS
+
+# プロセス内で使い回すモデル（初回の get_model() で作成）
+_model = None
+
+def select_template(context_docs: list) -> str:
+    """
+    関連文書のメタデータからプロンプトのテンプレートを選ぶ
     
-    # モデルの指定とパラメータ設定
-    model = genai.GenerativeModel(
-        LLM_GEN_MODEL,
-        generation_config={
-            "temperature": 0.2,  # より事実に基づいた回答のため低めの温度設定
-            "top_p": 0.95,
-            "top_k": 40,
-        }
-    )
+    検索結果（text・metadata を持つ辞書）にQAペアが含まれていればQA用、
+    そのQAペアに元の質問（metadata の question）があれば元の質問を活用するQA用を使う。
+    文字列だけが渡された場合は通常テキスト用。
+    """
+    template = TEXT_TEMPLATE
+    for doc in context_docs:
+        metadata = doc.get("metadata", {}) if isinstance(doc, dict) else {}
+        if metadata.get("content_type") == "qa_pair":
+            if metadata.get("question"):
+                return QA_WITH_ORIGINAL_QUESTION_TEMPLATE
+            template = QA_TEMPLATE
+    return template
+
+def build_prompt(context_docs: list, question: str) -> str:
+    """関連文書（検索結果の辞書または文字列）と質問からLLMに渡すプロンプトを作る"""
+    with metrics.span("prompt_build"):
+        # 関連文章を1つのテキスト結合
+        context = "\n\n".join(
+            doc["text"] if isinstance(doc, dict) else doc for doc in context_docs
+        ).strip()
+        return select_template(context_docs).format(context=context, question=question)
 
+def create_model() -> genai.GenerativeModel:
+    """モデルの指定とパラメータ設定"""
+    return genai.GenerativeModel(LLM_GEN_MODEL, generation_config=GENERATION_CONFIG)
+
+def get_model() -> genai.GenerativeModel:
+    """プロセス内で共有するモデル（リクエストごとに作り直さない）"""
+    global _model
+    if _model is None:
+        _model = create_model()
+    return _model
+
+def extract_answer(response) -> str:
+    """生成結果から回答テキストを取り出す"""
+    return response.text.strip() if hasattr(response, "text") else "回答を生成できませんでした。"
+
+# 関連文章と質問を渡して、自然文で回答を作る
+def generate_answer(context_docs: list, question: str) -> str:
+    prompt = build_prompt(context_docs, question)
+    
     # プロンプトをモデルに渡して、回答を生成
-    response = model.generate_content(prompt)
+    with metrics.span("generate"):
+        response = get_model().generate_content(prompt)
 
     # 生成された回答を返す
-    return response.text.strip() if hasattr(response, "text") else "回答を生成できませんでした。"
+    return extract_answer(response)
+
+async def generate_answer_async(context_docs: list, question: str) -> str:
+    """generate_answer の非同期版（スレッドを占有せずにLLMの応答を待つ）"""
+    prompt = build_prompt(context_docs, question)
+    with metrics.span("generate"):
+        response = await get_model().generate_content_async(prompt)
+    return extract_answer(response)
+
+async def generate_answer_stream(context_docs: list, question: str):
+    """
+    回答をモデルが生成した順に少しずつ返す（非同期ジェネレーター）
+    
+    最初の断片が届くまでの時間を generate_first_token として記録する
+    （全体の時間は送信先の読み取り速度にも左右されるので計測しない）。
+    """
+    prompt = build_prompt(context_docs, question)
+    started = time.perf_counter()
+    response = await get_model().generate_content_async(prompt, stream=True)
+    first = True
+    async for chunk in response:
+        if first:
+            metrics.observe("generate_first_token", time.perf_counter() - started)
+            first = False
+        try:
+            text = chunk.text
+        except ValueError:
+            # テキストを含まないチャンク（安全性フィルタ等）は読み飛ばす
+            continue
+        if text:
+            yield text
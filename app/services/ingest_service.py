@@ -0,0 +1,251 @@
+"""
+【ingest_service.py の役割】
+-----------------------------------------------------
+- アップロードされたファイルのベクトルDB登録を、バックグラウンドのワーカーで実行する。
+- ワーカー数（INGEST_WORKERS）と待機ジョブ数（INGEST_QUEUE_SIZE）に上限を設け、
+  あふれた場合は IngestQueueFullError で呼び出し元に知らせる（バックプレッシャー）。
+- 同じファイル名のジョブと削除は、ファイル名ごとのロック（write_lock.file_lock）で1つずつ行う。
+  待っていたジョブは順番が来てからファイルを読むので、常にその時点の最新の内容を登録する。
+- ジョブごとの進捗（処理済みチャンク数 / 総チャンク数）を保持し、問い合わせに答える。
+  総チャンク数は読み終えるまで分からないので、ファイルサイズから見積もった値を返し、完了時に確定する。
+  ジョブの情報は SQLite に保存するので、複数ワーカーで動かしても
+  どのワーカーに問い合わせても同じ状態が返る（待機ジョブ数の上限はワーカーごと）。
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from app.core import file_manifest
+from app.core.config import INGEST_WORKERS, INGEST_QUEUE_SIZE, VECTOR_DB_DIR
+from app.core.write_lock import file_lock
+from app.services.embed_service import MAX_CHUNK_SIZE, StaleContentError, delete_from_vectordb, embed_content
+
+# ジョブ情報の保存先
+JOBS_PATH = os.path.join(VECTOR_DB_DIR, "ingest_jobs.sqlite3")
+
+_COLUMNS = (
+    "job_id", "filename", "status", "chunks_embedded", "chunks_total",
+    "error", "created_at", "updated_at",
+)
+
+# 終了済みジョブを保持する件数（超えた分は古いものから忘れる）
+_JOB_HISTORY = 1000
+
+# 登録処理専用のスレッドプール（/ask 用のスレッドプールとは分ける）
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="rag-ingest")
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_active = 0
+
+
+class IngestQueueFullError(Exception):
+    """登録待ちのジョブが上限に達している"""
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(JOBS_PATH), exist_ok=True)
+        conn = sqlite3.connect(JOBS_PATH, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " filename TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " chunks_embedded INTEGER NOT NULL,"
+            " chunks_total INTEGER NOT NULL,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def has_capacity() -> bool:
+    """新しいジョブを受け付けられるか"""
+    with _lock:
+        return _active < INGEST_QUEUE_SIZE
+
+
+def submit(file_path: Path) -> dict:
+    """
+    ファイルの登録ジョブを投入し、ジョブ情報を返す
+    
+    Raises:
+        IngestQueueFullError: 実行中・待機中のジョブが上限に達している場合
+    """
+    global _active
+    now = time.time()
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "filename": file_path.name,
+        "status": "queued",
+        "chunks_embedded": 0,
+        "chunks_total": 0,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    with _lock:
+        if _active >= INGEST_QUEUE_SIZE:
+            raise IngestQueueFullError(f"登録待ちのジョブが上限（{INGEST_QUEUE_SIZE}件）に達しています")
+        _active += 1
+        conn = _connect()
+        conn.execute(
+            f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            [job[column] for column in _COLUMNS],
+        )
+        _forget_old_jobs(conn)
+        conn.commit()
+    _executor.submit(_run, job["job_id"], file_path)
+    return dict(job)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """ジョブ情報（無ければ None）"""
+    with _lock:
+        row = _connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def list_jobs() -> List[dict]:
+    """保持しているジョブ情報を新しい順に返す"""
+    with _lock:
+        rows = _connect().execute("SELECT * FROM jobs ORDER BY created_at DESC").fetchall()
+    return [dict(row) for row in rows]
+
+
+def _update(job_id: str, **fields):
+    fields["updated_at"] = time.time()
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE job_id = ?",
+            [*fields.values(), job_id],
+        )
+        conn.commit()
+
+
+def _forget_old_jobs(conn: sqlite3.Connection):
+    """終了済みジョブが保持件数を超えたら古いものから削除する（_lock 取得済みで呼ぶ）"""
+    conn.execute(
+        "DELETE FROM jobs WHERE job_id IN ("
+        " SELECT job_id FROM jobs WHERE status IN ('completed', 'failed')"
+        " ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+        (_JOB_HISTORY,),
+    )
+
+
+def delete_file(file_path: Path):
+    """
+    ファイルを削除し、ベクトルDBとファイルのカタログからも削除する
+
+    同じファイルの登録ジョブが実行中なら、終わるのを待ってから削除する。
+    """
+    with file_lock(file_path.name):
+        file_path.unlink()
+        delete_from_vectordb(file_path.name)
+        file_manifest.remove(file_path.name)
+
+
+def _unchanged(file_path: Path, stat: os.stat_result) -> bool:
+    """ファイルが stat を取った時点から置き換え・変更・削除されていないか"""
+    try:
+        current = file_path.stat()
+    except FileNotFoundError:
+        return False
+    return (current.st_ino, current.st_size, current.st_mtime_ns) == (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _estimate_chunks(size: int, chars: int, read_bytes: int) -> int:
+    """
+    ファイルサイズから総チャンク数を見積もる
+
+    読んだ部分の1文字あたりのバイト数で全体の文字数を見積もり、
+    1チャンクを MAX_CHUNK_SIZE 文字として数える（読む前は1文字1バイトとみなす）。
+    """
+    chars_per_byte = chars / read_bytes if read_bytes else 1.0
+    return max(1, math.ceil(size * chars_per_byte / MAX_CHUNK_SIZE))
+
+
+def _run(job_id: str, file_path: Path):
+    """ワーカースレッドで1ファイルを登録する"""
+    global _active
+    try:
+        # 同じファイルのジョブ・削除が終わるのを待ってから読む
+        with file_lock(file_path.name):
+            _update(job_id, status="processing")
+            _ingest(job_id, file_path)
+    except StaleContentError as e:
+        # 新しい内容は後から投入されたジョブが登録する（カタログの記録もそちらに任せる）
+        print(f"ファイル登録を中止しました ({file_path.name}): {e}")
+        _update(job_id, status="failed", error=str(e))
+    except Exception as e:
+        print(f"ファイル登録エラー ({file_path.name}): {e}")
+        traceback.print_exc()
+        _update(job_id, status="failed", error=str(e))
+        file_manifest.set_status(file_path.name, file_manifest.STATUS_FAILED, str(e))
+    finally:
+        with _lock:
+            _active -= 1
+
+
+def _ingest(job_id: str, file_path: Path):
+    """1ファイルを登録する（file_lock の中で呼ぶ）"""
+    # 順番を待つ間に削除された
+    if not file_path.is_file():
+        raise StaleContentError(f"{file_path.name} は登録前に削除されました")
+    file_manifest.set_status(file_path.name, file_manifest.STATUS_PROCESSING)
+    # ファイルは少しずつ読みながらチャンク化・登録する（総チャンク数は読み終えるまで分からないので、
+    # 読んだ部分の文字数とバイト数から見積もり直していく）
+    stat, digest, blocks = file_manifest.read_file(file_path)
+    chars = read_bytes = embedded = 0
+
+    def counted_blocks():
+        nonlocal chars, read_bytes
+        for text in blocks:
+            chars += len(text)
+            read_bytes += len(text.encode("utf-8"))
+            report(embedded)
+            yield text
+
+    def report(done: int):
+        nonlocal embedded
+        embedded = done
+        total = max(done, _estimate_chunks(stat.st_size, chars, read_bytes))
+        _update(job_id, chunks_embedded=done, chunks_total=total)
+
+    report(0)
+
+    try:
+        chunks = embed_content(
+            counted_blocks(),
+            file_path.name,
+            progress_callback=report,
+            is_current=lambda: _unchanged(file_path, stat),
+        )
+        # 登録中に変わっていないことを確かめてから記録する
+        if not _unchanged(file_path, stat):
+            raise StaleContentError(f"{file_path.name} は登録中に変更または削除されました")
+    except StaleContentError:
+        # 外から削除された場合は、登録した分を取り消す
+        if not file_path.exists():
+            delete_from_vectordb(file_path.name)
+            file_manifest.remove(file_path.name)
+        raise
+    file_manifest.record(file_path.name, stat, digest.hexdigest(), chunks)
+    _update(job_id, status="completed", chunks_embedded=chunks, chunks_total=chunks)
@@ -0,0 +1,570 @@
+"""
+【keyword_index.py の役割】
+-----------------------------------------------------
+- ファイル名とチャンク本文の文字バイグラム転置インデックスを管理する。
+- search_by_filename のキーワード照合を、全件走査ではなく
+  ポスティング（バイグラム → チャンクと出現位置）の参照だけで行えるようにする。
+- 同じポスティング（出現回数付き）を使い、文字バイグラムを語とみなした
+  BM25 によるランキング（bm25_search）も提供する。
+- embed_content / delete_from_vectordb から差分更新され、
+  VECTOR_DB_DIR 配下の SQLite に保存される。更新はチャンク単位の行の追加・削除だけなので、
+  コーパスが大きくなっても1回の更新の手間は変わらない。
+- インデックスにはチャンク本文を持たない（本文とメタデータはベクトルDBから取り出す）。
+  検索はファイル上のインデックスを直接引くので、プロセスごとにコーパスをメモリへ読み込まず、
+  他のプロセスの更新もそのまま見える。
+- 照合結果は更新世代（書き込みのたびに進む）と組にしてプロセス内でキャッシュするので、
+  どのプロセスが更新しても古い結果は使われない。
+- 更新は write_lock（プロセス間のファイルロック）の中で行い、ベクトルDBへの書き込みと揃える。
+"""
+
+import heapq
+import math
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import VECTOR_DB_DIR, KEYWORD_MATCH_CACHE_SIZE, KEYWORD_MATCH_CACHE_MAX_BYTES
+from app.core.chromadb_client import get_collection
+from app.core.lru_cache import LRUCache
+from app.core.write_lock import write_lock
+
+# インデックスの保存先
+INDEX_PATH = os.path.join(VECTOR_DB_DIR, "keyword_index.sqlite3")
+
+# 以前の形式（全体を pickle で保存していた）のファイル。見つけたら削除する
+_LEGACY_INDEX_PATH = os.path.join(VECTOR_DB_DIR, "keyword_index.pkl")
+
+# 末尾の1文字もバイグラムの先頭に現れるようにするための番兵文字（本文に現れない非文字）
+_SENTINEL = "\uffff"
+
+# 前方一致の上限に使う文字（どの文字よりも後ろに並ぶ）
+_MAX_CHAR = "\U0010ffff"
+
+# コレクションから構築するときの1回あたりの取得件数
+_REBUILD_PAGE_SIZE = 1000
+
+# IN 句に一度に渡すパラメータ数
+_SQL_BATCH = 500
+
+# 候補の絞り込みで結合するバイグラム数の上限（残りは出現位置の確認で確かめる）
+_MAX_JOINED_GRAMS = 8
+
+# 保存形式のバージョン（構造を変えたら上げる。古い形式のインデックスは作り直す）
+_FORMAT_VERSION = 3
+
+# BM25 のパラメータ（語の出現回数の飽和具合と、文書長による補正の強さ）
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    # seq は登録順（削除しても再利用しない）
+    "CREATE TABLE IF NOT EXISTS chunks ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " chunk_id TEXT NOT NULL UNIQUE,"
+    " filename TEXT NOT NULL,"
+    " length INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS chunks_filename ON chunks (filename, seq)",
+    # 本文のポスティング（出現回数、BM25 用のチャンクの長さ、小文字化した本文での出現位置）
+    "CREATE TABLE IF NOT EXISTS postings ("
+    " gram TEXT NOT NULL,"
+    " seq INTEGER NOT NULL,"
+    " tf INTEGER NOT NULL,"
+    " length INTEGER NOT NULL,"
+    " positions BLOB NOT NULL,"
+    " PRIMARY KEY (gram, seq)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS postings_seq ON postings (seq)",
+    # ファイル名のポスティング
+    "CREATE TABLE IF NOT EXISTS files (filename TEXT PRIMARY KEY, length INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS file_postings ("
+    " gram TEXT NOT NULL,"
+    " filename TEXT NOT NULL,"
+    " tf INTEGER NOT NULL,"
+    " length INTEGER NOT NULL,"
+    " positions BLOB NOT NULL,"
+    " PRIMARY KEY (gram, filename)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS file_postings_filename ON file_postings (filename)",
+)
+
+# 件数と長さの合計（BM25 の平均文書長に使う）
+_STAT_KEYS = ("chunk_count", "chunk_length", "file_count", "file_length")
+
+# 接続はスレッドごとに持つ（WAL なので読み込みは書き込みを待たない）
+_local = threading.local()
+_check_lock = threading.Lock()
+_checked = False
+
+
+def _sizeof(key: tuple, matched: frozenset) -> int:
+    return len(key[2].encode("utf-8")) + sum(len(item) for item in matched) + 64 * len(matched)
+
+
+# (更新世代, 照合対象, キーワード) → 一致したチャンクIDの集合
+_match_cache = LRUCache(KEYWORD_MATCH_CACHE_SIZE, max_bytes=KEYWORD_MATCH_CACHE_MAX_BYTES, sizeof=_sizeof)
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+        conn = sqlite3.connect(INDEX_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        _local.conn = conn
+    return conn
+
+
+def _positions(text: str) -> Dict[str, List[int]]:
+    """小文字化済みテキストの文字バイグラム → 出現位置（番兵付き）"""
+    padded = text + _SENTINEL
+    grams: Dict[str, List[int]] = {}
+    for i in range(len(padded) - 1):
+        grams.setdefault(padded[i:i + 2], []).append(i)
+    return grams
+
+
+def _posting_rows(key, text: str) -> List[tuple]:
+    return [
+        (gram, key, len(positions), len(text), array("I", positions).tobytes())
+        for gram, positions in _positions(text.lower()).items()
+    ]
+
+
+def _decode(blob: bytes) -> Set[int]:
+    positions = array("I")
+    positions.frombytes(blob)
+    return set(positions)
+
+
+def _stats(conn: sqlite3.Connection) -> Dict[str, int]:
+    stats = dict(conn.execute("SELECT key, value FROM meta"))
+    return {key: stats.get(key, 0) for key in _STAT_KEYS}
+
+
+def _bump(conn: sqlite3.Connection, key: str, delta: int):
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?)"
+        " ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+        (key, delta),
+    )
+
+
+def _add(conn: sqlite3.Connection, chunk_id: str, text: str, metadata: dict):
+    """チャンクを追加する（同じIDは置き換え。トランザクションの中で呼ぶ）"""
+    _remove(conn, chunk_id)
+    filename = (metadata or {}).get("filename", "")
+    seq = conn.execute(
+        "INSERT INTO chunks (chunk_id, filename, length) VALUES (?, ?, ?)",
+        (chunk_id, filename, len(text)),
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO postings (gram, seq, tf, length, positions) VALUES (?, ?, ?, ?, ?)",
+        _posting_rows(seq, text),
+    )
+    _bump(conn, "chunk_count", 1)
+    _bump(conn, "chunk_length", len(text))
+
+    inserted = conn.execute(
+        "INSERT OR IGNORE INTO files (filename, length) VALUES (?, ?)", (filename, len(filename))
+    ).rowcount
+    if inserted:
+        conn.executemany(
+            "INSERT INTO file_postings (gram, filename, tf, length, positions) VALUES (?, ?, ?, ?, ?)",
+            _posting_rows(filename, filename),
+        )
+        _bump(conn, "file_count", 1)
+        _bump(conn, "file_length", len(filename))
+
+
+def _remove(conn: sqlite3.Connection, chunk_id: str):
+    """チャンクを削除する（トランザクションの中で呼ぶ）"""
+    row = conn.execute(
+        "SELECT seq, filename, length FROM chunks WHERE chunk_id = ?", (chunk_id,)
+    ).fetchone()
+    if row is None:
+        return
+    seq, filename, length = row
+    conn.execute("DELETE FROM postings WHERE seq = ?", (seq,))
+    conn.execute("DELETE FROM chunks WHERE seq = ?", (seq,))
+    _bump(conn, "chunk_count", -1)
+    _bump(conn, "chunk_length", -length)
+
+    # ファイルのチャンクが無くなったら、ファイル名のポスティングも削除する
+    if conn.execute("SELECT 1 FROM chunks WHERE filename = ? LIMIT 1", (filename,)).fetchone() is None:
+        conn.execute("DELETE FROM file_postings WHERE filename = ?", (filename,))
+        conn.execute("DELETE FROM files WHERE filename = ?", (filename,))
+        _bump(conn, "file_count", -1)
+        _bump(conn, "file_length", -len(filename))
+
+
+def _generation(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+    return row[0] if row else 0
+
+
+def _clear(conn: sqlite3.Connection):
+    for table in ("postings", "chunks", "file_postings", "files"):
+        conn.execute(f"DELETE FROM {table}")
+    # 更新世代は作り直しても戻さない（戻すと古い照合結果のキャッシュに当たる）
+    conn.execute("DELETE FROM meta WHERE key != 'generation'")
+    conn.execute("INSERT INTO meta (key, value) VALUES ('format_version', ?)", (_FORMAT_VERSION,))
+    _bump(conn, "generation", 1)
+
+
+def _rebuild_from_collection(conn: sqlite3.Connection):
+    """ベクトルDBの全チャンクからインデックスを構築する（トランザクションの中で呼ぶ）"""
+    _clear(conn)
+    collection = get_collection()
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["documents", "metadatas"],
+            limit=_REBUILD_PAGE_SIZE,
+            offset=offset,
+        )
+        ids = page["ids"]
+        if not ids:
+            break
+        for chunk_id, text, metadata in zip(ids, page["documents"], page["metadatas"]):
+            _add(conn, chunk_id, text or "", metadata or {})
+        offset += len(ids)
+
+
+def _ensure_ready() -> sqlite3.Connection:
+    """
+    インデックスを使えるようにする
+
+    プロセスで最初の1回だけ、保存形式とベクトルDBとの件数を確かめ、
+    インデックスが無い・古い形式・件数が食い違う場合はベクトルDBから作り直す。
+    """
+    global _checked
+    conn = _connect()
+    if _checked:
+        return conn
+    # プロセス間のロックを先に取る（スレッド間の _check_lock を持ったまま待たないように）
+    with write_lock(), _check_lock:
+        if _checked:
+            return conn
+        row = conn.execute("SELECT value FROM meta WHERE key = 'format_version'").fetchone()
+        count = _stats(conn)["chunk_count"]
+        if row is None or row[0] != _FORMAT_VERSION or count != get_collection().count():
+            print("キーワードインデックスをベクトルDBから再構築します")
+            with conn:
+                _rebuild_from_collection(conn)
+        if os.path.exists(_LEGACY_INDEX_PATH):
+            os.remove(_LEGACY_INDEX_PATH)
+        _checked = True
+    return conn
+
+
+def ensure_ready():
+    """
+    ベクトルDBへ書き込む前に呼ぶ
+
+    最初の確認はベクトルDBとの件数の比較なので、ベクトルDBだけ書き込んだ後に
+    初めて確かめると、食い違いとみなして作り直してしまう。
+    """
+    _ensure_ready()
+
+
+def add_chunks(ids: List[str], documents: List[str], metadatas: List[dict]):
+    """チャンクをインデックスに追加する（同じIDは置き換え）"""
+    update_chunks(ids, documents, metadatas)
+
+
+def update_chunks(
+    ids: List[str],
+    documents: List[str],
+    metadatas: List[dict],
+    removed_ids: Iterable[str] = (),
+):
+    """チャンクの追加（同じIDは置き換え）と削除を1つのトランザクションで反映する"""
+    with write_lock():
+        conn = _ensure_ready()
+        with conn:
+            for chunk_id in removed_ids:
+                _remove(conn, chunk_id)
+            for chunk_id, text, metadata in zip(ids, documents, metadatas):
+                _add(conn, chunk_id, text or "", metadata)
+            _bump(conn, "generation", 1)
+
+
+def remove_chunks(ids: Iterable[str]):
+    """チャンクをインデックスから削除する"""
+    update_chunks([], [], [], removed_ids=ids)
+
+
+def rebuild():
+    """ベクトルDB（検索中のコレクション）から作り直す"""
+    with write_lock():
+        conn = _ensure_ready()
+        with conn:
+            _rebuild_from_collection(conn)
+
+
+def clear():
+    """インデックスを空にする（コレクション再作成時に使用）"""
+    with write_lock():
+        conn = _ensure_ready()
+        with conn:
+            _clear(conn)
+
+
+def size() -> int:
+    """登録済みチャンク数"""
+    return _stats(_ensure_ready())["chunk_count"]
+
+
+def _match(conn: sqlite3.Connection, table: str, key: str, keyword: str) -> Set:
+    """
+    小文字化済みのキーワードを部分文字列として含むキー（seq またはファイル名）の集合
+
+    出現件数の少ないバイグラムから候補を絞り込み、残った候補だけバイグラムの出現位置が
+    キーワードと同じ並びになっているかを確かめるので、本文を読まずに確定できる。
+    """
+    if not keyword:
+        return set()
+    if len(keyword) == 1:
+        rows = conn.execute(
+            f"SELECT DISTINCT {key} FROM {table} WHERE gram >= ? AND gram <= ?",
+            (keyword, keyword + _MAX_CHAR),
+        )
+        return {row[0] for row in rows}
+
+    # 出現件数の少ないバイグラムをすべて含むものを候補とする。最も少ないバイグラムの各キーについて
+    # 残りのバイグラムを主キーで引く結合にし、積集合は SQLite の中で取って候補だけを受け取る
+    grams = list({keyword[i:i + 2] for i in range(len(keyword) - 1)})
+    counts = dict.fromkeys(grams, 0)
+    counts.update(conn.execute(
+        f"SELECT gram, COUNT(*) FROM {table} WHERE gram IN ({', '.join('?' * len(grams))}) GROUP BY gram",
+        grams,
+    ))
+    grams.sort(key=counts.__getitem__)
+    if not counts[grams[0]]:
+        return set()
+    joins = "".join(
+        f" JOIN {table} p{i} ON p{i}.gram = ? AND p{i}.{key} = p0.{key}"
+        for i in range(1, min(len(grams), _MAX_JOINED_GRAMS))
+    )
+    candidates = {row[0] for row in conn.execute(
+        f"SELECT p0.{key} FROM {table} p0{joins} WHERE p0.gram = ?",
+        [*grams[1:_MAX_JOINED_GRAMS], grams[0]],
+    )}
+    # 2文字のキーワードはバイグラムが1つなので、位置を確かめるまでもない
+    if len(keyword) == 2 or not candidates:
+        return candidates
+
+    # キーワードの全文字を覆うバイグラム（位置 0, 2, 4, … と末尾）の出現位置が揃えば一致。
+    # 合わなくなった候補は以降読まない。結合しなかったバイグラムは候補に含まれないことがある
+    starts: Dict = {}
+    cover = {(keyword[i:i + 2], i) for i in [*range(0, len(keyword) - 1, 2), len(keyword) - 2]}
+    for gram, offset in sorted(cover, key=lambda item: counts[item[0]]):
+        found = _positions_of(conn, table, key, gram, candidates, counts[gram])
+        for candidate in list(candidates):
+            blob = found.get(candidate)
+            positions = {p - offset for p in _decode(blob)} if blob is not None else set()
+            remaining = starts[candidate] & positions if candidate in starts else positions
+            if remaining:
+                starts[candidate] = remaining
+            else:
+                starts.pop(candidate, None)
+                candidates.discard(candidate)
+        if not candidates:
+            break
+    return candidates
+
+
+def _positions_of(conn: sqlite3.Connection, table: str, key: str, gram: str, candidates: Set, count: int) -> Dict:
+    """候補のキー → バイグラムの出現位置（候補が少なければ候補だけ引き、多ければ全件読む）"""
+    if len(candidates) * 4 > count:
+        return {
+            row[0]: row[1]
+            for row in conn.execute(f"SELECT {key}, positions FROM {table} WHERE gram = ?", (gram,))
+            if row[0] in candidates
+        }
+    ordered = list(candidates)
+    found: Dict = {}
+    for start in range(0, len(ordered), _SQL_BATCH):
+        batch = ordered[start:start + _SQL_BATCH]
+        found.update(conn.execute(
+            f"SELECT {key}, positions FROM {table}"
+            f" WHERE gram = ? AND {key} IN ({', '.join('?' * len(batch))})",
+            [gram, *batch],
+        ))
+    return found
+
+
+def _chunk_ids(conn: sqlite3.Connection, seqs: Iterable[int]) -> Dict[int, str]:
+    seqs = list(seqs)
+    result = {}
+    for start in range(0, len(seqs), _SQL_BATCH):
+        batch = seqs[start:start + _SQL_BATCH]
+        result.update(conn.execute(
+            f"SELECT seq, chunk_id FROM chunks WHERE seq IN ({', '.join('?' * len(batch))})", batch
+        ))
+    return result
+
+
+def _cached_match(target: str, keyword: str) -> frozenset:
+    conn = _ensure_ready()
+    # 世代の読み取りと照合を同じ読み取りトランザクションで行い、途中の更新を混ぜない
+    with conn:
+        conn.execute("BEGIN")
+        key = (_generation(conn), target, keyword)
+        matched = _match_cache.get(key)
+        if matched is not None:
+            return matched
+        if target == "filename":
+            matched = set()
+            for filename in _match(conn, "file_postings", "filename", keyword.lower()):
+                matched.update(row[0] for row in conn.execute(
+                    "SELECT chunk_id FROM chunks WHERE filename = ?", (filename,)
+                ))
+        else:
+            matched = _chunk_ids(conn, _match(conn, "postings", "seq", keyword.lower())).values()
+        matched = frozenset(matched)
+    _match_cache.put(key, matched)
+    return matched
+
+
+def match_filename(keyword: str) -> Set[str]:
+    """ファイル名にキーワードを含むチャンクのID集合"""
+    return set(_cached_match("filename", keyword))
+
+
+def match_content(keyword: str) -> Set[str]:
+    """本文にキーワードを含むチャンクのID集合"""
+    return set(_cached_match("content", keyword))
+
+
+def chunk_files(ids: Iterable[str]) -> List[Tuple[str, str]]:
+    """(ID, ファイル名) を登録順に並べて返す（本文は読まない）"""
+    conn = _ensure_ready()
+    ids = list(ids)
+    entries = []
+    for start in range(0, len(ids), _SQL_BATCH):
+        batch = ids[start:start + _SQL_BATCH]
+        entries.extend(conn.execute(
+            f"SELECT seq, chunk_id, filename FROM chunks WHERE chunk_id IN ({', '.join('?' * len(batch))})",
+            batch,
+        ))
+    entries.sort()
+    return [(chunk_id, filename) for _, chunk_id, filename in entries]
+
+
+def get_chunks(ids: Iterable[str]) -> List[Tuple[str, str, dict]]:
+    """(ID, 本文, メタデータ) を登録順に並べて返す（本文とメタデータはベクトルDBから取り出す）"""
+    conn = _ensure_ready()
+    ids = list(ids)
+    order = {}
+    for start in range(0, len(ids), _SQL_BATCH):
+        batch = ids[start:start + _SQL_BATCH]
+        order.update(conn.execute(
+            f"SELECT chunk_id, seq FROM chunks WHERE chunk_id IN ({', '.join('?' * len(batch))})", batch
+        ))
+    if not order:
+        return []
+
+    collection = get_collection()
+    entries = []
+    known = list(order)
+    for start in range(0, len(known), _REBUILD_PAGE_SIZE):
+        page = collection.get(ids=known[start:start + _REBUILD_PAGE_SIZE], include=["documents", "metadatas"])
+        entries.extend(zip(page["ids"], page["documents"], page["metadatas"]))
+    entries.sort(key=lambda entry: order[entry[0]])
+    return [(chunk_id, text or "", metadata or {}) for chunk_id, text, metadata in entries]
+
+
+def _bm25_query(conn: sqlite3.Connection, table: str, query: str, count: int, total_length: int):
+    """
+    クエリの文字バイグラムを語とみなした BM25 のスコア式を組み立てる
+
+    Returns:
+        (クエリのバイグラムと IDF を並べた WITH 句, スコアの式, パラメータ)。
+        一致するバイグラムが無ければ None
+    """
+    if not count:
+        return None
+    avg_length = max(total_length / count, 1.0)
+    query = query.lower()
+    grams = {
+        query[i:i + 2] for i in range(len(query) - 1)
+        if not query[i].isspace() and not query[i + 1].isspace()
+    }
+    idfs = []
+    for gram in grams:
+        df = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE gram = ?", (gram,)).fetchone()[0]
+        if df:
+            idfs += [gram, math.log(1 + (count - df + 0.5) / (df + 0.5))]
+    if not idfs:
+        return None
+    with_clause = f"WITH q (gram, idf) AS (VALUES {', '.join(['(?, ?)'] * (len(idfs) // 2))})"
+    score = (
+        f"SUM(q.idf * p.tf * {_BM25_K1 + 1!r}"
+        f" / (p.tf + {_BM25_K1!r} * (1 - {_BM25_B!r} + {_BM25_B!r} * p.length / {avg_length!r})))"
+    )
+    return with_clause, score, idfs
+
+
+def bm25_search(query: str, limit: int) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
+    """
+    BM25 によるランキングを返す
+
+    スコアの集計と上位の選択は SQLite の中で行い、クエリのバイグラムのポスティングだけを辿る。
+
+    Returns:
+        (本文のスコア上位 limit 件のチャンク, ファイル名のスコア上位 limit 件のファイルの代表チャンク)
+        をそれぞれ (チャンクID, スコア) のリストで返す。代表チャンクは、そのファイルのうち
+        本文のスコアが最も高いチャンク（本文が一致しないファイルは先頭のチャンク）。
+    """
+    conn = _ensure_ready()
+    content_ranking: List[Tuple[str, float]] = []
+    filename_ranking: List[Tuple[str, float]] = []
+    # 件数・ポスティングを同じ時点のインデックスから読む
+    with conn:
+        conn.execute("BEGIN")
+        stats = _stats(conn)
+        content = _bm25_query(conn, "postings", query, stats["chunk_count"], stats["chunk_length"])
+        if content is not None:
+            with_clause, score, params = content
+            content_ranking = conn.execute(
+                f"{with_clause}, top AS ("
+                f" SELECT p.seq, {score} AS score FROM q JOIN postings p ON p.gram = q.gram"
+                " GROUP BY p.seq ORDER BY score DESC LIMIT ?)"
+                " SELECT x.chunk_id, top.score FROM top JOIN chunks x ON x.seq = top.seq"
+                " ORDER BY top.score DESC",
+                [*params, limit],
+            ).fetchall()
+
+        files = _bm25_query(conn, "file_postings", query, stats["file_count"], stats["file_length"])
+        if files is None:
+            return content_ranking, filename_ranking
+        with_clause, score, params = files
+        file_scores = conn.execute(
+            f"{with_clause} SELECT p.filename, {score} AS score"
+            " FROM q JOIN file_postings p ON p.gram = q.gram"
+            " GROUP BY p.filename ORDER BY score DESC LIMIT ?",
+            [*params, limit],
+        ).fetchall()
+        for filename, file_score in file_scores:
+            best = None
+            if content is not None:
+                with_clause, score, params = content
+                best = conn.execute(
+                    f"{with_clause} SELECT x.chunk_id, {score} AS score"
+                    " FROM chunks x CROSS JOIN q CROSS JOIN postings p ON p.gram = q.gram AND p.seq = x.seq"
+                    " WHERE x.filename = ? GROUP BY x.seq ORDER BY score DESC, x.seq LIMIT 1",
+                    [*params, filename],
+                ).fetchone()
+            if best is None:
+                # 本文が一致しなければ先頭（登録順）のチャンク
+                best = conn.execute(
+                    "SELECT chunk_id FROM chunks WHERE filename = ? ORDER BY seq LIMIT 1", (filename,)
+                ).fetchone()
+            if best is not None:
+                filename_ranking.append((best[0], file_score))
+    return content_ranking, filename_ranking
@@ -0,0 +1,205 @@
+"""
+【reindex_service.py の役割】
+-----------------------------------------------------
+- uploads/ 配下の全テキストファイルから、ベクトルDBを作り直す。
+- 検索中のコレクションには手を付けず、新しいコレクションを複数スレッドで構築し、
+  すべて成功したときだけ検索対象を新コレクションに切り替える（切り替えまで検索は止まらない）。
+- 埋め込みAPIはトークンバケットで呼び出し頻度を制限し、429（クォータ超過）時は待って再試行する。
+- ファイルごとの完了状況をチェックポイントに記録し、中断しても続きから再開できる。
+- 構築中にアプリで行われたアップロード・削除は、切り替えの直前に uploads/ と
+  チェックポイントの差分（sync_service.diff_files）を構築中のコレクションへ反映して取り込む。
+  最後の反映と切り替えは write_lock の中で行うので、その間の変更も取りこぼさない。
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional
+
+from google.api_core import exceptions as google_exceptions
+
+from app.core import file_manifest
+from app.core.write_lock import write_lock
+from app.core.config import VECTOR_DB_DIR, VECTOR_COLLECTION_NAME
+from app.core.chromadb_client import (
+    get_collection, drop_collection, get_active_collection_name,
+    set_active_collection_name, mark_corpus_changed,
+)
+from app.services import keyword_index
+from app.services.embed_service import embed_content, delete_from_vectordb, set_embed_rate_limit
+from app.services.sync_service import diff_files
+
+# チェックポイントの保存先
+CHECKPOINT_PATH = os.path.join(VECTOR_DB_DIR, "reindex_checkpoint.json")
+
+# クォータ超過時の再試行回数と初回の待ち時間[秒]（再試行ごとに倍にする）
+_MAX_RETRIES = 5
+_INITIAL_BACKOFF = 10.0
+
+
+def _load_checkpoint() -> Optional[dict]:
+    try:
+        with open(CHECKPOINT_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(checkpoint: dict):
+    tmp_path = f"{CHECKPOINT_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+def _embed_file(file_path: Path, collection) -> dict:
+    """
+    1ファイルを構築中のコレクションに登録する（クォータ超過時は待って再試行）
+    
+    Returns:
+        マニフェストに記録する内容（サイズ・更新日時・ハッシュ・チャンク数）
+    """
+    backoff = _INITIAL_BACKOFF
+    for attempt in range(_MAX_RETRIES + 1):
+        try:
+            # 再試行のたびにファイルを先頭から読み直す（登録済みのチャンクは差分で飛ばされる）
+            stat, digest, blocks = file_manifest.read_file(file_path)
+            chunks = embed_content(blocks, file_path.name, collection=collection)
+            return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest.hexdigest(), "chunks": chunks}
+        except google_exceptions.ResourceExhausted:
+            if attempt == _MAX_RETRIES:
+                raise
+            # 登録済みのバッチは埋め込みキャッシュに残るので、再試行時はAPIを呼ばない
+            print(f"{file_path.name}: API制限に達したため {backoff:.0f}秒待って再試行します")
+            time.sleep(backoff)
+            backoff *= 2
+
+
+def _catch_up(upload_dir: Path, checkpoint: dict, collection) -> Optional[List[str]]:
+    """
+    構築中に uploads/ で追加・変更・削除されたファイルを構築中のコレクションに反映する
+
+    Returns:
+        構築中のコレクションから削除したファイル名（反映できなかった場合は None）
+    """
+    done = checkpoint["done"]
+    try:
+        files = {f.name: f for f in upload_dir.glob("*.txt")}
+        added, changed, removed, touched = diff_files(done, files)
+        for name in removed:
+            delete_from_vectordb(name, collection=collection)
+            del done[name]
+            print(f"[削除] {name}（構築中に削除されたファイル）")
+        for name, stat in touched:
+            done[name].update(size=stat.st_size, mtime=stat.st_mtime)
+        for file_path in added + changed:
+            done[file_path.name] = _embed_file(file_path, collection)
+            print(f"[登録] {file_path.name} - {done[file_path.name]['chunks']}チャンク作成（構築中に更新されたファイル）")
+    except Exception as e:
+        print(f"[エラー] 構築中の変更を反映できませんでした: {e}")
+        traceback.print_exc()
+        return None
+    finally:
+        _save_checkpoint(checkpoint)
+    return removed
+
+
+def run_reindex(
+    upload_dir: Path = Path("uploads"),
+    workers: int = 4,
+    rate_per_min: float = 0,
+    resume: bool = True,
+) -> bool:
+    """
+    ベクトルDBを再構築し、成功したら検索対象を切り替える
+
+    Args:
+        upload_dir: 登録するテキストファイルのディレクトリ
+        workers: 並列に処理するファイル数
+        rate_per_min: 埋め込みAPIのリクエスト数上限[回/分]（0以下で無制限）
+        resume: チェックポイントがあれば続きから再開する
+
+    Returns:
+        全ファイルの登録に成功し、切り替えまで完了したら True
+    """
+    if rate_per_min > 0:
+        set_embed_rate_limit(rate_per_min, burst=workers)
+
+    files = sorted(upload_dir.glob("*.txt"))
+    print(f"合計 {len(files)} 個のファイルを処理します...")
+
+    # 構築先コレクションを決める（再開時は前回の構築途中のコレクションを使う）
+    checkpoint = _load_checkpoint() if resume else None
+    if checkpoint:
+        build_name = checkpoint["collection"]
+        print(f"チェックポイントから再開します: {build_name}（完了済み {len(checkpoint['done'])} ファイル）")
+    else:
+        previous = _load_checkpoint()
+        if previous:
+            drop_collection(previous["collection"])
+        build_name = f"{VECTOR_COLLECTION_NAME}_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        checkpoint = {"collection": build_name, "done": {}}
+        _save_checkpoint(checkpoint)
+        print(f"新しいコレクション '{build_name}' を構築します")
+    collection = get_collection(build_name)
+
+    pending = [f for f in files if f.name not in checkpoint["done"]]
+    checkpoint_lock = threading.Lock()
+    error_count = 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rag-reindex") as executor:
+        futures = {executor.submit(_embed_file, f, collection): f for f in pending}
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"[エラー] {file_path.name}: {e}")
+                traceback.print_exc()
+                error_count += 1
+                continue
+            with checkpoint_lock:
+                checkpoint["done"][file_path.name] = entry
+                _save_checkpoint(checkpoint)
+                done = len(checkpoint["done"])
+            print(f"[{done}/{len(files)}] {file_path.name} - {entry['chunks']}チャンク作成")
+
+    elapsed = time.perf_counter() - started
+    total_chunks = sum(entry["chunks"] for entry in checkpoint["done"].values())
+    print("\n==== 再インデックス結果 ====")
+    print(f"処理成功: {len(checkpoint['done'])} ファイル")
+    print(f"エラー: {error_count} ファイル")
+    print(f"作成されたチャンク数: {total_chunks}（{elapsed:.1f}秒）")
+
+    if error_count:
+        print("エラーがあったため検索対象は切り替えません。再実行すると続きから処理します")
+        return False
+
+    # 構築中のアップロード・削除を取り込んでから、検索対象を新しいコレクションに切り替え、
+    # 古いコレクションを削除する。ロックを取る前にほとんどの差分を反映しておき、
+    # ロックの中（アプリ側のアップロード・削除を待たせる間）では残りの差分だけを反映する
+    removed = _catch_up(upload_dir, checkpoint, collection)
+    if removed is None:
+        print("検索対象は切り替えません。再実行すると続きから処理します")
+        return False
+    with write_lock():
+        remaining = _catch_up(upload_dir, checkpoint, collection)
+        if remaining is None:
+            print("検索対象は切り替えません。再実行すると続きから処理します")
+            return False
+        old_name = get_active_collection_name()
+        set_active_collection_name(build_name)
+        keyword_index.rebuild()
+        file_manifest.merge(checkpoint["done"], removed + remaining)
+        mark_corpus_changed()
+        if old_name != build_name:
+            drop_collection(old_name)
+    os.remove(CHECKPOINT_PATH)
+    print(f"検索対象を '{old_name}' から '{build_name}' に切り替えました（{collection.count()}件）")
+    return True
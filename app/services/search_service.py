@@ -6,13 +6,26 @@
 - 後続の回答生成（generate_service.py）に渡す「関連文書リスト」を作成する。
 """
 
-import google.generativeai as genai
+import asyncio
+import logging
+import os
 import re
-from app.core.config import LLM_API_KEY, LLM_EMBED_MODEL
-from app.core.chromadb_client import collection, client
+from app.core.config import (
+    QUERY_EMBED_CACHE_SIZE, QUERY_EMBED_CACHE_TTL, RETRIEVAL_MODE, RRF_K,
+    SEARCH_CANDIDATE_FACTOR, MAX_CHUNKS_PER_DOCUMENT, EMBED_BATCH_SIZE,
+)
+from app.core.lru_cache import LRUCache
+from app.core.concurrency import run_blocking
+from app.core import metrics
+from app.core.chromadb_client import get_collection, get_collection_stats
+from app.services import keyword_index
+from app.services.embed_service import embed_texts
+from app.services.embedder import get_embedder
 
-# APIキーの設定
-genai.configure(api_key=LLM_API_KEY)
+logger = logging.getLogger(__name__)
+
+# 正規化済みの質問 → 質問ベクトル のキャッシュ
+_query_embedding_cache = LRUCache(QUERY_EMBED_CACHE_SIZE, ttl=QUERY_EMBED_CACHE_TTL)
 
 def normalize_question(question: str) -> str:
     """質問文の正規化（末尾の？を削除したり、キーワードを抽出）"""
@@ -69,20 +82,58 @@ def get_keyword_priority(keyword: str) -> float:
     # デフォルトの重要度
     return 1.0
 
+def embed_query(normalized_query: str) -> list:
+    """正規化済みの質問をベクトル化する（同じ質問はメモリキャッシュから返す）"""
+    return embed_queries([normalized_query])[0]
+
+def embed_queries(normalized_queries: list) -> list:
+    """複数の質問をベクトル化する（キャッシュに無い質問だけを1回のリクエストでまとめて送る）"""
+    name = get_embedder().name
+    embeddings = [_query_embedding_cache.get((name, query)) for query in normalized_queries]
+    missing = list(dict.fromkeys(
+        query for query, embedding in zip(normalized_queries, embeddings) if embedding is None
+    ))
+    if missing:
+        # 1リクエストで送れる件数に合わせて分割する
+        new_embeddings = {}
+        with metrics.span("embed_query"):
+            for start in range(0, len(missing), EMBED_BATCH_SIZE):
+                batch = missing[start:start + EMBED_BATCH_SIZE]
+                new_embeddings.update(zip(batch, embed_texts(batch, task_type="retrieval_query")))
+        for query, embedding in new_embeddings.items():
+            _query_embedding_cache.put((name, query), embedding)
+        embeddings = [
+            new_embeddings[query] if embedding is None else embedding
+            for query, embedding in zip(normalized_queries, embeddings)
+        ]
+    return embeddings
+
+def get_query_embedding_cache_stats() -> dict:
+    """質問ベクトルキャッシュのヒット/ミス数"""
+    return _query_embedding_cache.stats()
+
 # 直接ファイル名検索を行う関数
 def search_by_filename(keywords: list) -> list:
-    """キーワードに一致するファイル名を持つドキュメントを検索"""
+    """
+    キーワードに一致するファイル名を持つドキュメントを検索
+    
+    候補は多くなりうるので本文（text）は None のまま返す。
+    本文とメタデータは merge_results で選ばれた候補の分だけ取り出す。
+    """
+    with metrics.span("filename_scan"):
+        return _search_by_filename(keywords)
+
+def _search_by_filename(keywords: list) -> list:
     matched_docs = []
-    matched_ids = set()
     
-    # 全ドキュメントを一度に取得
+    # 全ドキュメントを走査せず、キーワードインデックスのポスティングだけを参照する
     try:
-        all_docs = collection.get()
-        if not all_docs["ids"]:
-            print("コレクションにドキュメントが見つかりませんでした")
+        total = keyword_index.size()
+        if not total:
+            logger.info("コレクションにドキュメントが見つかりませんでした")
             return []
             
-        print(f"コレクション内のドキュメント総数: {len(all_docs['ids'])}")
+        logger.debug("コレクション内のドキュメント総数: %d", total)
         
         # 短すぎるキーワードをフィルタリング（3文字未満は除外）
         important_keywords = [kw for kw in keywords if len(kw) >= 3]
@@ -91,163 +142,372 @@ def search_by_filename(keywords: list) -> list:
         if not important_keywords and keywords:
             important_keywords = sorted(keywords, key=lambda x: len(x), reverse=True)[:3]
         
-        # 各ドキュメントのファイル名と内容をチェック
-        for i, metadata in enumerate(all_docs["metadatas"]):
-            filename = metadata.get("filename", "")
-            doc_id = all_docs["ids"][i]
-            document_text = all_docs["documents"][i]
-            
-            # ファイル名と文書内容の両方でマッチングスコアを計算
-            filename_matches = []
+        # チャンクIDごとにマッチしたキーワードを集計
+        filename_hits = {}
+        content_hits = {}
+        question_candidates = set()
+        for keyword in important_keywords:
+            # キーワードの重要度
+            priority = get_keyword_priority(keyword)
+            
+            # ファイル名に含まれるか
+            for doc_id in keyword_index.match_filename(keyword):
+                filename_hits.setdefault(doc_id, []).append((keyword, priority))
+            
+            # 文書内容に含まれるか（優先度の補正は後で行う）
+            for doc_id in keyword_index.match_content(keyword):
+                content_hits.setdefault(doc_id, []).append((keyword, priority))
+            
+            # 「### Q:」の直後に含まれる可能性があるチャンク（大文字・小文字は本文で確かめる）
+            question_candidates |= keyword_index.match_content("### q:" + keyword)
+        
+        # 質問部分に含まれるかは、候補のチャンクだけ本文を取り出して確かめる
+        question_texts = {
+            doc_id: document_text
+            for doc_id, document_text, _ in keyword_index.get_chunks(question_candidates)
+        }
+        
+        # マッチしたチャンクを登録順にスコア計算（本文は読まない）
+        for doc_id, filename in keyword_index.chunk_files(set(filename_hits) | set(content_hits)):
+            filename_matches = filename_hits.get(doc_id, [])
             content_matches = []
+            document_text = question_texts.get(doc_id, "")
+            
+            for keyword, priority in content_hits.get(doc_id, []):
+                # QAペアで質問部分に含まれる場合はさらに重要度を上げる
+                if "### Q:" in document_text and "### Q:" + keyword in document_text:
+                    content_matches.append((keyword, priority * 1.5))
+                else:
+                    content_matches.append((keyword, priority))
+            
+            # ファイル名マッチのスコア（最大50点）
+            filename_score = sum(priority * 15 for _, priority in filename_matches)
+            filename_score = min(filename_score, 50)
+            
+            # 内容マッチのスコア（最大20点）
+            content_score = sum(priority * 5 for _, priority in content_matches)
+            content_score = min(content_score, 20)
+            
+            # 基本スコア
+            base_score = 10
             
-            # マッチするキーワードを保存
-            for keyword in important_keywords:
-                # キーワードの重要度
-                priority = get_keyword_priority(keyword)
-                
-                # ファイル名に含まれるか
-                if keyword.lower() in filename.lower():
-                    filename_matches.append((keyword, priority))
-                
-                # 文書内容に含まれるか（QAドキュメントの場合は質問部分を重視）
-                if keyword.lower() in document_text.lower():
-                    # QAペアで質問部分に含まれる場合はさらに重要度を上げる
-                    if "### Q:" in document_text and "### Q:" + keyword in document_text:
-                        content_matches.append((keyword, priority * 1.5))
-                    else:
-                        content_matches.append((keyword, priority))
-            
-            # スコア計算
-            if filename_matches or content_matches:
-                # ファイル名マッチのスコア（最大50点）
-                filename_score = sum(priority * 15 for _, priority in filename_matches)
-                filename_score = min(filename_score, 50)
-                
-                # 内容マッチのスコア（最大20点）
-                content_score = sum(priority * 5 for _, priority in content_matches)
-                content_score = min(content_score, 20)
-                
-                # 基本スコア
-                base_score = 10
-                
-                # 合計スコア（最大80点）
-                total_score = base_score + filename_score + content_score
-                
-                if doc_id not in matched_ids:
-                    matched_ids.add(doc_id)
-                    matched_docs.append({
-                        "text": document_text,
-                        "metadata": metadata,
-                        "score": total_score
-                    })
-                    
-                    # マッチしたキーワードをログ出力
-                    if filename_matches:
-                        keywords_str = ', '.join([k for k, _ in filename_matches])
-                        print(f"ファイル名キーワード '{keywords_str}' が '{filename}' に一致")
-    except Exception as e:
-        print(f"ファイル名検索エラー: {e}")
+            # 合計スコア（最大80点）
+            total_score = base_score + filename_score + content_score
+            
+            matched_docs.append({
+                "id": doc_id,
+                "text": None,
+                # 多様性の判定（select_diverse）に使う分だけ。選ばれたら登録時のメタデータに置き換える
+                "metadata": {"filename": filename, "document_id": os.path.splitext(filename)[0]},
+                "score": total_score
+            })
+            
+            # マッチしたキーワードをログ出力
+            if filename_matches and logger.isEnabledFor(logging.DEBUG):
+                keywords_str = ', '.join([k for k, _ in filename_matches])
+                logger.debug("ファイル名キーワード '%s' が '%s' に一致", keywords_str, filename)
+    except Exception:
+        logger.exception("ファイル名検索エラー")
     
     return matched_docs
 
-# ユーザの質問をベクトル検索し、関連文書を返す
-def search_related_docs(query: str, top_k: int = 5) -> list[str]:
-    # 質問を正規化
-    normalized_query = normalize_question(query)
-    
-    # キーワード抽出
-    keywords = extract_keywords(normalized_query)
-    print(f"検索キーワード: {keywords}")  # デバッグ用
+def prepare_query(query: str) -> tuple:
+    """質問を正規化し、キーワードを抽出する"""
+    with metrics.span("prepare"):
+        # 質問を正規化
+        normalized_query = normalize_question(query)
+        
+        # キーワード抽出
+        keywords = extract_keywords(normalized_query)
+    logger.debug("検索キーワード: %s", keywords)
+    return normalized_query, keywords
+
+def log_collection_stats():
+    """コレクションの状態を確認（件数のみ。キャッシュ済みならDBにはアクセスしない）"""
+    try:
+        collection_info = get_collection_stats()
+        logger.debug("コレクションの状態: %d件のドキュメントが登録済み", collection_info["count"])
+    except Exception:
+        logger.warning("コレクション情報取得エラー", exc_info=True)
+
+def _format_chunk(text: str, metadata: dict) -> str:
+    """QAペアは元の質問を先頭に付けて返す"""
+    if metadata.get("content_type") == "qa_pair":
+        return f"元の質問: {metadata.get('question', '')}\n{text}"
+    return text
+
+def search_by_vector(normalized_query: str, keywords: list, top_k: int = 5) -> list:
+    """質問ベクトルでベクトルDBを検索し、スコア付きの候補を順位順に返す"""
+    return search_by_vector_batch([normalized_query], [keywords], top_k)[0]
+
+def search_by_vector_batch(normalized_queries: list, keywords_list: list, top_k: int = 5) -> list:
+    """
+    複数の質問をまとめてベクトル検索し、質問ごとにスコア付きの候補を順位順に返す
     
-    # コレクションの状態を確認
+    質問のベクトル化は1回のリクエストに、ベクトルDBの検索は1回の複数クエリ検索にまとめる。
+    """
+    candidates_list = [[] for _ in normalized_queries]
+    if not normalized_queries:
+        return candidates_list
     try:
-        collection_info = collection.get()
-        print(f"コレクションの状態: {len(collection_info['ids'])}件のドキュメントが登録済み")
-    except Exception as e:
-        print(f"コレクション情報取得エラー: {e}")
+        # 質問をベクトル化（同じ質問ならキャッシュ済みのベクトルを使う）
+        embedings = embed_queries(normalized_queries)
+
+        # ベクトルDBから関連文書を検索
+        with metrics.span("chroma_query"):
+            results = get_collection().query(
+                query_embeddings = embedings,           # ベクトル化した質問
+                n_results = top_k * SEARCH_CANDIDATE_FACTOR,  # 結果数を増やして多様性を確保
+                include = ["documents", "metadatas", "distances"]    # 文章本体とメタ情報、距離情報を返す
+            )
+    except Exception:
+        logger.exception("ベクトル検索中にエラーが発生しました")
+        return candidates_list
     
-    # 結果を格納するリスト
-    scored_docs = []
+    for q, (keywords, candidates) in enumerate(zip(keywords_list, candidates_list)):
+        # 検索結果があれば処理
+        if not results["metadatas"] or not results["metadatas"][q]:
+            continue
+        logger.debug("ベクトル検索結果: %d件", len(results["metadatas"][q]))
+        
+        # 各検索結果をスコア付きでリストに追加
+        for i, doc in enumerate(results["documents"][q]):
+            meta = results["metadatas"][q][i]
+            
+            # ベクトル距離からスコアを計算（距離が小さいほど関連性が高い）
+            # 一般的にchromadbの距離は0〜2の範囲に収まることが多い
+            distance = results["distances"][q][i] if "distances" in results else 0
+            vector_score = max(0, 30 - (distance * 20))  # 距離が0なら30点、距離が1.5以上なら0点
+            
+            # キーワードマッチングスコア（最大20点）
+            keyword_matches = sum(1 for kw in keywords if kw.lower() in doc.lower())
+            keyword_score = min(keyword_matches * 4, 20)
+            
+            # 順位スコア（最大10点）- 上位結果ほど信頼性が高い
+            rank_score = max(0, 10 - i)
+            
+            # 合計スコア（最大60点）
+            score = vector_score + keyword_score + rank_score
+            
+            # QAペアの場合ボーナススコア
+            if meta.get("content_type") == "qa_pair":
+                score += 5
+            
+            # 質問と元の質問の情報を追加
+            candidates.append({
+                "id": results["ids"][q][i],
+                "text": _format_chunk(doc, meta),
+                "metadata": meta,
+                "score": score
+            })
     
-    # 1. まずファイル名に基づく直接検索
-    filename_matches = search_by_filename(keywords)
-    scored_docs.extend(filename_matches)
+    return candidates_list
+
+def select_diverse(docs: list, top_k: int = 5, max_per_document: int = MAX_CHUNKS_PER_DOCUMENT) -> list:
+    """
+    スコア順に並んだ候補から、同じチャンクの重複を除き、
+    1文書あたり max_per_document 件（0以下で無制限）までに抑えて上位 top_k 件を選ぶ
     
-    # 2. 次にベクトル検索
-    try:
-        # 質問をベクトル化
-        embeding = genai.embed_content(
-            model=LLM_EMBED_MODEL,
-            content = normalized_query,             # ベクトル化する文章
-            task_type = "retrieval_query"           # ベクトル化のタスク
-        )["embedding"]
+    チャンクIDと文書IDごとの件数は辞書・集合で管理するので、候補数に比例する時間で済む。
+    """
+    selected = []
+    seen_ids = set()
+    per_document = {}
+    for doc in docs:
+        chunk_id = doc.get("id")
+        if chunk_id in seen_ids:
+            continue
+        document_id = doc["metadata"].get("document_id", "")
+        count = per_document.get(document_id, 0)
+        if max_per_document > 0 and count >= max_per_document:
+            continue
+        seen_ids.add(chunk_id)
+        per_document[document_id] = count + 1
+        selected.append(doc)
+        if len(selected) >= top_k:
+            break
+    return selected
 
-        # ベクトルDBから関連文書を検索
-        results = collection.query(
-            query_embeddings = [embeding],          # ベクトル化した質問
-            n_results = top_k * 3,                  # 結果数を増やして多様性を確保
-            include = ["documents", "metadatas", "distances"]    # 文章本体とメタ情報、距離情報を返す
-        )
+def merge_results(filename_matches: list, vector_candidates: list, top_k: int = 5) -> list[dict]:
+    """ファイル名検索とベクトル検索の結果をまとめ、スコア上位の文書（テキスト・メタデータ・スコア）を返す"""
+    with metrics.span("merge"):
+        # スコア順に並べ替え（同じチャンクは後の select_diverse で高いスコアの方だけ残る）
+        scored_docs = sorted(filename_matches + vector_candidates, key=lambda x: x["score"], reverse=True)
+        results = select_diverse(scored_docs, top_k)
         
-        # 検索結果があれば処理
-        if results["metadatas"] and results["metadatas"][0]:
-            print(f"ベクトル検索結果: {len(results['metadatas'][0])}件")
-            
-            # 各検索結果をスコア付きでリストに追加
-            for i, doc in enumerate(results["documents"][0]):
-                meta = results["metadatas"][0][i]
-                
-                # ベクトル距離からスコアを計算（距離が小さいほど関連性が高い）
-                # 一般的にchromadbの距離は0〜2の範囲に収まることが多い
-                distance = results["distances"][0][i] if "distances" in results else 0
-                vector_score = max(0, 30 - (distance * 20))  # 距離が0なら30点、距離が1.5以上なら0点
-                
-                # キーワードマッチングスコア（最大20点）
-                keyword_matches = sum(1 for kw in keywords if kw.lower() in doc.lower())
-                keyword_score = min(keyword_matches * 4, 20)
-                
-                # 順位スコア（最大10点）- 上位結果ほど信頼性が高い
-                rank_score = max(0, 10 - i)
-                
-                # 合計スコア（最大60点）
-                score = vector_score + keyword_score + rank_score
-                
-                # QAペアの場合ボーナススコア
-                if meta.get("content_type") == "qa_pair":
-                    score += 5
-                
-                # すでに同じドキュメントがあるか確認
-                doc_id = meta.get("document_id", "")
-                is_duplicate = any(
-                    d["metadata"].get("document_id", "") == doc_id 
-                    for d in scored_docs
-                )
-                
-                if not is_duplicate:
-                    # 質問と元の質問の情報を追加
-                    scored_docs.append({
-                        "text": f"元の質問: {meta.get('question', '')}\n{doc}" if meta.get("content_type") == "qa_pair" else doc,
-                        "metadata": meta,
-                        "score": score
-                    })
-    except Exception as e:
-        print(f"ベクトル検索中にエラーが発生しました: {e}")
-    
-    # スコア順に並べ替え
-    scored_docs.sort(key=lambda x: x["score"], reverse=True)
+        # ファイル名検索の候補は、選ばれたものだけ本文とメタデータを取り出す
+        # （ベクトル検索の候補と同じく、QAペアは元の質問を付けた本文にする）
+        missing = [doc["id"] for doc in results if doc["text"] is None]
+        if missing:
+            chunks = {
+                chunk_id: (_format_chunk(text, metadata), metadata)
+                for chunk_id, text, metadata in keyword_index.get_chunks(missing)
+            }
+            results = [
+                {**doc, "text": chunks[doc["id"]][0], "metadata": chunks[doc["id"]][1]}
+                if doc["text"] is None else doc
+                for doc in results
+                if doc["text"] is not None or doc["id"] in chunks
+            ]
     
     # 関連文書が無ければ空リストを返す
-    if not scored_docs:
-        print("関連文書が見つかりませんでした")
+    if not results:
+        logger.info("関連文書が見つかりませんでした")
         return []
     
-    # スコア付きの結果をログ出力
-    print(f"検索結果 {len(scored_docs)} 件:")
-    for i, doc in enumerate(scored_docs[:top_k]):
+    logger.info("検索結果: 候補 %d 件から %d 件を選択", len(scored_docs), len(results))
+    _log_results(results)
+    return results
+
+def _log_results(results: list):
+    """スコア付きの結果をログ出力する（DEBUG のときだけ）"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    for i, doc in enumerate(results):
         doc_preview = doc["text"][:50].replace("\n", " ")
         filename = doc["metadata"].get("filename", "不明")
-        print(f"  {i+1}. スコア:{doc['score']} - [{filename}] {doc_preview}...")
+        logger.debug("  %d. スコア:%s - [%s] %s...", i + 1, doc["score"], filename, doc_preview)
+
+def search_by_bm25(normalized_query: str, top_k: int = 5) -> list:
+    """
+    文字バイグラムの BM25 で検索し、順位リスト（本文・ファイル名）を返す
+
+    Returns:
+        [本文のランキング, ファイル名のランキング]（それぞれ (チャンクID, スコア) のリスト）
+    """
+    try:
+        with metrics.span("bm25"):
+            content_ranking, filename_ranking = keyword_index.bm25_search(
+                normalized_query, top_k * SEARCH_CANDIDATE_FACTOR
+            )
+        logger.debug("BM25検索結果: 本文 %d件 / ファイル名 %d件", len(content_ranking), len(filename_ranking))
+        return [content_ranking, filename_ranking]
+    except Exception:
+        logger.exception("BM25検索エラー")
+        return []
+
+def fuse_results(sparse_rankings: list, vector_candidates: list, top_k: int = 5) -> list[dict]:
+    """
+    BM25 とベクトル検索の順位を Reciprocal Rank Fusion で統合し、上位の文書を返す
+
+    各ランキングでの順位 r（1始まり）ごとに 1 / (RRF_K + r) を足し合わせた値をスコアとする。
+    点数の尺度が異なる検索結果でも、順位だけを使うので公平に統合できる。
+    """
+    with metrics.span("merge"):
+        results = _fuse(sparse_rankings, vector_candidates, top_k)
+    
+    if not results:
+        logger.info("関連文書が見つかりませんでした")
+        return []
+    
+    logger.info("検索結果 %d 件（RRF）", len(results))
+    _log_results(results)
+    return results
+
+def _fuse(sparse_rankings: list, vector_candidates: list, top_k: int) -> list[dict]:
+    rankings = [[chunk_id for chunk_id, _ in ranking] for ranking in sparse_rankings]
+    rankings.append([candidate["id"] for candidate in vector_candidates])
+    
+    fused = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank)
+    ranked_ids = sorted(fused, key=fused.get, reverse=True)
+    
+    # 本文とメタデータはベクトル検索の結果かキーワードインデックスから取り出す
+    known = {candidate["id"]: candidate for candidate in vector_candidates}
+    chunks = {
+        chunk_id: (text, metadata)
+        for chunk_id, text, metadata in keyword_index.get_chunks(
+            [chunk_id for chunk_id in ranked_ids if chunk_id not in known]
+        )
+    }
+    candidates = []
+    for chunk_id in ranked_ids:
+        if chunk_id in known:
+            text, metadata = known[chunk_id]["text"], known[chunk_id]["metadata"]
+        elif chunk_id in chunks:
+            text, metadata = chunks[chunk_id]
+            text = _format_chunk(text, metadata)
+        else:
+            continue
+        candidates.append({
+            "id": chunk_id,
+            "text": text,
+            "metadata": metadata,
+            "score": round(fused[chunk_id], 6)
+        })
+    return select_diverse(candidates, top_k)
+
+# ユーザの質問をベクトル検索し、関連文書を返す
+def search_related_docs(query: str, top_k: int = 5) -> list[str]:
+    normalized_query, keywords = prepare_query(query)
+    log_collection_stats()
+    
+    if RETRIEVAL_MODE == "hybrid":
+        # BM25 とベクトル検索の順位を統合する
+        sparse_rankings = search_by_bm25(normalized_query, top_k)
+        vector_candidates = search_by_vector(normalized_query, keywords, top_k)
+        docs = fuse_results(sparse_rankings, vector_candidates, top_k)
+        return [doc["text"] for doc in docs]
+    
+    # 1. まずファイル名に基づく直接検索
+    filename_matches = search_by_filename(keywords)
+    
+    # 2. 次にベクトル検索
+    vector_candidates = search_by_vector(normalized_query, keywords, top_k)
     
     # テキストだけのリストに変換して返す
-    return [doc["text"] for doc in scored_docs[:top_k]]
+    return [doc["text"] for doc in merge_results(filename_matches, vector_candidates, top_k)]
+
+async def search_related_docs_async(query: str, top_k: int = 5) -> list[str]:
+    """search_related_docs の非同期版"""
+    return [doc["text"] for doc in await search_documents_async(query, top_k)]
+
+async def search_documents_async(query: str, top_k: int = 5) -> list[dict]:
+    """
+    関連文書をメタデータ・スコア付きで返す（非同期）
+    
+    ファイル名・キーワード検索（RETRIEVAL_MODE=hybrid では BM25）と「質問ベクトル化 + ベクトル検索」を
+    ブロッキング処理用のスレッドプールで並行に実行する。
+    """
+    normalized_query, keywords = prepare_query(query)
+    
+    if RETRIEVAL_MODE == "hybrid":
+        _, sparse_rankings, vector_candidates = await asyncio.gather(
+            run_blocking(log_collection_stats),
+            run_blocking(search_by_bm25, normalized_query, top_k),
+            run_blocking(search_by_vector, normalized_query, keywords, top_k),
+        )
+        return fuse_results(sparse_rankings, vector_candidates, top_k)
+    
+    _, filename_matches, vector_candidates = await asyncio.gather(
+        run_blocking(log_collection_stats),
+        run_blocking(search_by_filename, keywords),
+        run_blocking(search_by_vector, normalized_query, keywords, top_k),
+    )
+    
+    return merge_results(filename_matches, vector_candidates, top_k)
+
+def search_documents_batch(queries: list, top_k: int = 5) -> list:
+    """
+    複数の質問の関連文書をまとめて検索し、質問ごとにメタデータ・スコア付きで返す（同期）
+    
+    ベクトル検索はすべての質問を1回にまとめ、キーワード検索（BM25）は質問ごとに行う。
+    """
+    prepared = [prepare_query(query) for query in queries]
+    normalized_queries = [normalized for normalized, _ in prepared]
+    keywords_list = [keywords for _, keywords in prepared]
+    log_collection_stats()
+    
+    vector_candidates_list = search_by_vector_batch(normalized_queries, keywords_list, top_k)
+    
+    results = []
+    for (normalized_query, keywords), vector_candidates in zip(prepared, vector_candidates_list):
+        if RETRIEVAL_MODE == "hybrid":
+            sparse_rankings = search_by_bm25(normalized_query, top_k)
+            results.append(fuse_results(sparse_rankings, vector_candidates, top_k))
+        else:
+            filename_matches = search_by_filename(keywords)
+            results.append(merge_results(filename_matches, vector_candidates, top_k))
+    return results
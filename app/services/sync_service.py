@@ -0,0 +1,112 @@
+"""
+【sync_service.py の役割】
+-----------------------------------------------------
+- uploads/ 配下のファイルとベクトルDBを増分同期する（reindex.py --sync）。
+- マニフェスト（サイズ・更新日時・内容のハッシュ）と比較して
+  追加・変更・削除されたファイルだけを検出し、そのファイルだけを登録し直す。
+- サイズと更新日時が記録と同じファイルは、中身を読まずに「変更なし」と判定する。
+- 登録が終わっていない（登録待ち・失敗・状態不明の）ファイルは「変更あり」として登録し直す。
+- 同じ比較（diff_files）は、再インデックスの切り替え前に構築中のコレクションを
+  uploads/ に追いつかせるのにも使う。
+"""
+
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.core import file_manifest
+from app.services.embed_service import embed_content, delete_from_vectordb
+
+
+def _reembed(file_path: Path) -> int:
+    """ファイルを登録し直し（変わったチャンクだけ）、マニフェストを更新する"""
+    stat, digest, blocks = file_manifest.read_file(file_path)
+    chunks = embed_content(blocks, file_path.name)
+    file_manifest.record(file_path.name, stat, digest.hexdigest(), chunks)
+    return chunks
+
+
+def diff_files(
+    entries: Dict[str, dict],
+    files: Dict[str, Path],
+) -> Tuple[List[Path], List[Path], List[str], List[Tuple[str, os.stat_result]]]:
+    """
+    登録済みの記録とファイルを比べ、登録し直すべきファイルを調べる
+
+    Args:
+        entries: ファイル名 → 記録（size, mtime, sha256。status が無ければ登録済みとみなす）
+        files: ファイル名 → 現在のファイル
+
+    Returns:
+        (追加されたファイル, 変更されたファイル, 削除されたファイル名,
+         中身は同じで stat だけ変わった (ファイル名, stat))
+    """
+    added, changed, touched = [], [], []
+    for name, file_path in files.items():
+        entry = entries.get(name)
+        if entry is None:
+            added.append(file_path)
+            continue
+        if entry.get("status", file_manifest.STATUS_COMPLETED) != file_manifest.STATUS_COMPLETED:
+            changed.append(file_path)
+            continue
+        stat = file_path.stat()
+        if stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]:
+            continue
+        # サイズか更新日時が違う場合だけ中身のハッシュを比べる
+        if stat.st_size == entry["size"] and file_manifest.hash_file(file_path) == entry["sha256"]:
+            touched.append((name, stat))
+        else:
+            changed.append(file_path)
+    removed = [name for name in entries if name not in files]
+    return added, changed, removed, touched
+
+
+def sync_uploads(upload_dir: Path = Path("uploads"), workers: int = 4) -> bool:
+    """
+    uploads/ とベクトルDBを増分同期する
+
+    Args:
+        upload_dir: 同期するテキストファイルのディレクトリ
+        workers: 並列に登録し直すファイル数
+
+    Returns:
+        すべてのファイルを同期できたら True
+    """
+    started = time.perf_counter()
+    files = {f.name: f for f in upload_dir.glob("*.txt")}
+    added, changed, removed, touched = diff_files(file_manifest.get_all(), files)
+    for name, stat in touched:
+        file_manifest.touch(name, stat)
+
+    print(f"追加: {len(added)} / 変更: {len(changed)} / 削除: {len(removed)} / "
+          f"変更なし: {len(files) - len(added) - len(changed)} ファイル")
+
+    error_count = 0
+    for name in removed:
+        try:
+            deleted = delete_from_vectordb(name)
+            file_manifest.remove(name)
+            print(f"[削除] {name} - {deleted}チャンク削除")
+        except Exception as e:
+            print(f"[エラー] {name}: {e}")
+            error_count += 1
+
+    targets = added + changed
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rag-sync") as executor:
+        futures = {executor.submit(_reembed, f): f for f in targets}
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                chunks = future.result()
+                print(f"[登録] {file_path.name} - {chunks}チャンク作成")
+            except Exception as e:
+                print(f"[エラー] {file_path.name}: {e}")
+                traceback.print_exc()
+                error_count += 1
+
+    print(f"同期完了（{time.perf_counter() - started:.1f}秒、エラー: {error_count} ファイル）")
+    return error_count == 0
@@ -0,0 +1,9 @@
+"""
+【benchmarks パッケージの役割】
+-----------------------------------------------------
+- Gemini の利用枠を使わずに、登録（embed_content）・検索（search_related_docs）・
+  /api/ask の処理性能を測るベンチマーク。
+- corpus.py     : 日本語の文書とFAQファイルを指定チャンク数ぶん生成する（シード固定で再現可能）
+- fake_genai.py : google.generativeai を決定的なローカル実装に差し替える（遅延を指定可能）
+- run.py        : 実行スクリプト（python -m benchmarks.run）
+"""
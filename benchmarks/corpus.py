@@ -0,0 +1,122 @@
+"""
+【corpus.py の役割】
+-----------------------------------------------------
+- ベンチマーク用の日本語の社内文書（規程・案内）とFAQファイルを生成する。
+- 部署・手続き・窓口などの語彙を組み合わせた文を作るので、ファイル名検索・キーワード検索・
+  ベクトル検索のいずれにも当たりうる、実際の社内文書に近い分布になる。
+- 同じシードなら同じ文書・同じ質問が生成される（ベンチマークの再現性のため）。
+"""
+
+import random
+from typing import List, Tuple
+
+DEPARTMENTS = ["人事部", "経理部", "総務部", "情報システム部", "営業部", "法務部", "広報部", "開発部"]
+SUBJECTS = [
+    "出張費", "有給休暇", "在宅勤務", "経費精算", "備品購入", "社内研修", "健康診断", "育児休業",
+    "交通費", "パソコン貸与", "名刺発注", "会議室予約", "入館証", "退職手続", "年末調整", "社宅",
+]
+ACTIONS = ["申請", "承認", "変更", "取消", "確認", "問い合わせ"]
+TOOLS = ["社内ポータル", "ワークフローシステム", "メール", "専用フォーム", "勤怠システム", "経費精算システム"]
+DEADLINES = ["前日まで", "3営業日前まで", "月末まで", "翌月5日まで", "1週間前まで", "当日中"]
+
+_SENTENCES = [
+    "{subject}の{action}は{tool}から行ってください。",
+    "{subject}について不明な点は{dept}（内線{ext}）に問い合わせてください。",
+    "{subject}の{action}期限は{deadline}です。",
+    "{dept}では{subject}に関する規程を毎年見直しています。",
+    "{subject}の{action}には上長の承認が必要です。",
+    "{tool}に{subject}の{action}手順が掲載されています。",
+    "期限を過ぎた{subject}の{action}は、理由を添えて{dept}に相談してください。",
+    "{subject}の対象者と条件は、雇用区分によって異なる場合があります。",
+]
+_QUESTIONS = [
+    "{subject}の{action}方法を教えてください。",
+    "{subject}の{action}はいつまでですか？",
+    "{subject}の担当部署はどこですか？",
+    "{subject}を{action}するときに必要なものは何ですか？",
+]
+_QUERIES = [
+    "{subject}の{action}方法は？",
+    "{dept}の{subject}について教えてください",
+    "{subject}の{action}期限はいつですか",
+    "{subject}を{action}したい",
+    "{subject} {action}",
+]
+
+# 通常テキストの1チャンクあたりの新しい文字数の目安（MAX_CHUNK_SIZE - CHUNK_OVERLAP）
+_CHARS_PER_CHUNK = 350
+
+
+def _fill(template: str, rng: random.Random, subject: str = None) -> str:
+    return template.format(
+        subject=subject or rng.choice(SUBJECTS),
+        action=rng.choice(ACTIONS),
+        tool=rng.choice(TOOLS),
+        deadline=rng.choice(DEADLINES),
+        dept=rng.choice(DEPARTMENTS),
+        ext=rng.randint(1000, 9999),
+    )
+
+
+def _text_document(rng: random.Random, subject: str, chunks: int) -> str:
+    """通常テキストの文書（およそ chunks 個のチャンクになる長さ）"""
+    sentences = []
+    length = 0
+    while length < chunks * _CHARS_PER_CHUNK:
+        sentence = _fill(rng.choice(_SENTENCES), rng, subject if rng.random() < 0.7 else None)
+        sentences.append(sentence)
+        length += len(sentence)
+        # 段落の区切り
+        if rng.random() < 0.15:
+            sentences.append("\n\n")
+    return "".join(sentences).strip() + "\n"
+
+
+def _faq_document(rng: random.Random, subject: str, chunks: int) -> str:
+    """QA形式の文書（QAペア1組が1チャンクになる）"""
+    pairs = []
+    for i in range(chunks):
+        question = _fill(rng.choice(_QUESTIONS), rng, subject)
+        answer = "".join(_fill(rng.choice(_SENTENCES), rng, subject) for _ in range(rng.randint(1, 3)))
+        pairs.append(f"Q{i + 1}: {question}\nA{i + 1}: {answer}\n")
+    return "\n".join(pairs)
+
+
+def generate_corpus(
+    total_chunks: int,
+    chunks_per_file: int = 50,
+    faq_ratio: float = 0.3,
+    seed: int = 0,
+) -> List[Tuple[str, str]]:
+    """
+    合計でおよそ total_chunks 個のチャンクになる文書群を生成する
+
+    Args:
+        total_chunks: 生成するチャンク数の目安（通常テキストは文字数からの見積もり）
+        chunks_per_file: 1ファイルあたりのチャンク数の目安
+        faq_ratio: FAQファイルの割合（0〜1）
+        seed: 乱数のシード
+
+    Returns:
+        (ファイル名, 内容) のリスト
+    """
+    rng = random.Random(seed)
+    files = []
+    remaining = total_chunks
+    while remaining > 0:
+        chunks = min(chunks_per_file, remaining)
+        subject = rng.choice(SUBJECTS)
+        index = len(files) + 1
+        if rng.random() < faq_ratio:
+            files.append((f"FAQ_{subject}_{index:05d}.txt", _faq_document(rng, subject, chunks)))
+        else:
+            dept = rng.choice(DEPARTMENTS)
+            files.append((f"{dept}_{subject}規程_{index:05d}.txt", _text_document(rng, subject, chunks)))
+        remaining -= chunks
+    return files
+
+
+def generate_queries(count: int, seed: int = 0) -> List[str]:
+    """コーパスと同じ語彙でユーザーの質問を count 件生成する（重複もありうる）"""
+    rng = random.Random(seed)
+    return [_fill(rng.choice(_QUERIES), rng) for _ in range(count)]
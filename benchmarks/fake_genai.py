@@ -0,0 +1,116 @@
+"""
+【fake_genai.py の役割】
+-----------------------------------------------------
+- google.generativeai の埋め込み（embed_content）と回答生成（GenerativeModel）を、
+  ネットワークを使わない決定的な実装に差し替える。
+- 埋め込みは文字n-gramのハッシュ（HashingEmbedder）で作るので、似た文ほど近いベクトルになり、
+  検索結果の分布も本番に近くなる。
+- リクエストごとの遅延を指定でき、APIの応答時間を含めた処理性能を再現できる。
+- 呼び出し回数は CALLS に記録する。
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+
+import google.generativeai as genai
+
+# 呼び出し回数（embed_requests: 埋め込みリクエスト数、embed_texts: ベクトル化したテキスト数、
+# generate: 回答生成の回数）
+CALLS = {"embed_requests": 0, "embed_texts": 0, "generate": 0}
+
+_lock = threading.Lock()
+_settings = {"embed_latency": 0.0, "gen_latency": 0.0}
+_embedder = None
+
+
+def _count(key: str, n: int = 1):
+    with _lock:
+        CALLS[key] += n
+
+
+def embed_content(model, content, task_type=None, **kwargs):
+    """genai.embed_content の代わり（文字列1件ならベクトル1本、リストならベクトルのリスト）"""
+    texts = content if isinstance(content, list) else [content]
+    _count("embed_requests")
+    _count("embed_texts", len(texts))
+    if _settings["embed_latency"] > 0:
+        time.sleep(_settings["embed_latency"])
+    vectors = _embedder.embed(texts)
+    return {"embedding": vectors if isinstance(content, list) else vectors[0]}
+
+
+def _answer(prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    return f"ベンチマーク用の回答です（プロンプト {len(prompt)} 文字, {digest}）。"
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _AsyncStream:
+    """ストリーミング応答（回答を数回に分けて返す）"""
+
+    def __init__(self, text: str, parts: int = 4):
+        size = max(1, -(-len(text) // parts))
+        self._parts = [text[i:i + size] for i in range(0, len(text), size)]
+
+    async def _iterate(self):
+        delay = _settings["gen_latency"] / max(1, len(self._parts))
+        for part in self._parts:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield _Response(part)
+
+    def __aiter__(self):
+        return self._iterate()
+
+
+class FakeGenerativeModel:
+    """genai.GenerativeModel の代わり（プロンプトから決まる回答を、指定の遅延の後に返す）"""
+
+    def __init__(self, model_name: str = "", generation_config=None, **kwargs):
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        _count("generate")
+        if _settings["gen_latency"] > 0:
+            time.sleep(_settings["gen_latency"])
+        return _Response(_answer(prompt))
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        _count("generate")
+        if stream:
+            return _AsyncStream(_answer(prompt))
+        if _settings["gen_latency"] > 0:
+            await asyncio.sleep(_settings["gen_latency"])
+        return _Response(_answer(prompt))
+
+
+def install(embed_latency_ms: float = 0.0, gen_latency_ms: float = 0.0, dim: int = 768):
+    """
+    google.generativeai を差し替える
+
+    app のモジュールは genai の関数を呼び出し時に参照するので、import の前後どちらで呼んでもよい。
+    ただし HashingEmbedder を使うため、環境変数（設定値）を用意した後に呼ぶこと。
+    """
+    global _embedder
+    from app.services.embedder import HashingEmbedder
+
+    _embedder = HashingEmbedder(dim)
+    _settings["embed_latency"] = embed_latency_ms / 1000
+    _settings["gen_latency"] = gen_latency_ms / 1000
+    genai.configure = lambda *args, **kwargs: None
+    genai.embed_content = embed_content
+    genai.GenerativeModel = FakeGenerativeModel
+
+
+def reset_calls():
+    """呼び出し回数を0に戻す"""
+    with _lock:
+        for key in CALLS:
+            CALLS[key] = 0
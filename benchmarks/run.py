@@ -0,0 +1,419 @@
+"""
+ベンチマークの実行スクリプト
+
+合成コーパスを一時ディレクトリのベクトルDBに登録し、次の段階ごとの処理性能を測る。
+google.generativeai はローカルの決定的な実装に差し替えるので、Gemini の利用枠は使わない。
+
+    ingest : ファイルの読み込み → チャンク化 → ベクトル化 → ベクトルDB登録（embed_content）
+    search : 関連文書の検索（search_related_docs）
+    ask    : /api/ask（検索 → 文脈の詰め直し → 回答生成）。--concurrency 件ずつ並行に送る
+
+結果は チャンク/秒・レイテンシの p50/p95/p99・段階ごとのメモリ（Pythonヒープのピークと最大RSS）と、
+/metrics と同じ処理段階ごとの平均時間を表示する。--output で JSON に保存し、
+別のコミットで --baseline に渡すと、しきい値を超えて悪化した指標を表示して終了コード1で終わる。
+
+使い方:
+    python -m benchmarks.run                                  # 1,000チャンク
+    python -m benchmarks.run --chunks 100000 --stages ingest,search
+    python -m benchmarks.run --embed-latency-ms 80 --gen-latency-ms 1500 --concurrency 32
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline bench.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# プロジェクトルートディレクトリをPythonパスに追加
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT_DIR)
+
+STAGES = ("ingest", "search", "ask")
+
+# --baseline と比べる指標と、大きいほど良いか
+_COMPARED_METRICS = {
+    ("ingest", "chunks_per_sec"): True,
+    ("search", "p50_ms"): False,
+    ("search", "p95_ms"): False,
+    ("search", "p99_ms"): False,
+    ("ask", "p50_ms"): False,
+    ("ask", "p95_ms"): False,
+    ("ask", "p99_ms"): False,
+    ("ask", "requests_per_sec"): True,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="RAG API のベンチマーク（Gemini の代わりにローカル実装を使う）")
+    parser.add_argument("--chunks", type=int, default=1000,
+                        help="登録するチャンク数の目安（既定: 1000。1,000〜100,000 を想定）")
+    parser.add_argument("--chunks-per-file", type=int, default=50,
+                        help="1ファイルあたりのチャンク数の目安（既定: 50）")
+    parser.add_argument("--faq-ratio", type=float, default=0.3,
+                        help="FAQ（QA形式）ファイルの割合（既定: 0.3）")
+    parser.add_argument("--queries", type=int, default=200,
+                        help="search で測る質問数（既定: 200）")
+    parser.add_argument("--ask-queries", type=int, default=100,
+                        help="ask で送る質問数（既定: 100）")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="ask で同時に送るリクエスト数（既定: 8）")
+    parser.add_argument("--warmup", type=int, default=5,
+                        help="計測前に捨てる質問数（既定: 5）")
+    parser.add_argument("--embed-latency-ms", type=float, default=0,
+                        help="埋め込みリクエスト1回あたりの疑似遅延[ms]（既定: 0）")
+    parser.add_argument("--gen-latency-ms", type=float, default=0,
+                        help="回答生成1回あたりの疑似遅延[ms]（既定: 0）")
+    parser.add_argument("--dim", type=int, default=768,
+                        help="疑似埋め込みベクトルの次元（既定: 768）")
+    parser.add_argument("--embed-backend", choices=("gemini", "hashing"), default="gemini",
+                        help="EMBED_BACKEND（gemini は疑似APIを経由する。既定: gemini）")
+    parser.add_argument("--retrieval-mode", choices=("legacy", "hybrid"), default=None,
+                        help="RETRIEVAL_MODE（既定: 環境変数・.env の設定）")
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="回答キャッシュを有効にする（既定: 無効にして毎回生成する）")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"実行する段階（カンマ区切り。既定: {','.join(STAGES)}）")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="コーパスと質問の乱数シード（既定: 0）")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="Pythonヒープの計測を止める（計測の負荷を除いたレイテンシを測るとき）")
+    parser.add_argument("--workdir", default=None,
+                        help="コーパスとベクトルDBを置くディレクトリ（既定: 一時ディレクトリ）")
+    parser.add_argument("--keep", action="store_true",
+                        help="終了後も作業ディレクトリを残す")
+    parser.add_argument("--output", default=None,
+                        help="結果を JSON で保存するファイル")
+    parser.add_argument("--baseline", default=None,
+                        help="比較する以前の結果（--output で保存した JSON）")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="悪化とみなす変化の割合（既定: 0.2 = 20%%）")
+    return parser.parse_args()
+
+
+def configure_environment(args, workdir: Path):
+    """
+    app を import する前に、ベクトルDB・キャッシュの保存先と設定値を作業ディレクトリ用に切り替える
+    （.env に本番の設定があっても、保存先は必ず作業ディレクトリになる）
+    """
+    os.environ.update(
+        LLM_API_KEY="benchmark",
+        LLM_EMBED_MODEL="models/benchmark-embedding",
+        LLM_GEN_MODEL="benchmark-generation",
+        VECTOR_DB_DIR=str(workdir / "chroma_db"),
+        VECTOR_COLLECTION_NAME="rag_benchmark",
+        EMBED_BACKEND=args.embed_backend,
+        EMBED_HASH_DIM=str(args.dim),
+        EMBED_RATE_LIMIT_PER_MIN="0",
+        LOG_LEVEL="WARNING",
+        ANONYMIZED_TELEMETRY="False",
+    )
+    if args.retrieval_mode:
+        os.environ["RETRIEVAL_MODE"] = args.retrieval_mode
+    if not args.answer_cache:
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+    # uploads/ など相対パスの保存先も作業ディレクトリに置く
+    os.chdir(workdir)
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """昇順に並んだ値の p パーセンタイル（線形補間）"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def latency_summary(latencies: list) -> dict:
+    """レイテンシ[秒]のリストを ms 単位の p50/p95/p99・平均・最大にまとめる"""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def _max_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    # Linux は KB、macOS はバイト単位
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextmanager
+def measure_memory(result: dict, trace: bool):
+    """ブロック内の Python ヒープのピーク増分と、終了時点の最大RSSを result に入れる"""
+    if trace:
+        tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+    try:
+        yield
+    finally:
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["heap_peak_mb"] = round((peak - base) / (1024 * 1024), 1)
+        result["max_rss_mb"] = _max_rss_mb()
+
+
+def stage_breakdown() -> dict:
+    """計測した処理段階ごとの回数と平均時間[ms]（/metrics と同じ段階名）"""
+    from app.core import metrics
+
+    return {
+        stage: {"count": stat["count"], "mean_ms": round(stat["sum"] / stat["count"] * 1000, 3)}
+        for stage, stat in metrics.stage_stats().items()
+        if stat["count"]
+    }
+
+
+def bench_ingest(files: list, corpus_dir: Path, trace: bool) -> dict:
+    """ファイルを1件ずつ登録し、チャンク/秒を測る（ingest_service と同じ処理）"""
+    from app.core import file_manifest
+    from app.services.embed_service import embed_content
+    from benchmarks import fake_genai
+
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for filename, text in files:
+        path = corpus_dir / filename
+        path.write_text(text, encoding="utf-8")
+        paths.append(path)
+
+    fake_genai.reset_calls()
+    result = {"files": len(paths)}
+    total_chunks = 0
+    file_latencies = []
+    with measure_memory(result, trace):
+        started = time.perf_counter()
+        for path in paths:
+            file_started = time.perf_counter()
+            stat, digest, blocks = file_manifest.read_file(path)
+            chunks = embed_content(blocks, path.name)
+            file_manifest.record(path.name, stat, digest.hexdigest(), chunks)
+            file_latencies.append(time.perf_counter() - file_started)
+            total_chunks += chunks
+        elapsed = time.perf_counter() - started
+
+    result.update(
+        chunks=total_chunks,
+        seconds=round(elapsed, 2),
+        chunks_per_sec=round(total_chunks / elapsed, 1) if elapsed else 0.0,
+        per_file=latency_summary(file_latencies),
+        embed_requests=fake_genai.CALLS["embed_requests"],
+    )
+    return result
+
+
+def bench_search(warmup_queries: list, queries: list, trace: bool) -> dict:
+    """search_related_docs を1件ずつ呼び、レイテンシを測る"""
+    from app.core import metrics
+    from app.services.search_service import search_related_docs
+
+    for query in warmup_queries:
+        search_related_docs(query)
+    metrics.reset()
+
+    result = {}
+    latencies = []
+    with measure_memory(result, trace):
+        started = time.perf_counter()
+        for query in queries:
+            query_started = time.perf_counter()
+            search_related_docs(query)
+            latencies.append(time.perf_counter() - query_started)
+        elapsed = time.perf_counter() - started
+
+    result.update(latency_summary(latencies))
+    result["queries_per_sec"] = round(len(queries) / elapsed, 1) if elapsed else 0.0
+    result["stages"] = stage_breakdown()
+    return result
+
+
+async def _run_ask(questions: list, concurrency: int) -> tuple:
+    import httpx
+    from app.main import app
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        async def ask(question: str):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/ask", json={"question": question})
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(ask(question) for question in questions))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def bench_ask(warmup_questions: list, questions: list, concurrency: int, trace: bool) -> dict:
+    """/api/ask に concurrency 件ずつ並行にリクエストを送り、レイテンシとスループットを測る"""
+    from app.core import metrics
+    from benchmarks import fake_genai
+
+    asyncio.run(_run_ask(warmup_questions, 1))
+    metrics.reset()
+    fake_genai.reset_calls()
+
+    result = {"concurrency": concurrency}
+    with measure_memory(result, trace):
+        latencies, errors, elapsed = asyncio.run(_run_ask(questions, concurrency))
+
+    result.update(latency_summary(latencies))
+    result.update(
+        errors=errors,
+        requests_per_sec=round(len(questions) / elapsed, 1) if elapsed else 0.0,
+        generate_calls=fake_genai.CALLS["generate"],
+        stages=stage_breakdown(),
+    )
+    return result
+
+
+def print_results(results: dict):
+    config = results["config"]
+    print(f"\n=== ベンチマーク結果（{config['chunks']}チャンク, embed={config['embed_backend']}, "
+          f"retrieval={config['retrieval_mode']}） ===")
+    for stage in STAGES:
+        result = results.get(stage)
+        if not result:
+            continue
+        print(f"\n[{stage}]")
+        for key, value in result.items():
+            if key == "stages":
+                print("  処理段階ごとの平均:")
+                for name, stat in value.items():
+                    print(f"    {name:<22} {stat['mean_ms']:>10.3f} ms  ({stat['count']}回)")
+            elif isinstance(value, dict):
+                print(f"  {key}: " + ", ".join(f"{k}={v}" for k, v in value.items()))
+            else:
+                print(f"  {key}: {value}")
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """以前の結果と比べ、threshold を超えて悪化した指標の説明を返す（比較結果も表示する）"""
+    print("\n=== ベースラインとの比較 ===")
+    differences = [
+        f"{key}={baseline.get('config', {}).get(key)} → {value}"
+        for key, value in results["config"].items()
+        if baseline.get("config", {}).get(key) != value
+    ]
+    if differences:
+        # tracemalloc の有無などで結果は大きく変わる
+        print("  注意: 設定が異なります（" + ", ".join(differences) + "）")
+    regressions = []
+    for (stage, metric), higher_is_better in _COMPARED_METRICS.items():
+        current = results.get(stage, {}).get(metric)
+        previous = baseline.get(stage, {}).get(metric)
+        if not current or not previous:
+            continue
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        mark = "  << 悪化" if worse > threshold else ""
+        print(f"  {stage}.{metric}: {previous} → {current} ({change:+.1%}){mark}")
+        if mark:
+            regressions.append(f"{stage}.{metric} {previous} → {current} ({change:+.1%})")
+    return regressions
+
+
+def main() -> int:
+    args = parse_args()
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        print(f"不明な段階です: {', '.join(sorted(unknown))}（{', '.join(STAGES)}）")
+        return 2
+
+    # --output・--baseline は起動時のディレクトリからの相対パス
+    output = Path(args.output).resolve() if args.output else None
+    baseline_path = Path(args.baseline).resolve() if args.baseline else None
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="rag-benchmark-")).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    configure_environment(args, workdir)
+
+    # 設定値を読み込んだ後で genai を差し替える
+    from benchmarks import fake_genai
+    from benchmarks.corpus import generate_corpus, generate_queries
+    fake_genai.install(args.embed_latency_ms, args.gen_latency_ms, args.dim)
+    from app.core.config import RETRIEVAL_MODE
+
+    trace = not args.no_tracemalloc
+    results = {
+        "config": {
+            "chunks": args.chunks,
+            "chunks_per_file": args.chunks_per_file,
+            "faq_ratio": args.faq_ratio,
+            "embed_backend": args.embed_backend,
+            "retrieval_mode": RETRIEVAL_MODE,
+            "embed_latency_ms": args.embed_latency_ms,
+            "gen_latency_ms": args.gen_latency_ms,
+            "dim": args.dim,
+            "seed": args.seed,
+            "tracemalloc": trace,
+        }
+    }
+    print(f"作業ディレクトリ: {workdir}")
+
+    try:
+        if "ingest" in stages:
+            files = generate_corpus(args.chunks, args.chunks_per_file, args.faq_ratio, args.seed)
+            print(f"登録中: {len(files)}ファイル")
+            results["ingest"] = bench_ingest(files, workdir / "corpus", trace)
+        if "search" in stages:
+            print(f"検索中: {args.queries}件")
+            queries = generate_queries(args.warmup + args.queries, args.seed)
+            results["search"] = bench_search(queries[:args.warmup], queries[args.warmup:], trace)
+        if "ask" in stages:
+            print(f"/api/ask に送信中: {args.ask_queries}件（同時 {args.concurrency}件）")
+            # search とは別のシードで作り、質問ベクトルのキャッシュの影響を減らす
+            questions = generate_queries(args.warmup + args.ask_queries, args.seed + 1)
+            results["ask"] = bench_ask(questions[:args.warmup], questions[args.warmup:], args.concurrency, trace)
+    finally:
+        if not args.keep and not args.workdir:
+            os.chdir(ROOT_DIR)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+
+    if output:
+        output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n結果を保存しました: {output}")
+
+    if baseline_path:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)}件の指標が {args.threshold:.0%} を超えて悪化しました")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@ import axios from 'axios';
 
 interface UploadResponse {
   message: string;
+  job_id: string;
 }
 
 /**
@@ -5,10 +5,20 @@ interface FileInfo {
   filename: string;
   size: number;
   modified: number;
+  chunks?: number;
+  status?: string;
+  error?: string | null;
 }
 
 interface FileListResponse {
   files: FileInfo[];
+  next_cursor: string | null;
+}
+
+interface FileListParams {
+  cursor?: string;
+  prefix?: string;
+  limit?: number;
 }
 
 interface DeleteFilesResponse {
@@ -18,11 +28,11 @@ interface DeleteFilesResponse {
 }
 
 /**
- * アップロードされたファイル一覧を取得する
+ * アップロードされたファイル一覧を取得する（1ページ分。続きは next_cursor を cursor に指定する）
  */
-export const getFiles = async (): Promise<FileListResponse> => {
+export const getFiles = async (params: FileListParams = {}): Promise<FileListResponse> => {
   try {
-    const response = await axios.get('/api/files');
+    const response = await axios.get('/api/files', { params });
     return response.data;
   } catch (error) {
     console.error('Error fetching files:', error);
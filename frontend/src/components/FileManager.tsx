@@ -7,8 +7,20 @@ interface FileInfo {
   filename: string;
   size: number;
   modified: number;
+  chunks?: number;
+  status?: string;
+  error?: string | null;
 }
 
+// 登録状態の表示名
+const STATUS_LABELS: Record<string, string> = {
+  queued: '登録待ち',
+  processing: '登録中',
+  completed: '登録済み',
+  failed: '登録失敗',
+  unknown: '不明',
+};
+
 // スタイル定義
 const FileManagerContainer = styled.div`
   margin-bottom: 2rem;
@@ -163,6 +175,11 @@ const FileContent = styled.pre`
   overflow-y: auto;
 `;
 
+const LoadMoreBar = styled.div`
+  text-align: center;
+  margin-top: 1rem;
+`;
+
 const Message = styled.div<{ isError?: boolean }>`
   padding: 1rem;
   margin-top: 1rem;
@@ -174,6 +191,7 @@ const Message = styled.div<{ isError?: boolean }>`
 
 const FileManager: React.FC = () => {
   const [files, setFiles] = useState<FileInfo[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [selectedFiles, setSelectedFiles] = useState<string[]>([]);
   const [searchTerm, setSearchTerm] = useState('');
   const [isLoading, setIsLoading] = useState(false);
@@ -186,14 +204,15 @@ const FileManager: React.FC = () => {
   const [fileContent, setFileContent] = useState<string>('');
   const [contentLoading, setContentLoading] = useState(false);
 
-  // ファイル一覧の取得
-  const fetchFiles = async () => {
+  // ファイル一覧の取得（cursor を指定すると続きのページを末尾に追加する）
+  const fetchFiles = async (cursor?: string) => {
     setIsLoading(true);
     setError(null);
     
     try {
-      const data = await getFiles();
-      setFiles(data.files);
+      const data = await getFiles({ cursor, prefix: searchTerm || undefined });
+      setFiles(prev => cursor ? [...prev, ...data.files] : data.files);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error('Error fetching files:', err);
       setError('ファイル一覧の取得に失敗しました');
@@ -202,10 +221,11 @@ const FileManager: React.FC = () => {
     }
   };
   
-  // コンポーネントマウント時にファイル一覧を取得
+  // マウント時と検索語（ファイル名の前方一致）の変更時にファイル一覧を取得
   useEffect(() => {
-    fetchFiles();
-  }, []);
+    const timer = setTimeout(() => fetchFiles(), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
 
   // ファイル選択の切り替え
   const toggleFileSelection = (filename: string) => {
@@ -218,10 +238,10 @@ const FileManager: React.FC = () => {
   
   // すべてのファイルを選択/解除
   const toggleSelectAll = () => {
-    if (selectedFiles.length === filteredFiles.length) {
+    if (selectedFiles.length === files.length) {
       setSelectedFiles([]);
     } else {
-      setSelectedFiles(filteredFiles.map(file => file.filename));
+      setSelectedFiles(files.map(file => file.filename));
     }
   };
   
@@ -267,13 +287,6 @@ const FileManager: React.FC = () => {
     }
   };
   
-  // 検索フィルタリング
-  const filteredFiles = searchTerm
-    ? files.filter(file => 
-        file.filename.toLowerCase().includes(searchTerm.toLowerCase())
-      )
-    : files;
-
   // サイズを人間が読みやすい形式に変換
   const formatFileSize = (bytes: number): string => {
     if (bytes < 1024) return `${bytes} B`;
@@ -294,7 +307,7 @@ const FileManager: React.FC = () => {
       <ActionBar>
         <SearchInput 
           type="text" 
-          placeholder="ファイル名で検索..." 
+          placeholder="ファイル名の先頭で検索..." 
           value={searchTerm}
           onChange={(e) => setSearchTerm(e.target.value)}
         />
@@ -309,7 +322,7 @@ const FileManager: React.FC = () => {
             }
           </DeleteButton>
           <Button 
-            onClick={fetchFiles}
+            onClick={() => fetchFiles()}
             disabled={isLoading}
             style={{ marginLeft: '0.5rem' }}
           >
@@ -323,7 +336,9 @@ const FileManager: React.FC = () => {
       
       {files.length === 0 ? (
         <EmptyState>
-          {isLoading ? 'ファイル一覧を読み込み中...' : 'アップロードされたファイルがありません'}
+          {isLoading
+            ? 'ファイル一覧を読み込み中...'
+            : searchTerm ? '該当するファイルがありません' : 'アップロードされたファイルがありません'}
         </EmptyState>
       ) : (
         <FileTable>
@@ -332,17 +347,18 @@ const FileManager: React.FC = () => {
               <CheckboxCell>
                 <input 
                   type="checkbox" 
-                  checked={selectedFiles.length === filteredFiles.length && filteredFiles.length > 0}
+                  checked={selectedFiles.length === files.length && files.length > 0}
                   onChange={toggleSelectAll}
                 />
               </CheckboxCell>
               <Th>ファイル名</Th>
               <Th>サイズ</Th>
               <Th>更新日時</Th>
+              <Th>登録状態</Th>
             </tr>
           </thead>
           <tbody>
-            {filteredFiles.map((file) => (
+            {files.map((file) => (
               <FileRow 
                 key={file.filename}
                 isSelected={selectedFiles.includes(file.filename)}
@@ -365,12 +381,24 @@ const FileManager: React.FC = () => {
                 </FileNameCell>
                 <Td>{formatFileSize(file.size)}</Td>
                 <Td>{formatDate(file.modified)}</Td>
+                <Td title={file.error || undefined}>
+                  {file.status ? STATUS_LABELS[file.status] || file.status : '-'}
+                  {file.status === 'completed' && file.chunks !== undefined && `（${file.chunks}チャンク）`}
+                </Td>
               </FileRow>
             ))}
           </tbody>
         </FileTable>
       )}
       
+      {nextCursor && (
+        <LoadMoreBar>
+          <Button onClick={() => fetchFiles(nextCursor)} disabled={isLoading}>
+            さらに読み込む
+          </Button>
+        </LoadMoreBar>
+      )}
+      
       {/* ファイルコンテンツ表示モーダル */}
       {modalOpen && (
         <Modal onClick={() => setModalOpen(false)}>
@@ -1,108 +1,104 @@
 """
 ベクトルDBの再インデックスを行うユーティリティスクリプト
+
+検索中のコレクションはそのままに新しいコレクションを並列に構築し、
+成功したときだけ検索対象を切り替える。中断した場合は再実行すると続きから処理する。
+
+--sync を付けると、前回から追加・変更・削除されたファイルだけを登録し直す（増分同期）。
+
+CHROMA_MODE=embedded でも、CHROMA_HOST:CHROMA_PORT で Chroma サーバー（run.py --prod が
+起動したもの）が動いていれば、VECTOR_DB_DIR を直接開かずにそのサーバーへ接続する
+（同じディレクトリを2つのプロセスが直接書き換えると壊れるため）。
+
+使い方:
+    python reindex.py                      # 再インデックス（チェックポイントがあれば再開）
+    python reindex.py --sync               # 増分同期
+    python reindex.py --workers 8 --rate 300
+    python reindex.py --fresh              # チェックポイントを無視して最初から
 """
 
+import argparse
 import os
 import sys
 from pathlib import Path
 import traceback
-import time
+
+from dotenv import load_dotenv
 
 # 内部モジュールをインポートするためにパスを調整
 sys.path.append('.')
 
+
+def use_running_chroma_server():
+    """
+    Chroma サーバーが動いていれば、ベクトルDBをそのサーバー経由で使うようにする
+
+    ベクトルDBのクライアントは app のモジュールを import した時点で作られるので、その前に呼ぶ。
+    """
+    load_dotenv()
+    if os.getenv("CHROMA_MODE", "embedded") != "embedded":
+        return
+    from app.core import chroma_server
+    host = os.getenv("CHROMA_HOST", "127.0.0.1")
+    port = int(os.getenv("CHROMA_PORT", "8001"))
+    if chroma_server.is_running(host, port):
+        print(f"Chroma サーバー（{host}:{port}）が稼働中のため、サーバー経由で書き込みます")
+        os.environ["CHROMA_MODE"] = "http"
+
+
+use_running_chroma_server()
+
 try:
-    from app.core.chromadb_client import collection, client
-    from app.services.embed_service import embed_content
-    from app.core.config import VECTOR_DB_DIR, VECTOR_COLLECTION_NAME
+    from app.core.chromadb_client import get_active_collection_name
+    from app.core.config import VECTOR_DB_DIR, EMBED_RATE_LIMIT_PER_MIN
+    from app.services.reindex_service import run_reindex
+    from app.services.sync_service import sync_uploads
     print("モジュールのインポートに成功しました")
 except Exception as e:
     print(f"モジュールのインポート中にエラーが発生しました: {e}")
     traceback.print_exc()
     sys.exit(1)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="ベクトルDBの再インデックス")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="並列に処理するファイル数（既定: 4）")
+    parser.add_argument("--rate", type=float, default=EMBED_RATE_LIMIT_PER_MIN,
+                        help="埋め込みAPIのリクエスト数上限[回/分]（0で無制限。既定: EMBED_RATE_LIMIT_PER_MIN）")
+    parser.add_argument("--fresh", action="store_true",
+                        help="チェックポイントを無視して最初から構築する")
+    parser.add_argument("--sync", action="store_true",
+                        help="変更のあったファイルだけを検索中のコレクションに反映する（増分同期）")
+    parser.add_argument("--upload-dir", default="uploads",
+                        help="登録するテキストファイルのディレクトリ（既定: uploads）")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("ベクトルDBの再インデックスを開始します...")
     print(f"ベクトルDB保存先: {VECTOR_DB_DIR}")
-    print(f"コレクション名: {VECTOR_COLLECTION_NAME}")
-    
-    # collection変数をグローバルで使用することを宣言
-    global collection
-    
-    try:
-        # コレクション名を取得
-        collection_name = collection.name
-        print(f"現在のコレクション名: {collection_name}")
-        
-        # ベクトルDBの内容を一旦全削除（コレクションを削除して再作成）
-        print(f"既存のコレクション '{collection_name}' を削除中...")
-        try:
-            client.delete_collection(collection_name)
-            print("コレクション削除成功")
-        except Exception as e:
-            print(f"コレクション削除中にエラー: {e}")
-            traceback.print_exc()
-        
-        print(f"コレクション '{collection_name}' を再作成中...")
-        # コレクション参照を更新
-        from app.core.chromadb_client import get_collection
-        collection = get_collection()
-        print(f"新しいコレクション作成成功: {collection.name}")
-    except Exception as e:
-        print(f"コレクションのリセット中にエラーが発生しました: {e}")
-        traceback.print_exc()
-        print("既存のコレクションを使用して続行します...")
-    
+    print(f"現在のコレクション名: {get_active_collection_name()}")
+
     # アップロードディレクトリ内のファイルを処理
-    upload_dir = Path("uploads")
+    upload_dir = Path(args.upload_dir)
     if not upload_dir.exists():
         print(f"アップロードディレクトリが見つかりません: {upload_dir.absolute()}")
-        return
-    
-    # すべてのテキストファイルを処理
-    files = list(upload_dir.glob("*.txt"))
-    total = len(files)
-    print(f"合計 {total} 個のファイルを処理します...")
-    
-    if total == 0:
+        return 1
+
+    if args.sync:
+        return 0 if sync_uploads(upload_dir, workers=args.workers) else 1
+
+    if not any(upload_dir.glob("*.txt")):
         print(f"警告: ディレクトリ {upload_dir.absolute()} にテキストファイルが見つかりません")
-        return
-    
-    success_count = 0
-    error_count = 0
-    total_chunks = 0
-    
-    for i, file_path in enumerate(files, 1):
-        try:
-            # ファイルの内容を読み込む
-            content = file_path.read_text(encoding="utf-8")
-            
-            # コンテンツ先頭部分を表示（デバッグ用）
-            content_preview = content[:100].replace('\n', ' ') + '...'
-            print(f"ファイル内容プレビュー: {content_preview}")
-            
-            # ベクトルDBに再登録
-            chunks = embed_content(content, file_path.name)
-            
-            print(f"[{i}/{total}] {file_path.name} - {chunks}チャンク作成")
-            success_count += 1
-            total_chunks += chunks
-            
-            # 処理の間に少し待機（API制限対策）
-            if i % 10 == 0:
-                print(f"API制限対策のため5秒間待機中...")
-                time.sleep(5)
-                
-        except Exception as e:
-            print(f"[エラー] {file_path.name}: {e}")
-            traceback.print_exc()
-            error_count += 1
-    
-    print("\n==== 再インデックス完了 ====")
-    print(f"処理成功: {success_count} ファイル")
-    print(f"エラー: {error_count} ファイル")
-    print(f"作成されたチャンク数: {total_chunks}")
-    print(f"コレクション '{collection.name}' の現在のアイテム数: {len(collection.get()['ids'])}")
+        return 1
+
+    ok = run_reindex(
+        upload_dir,
+        workers=args.workers,
+        rate_per_min=args.rate,
+        resume=not args.fresh,
+    )
+    return 0 if ok else 1
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
@@ -2,15 +2,71 @@
 サーバー起動スクリプト
 -----------------------------------------------------
 - Pythonのモジュールパスを設定し、FastAPIサーバーを起動する
+- 引数なしで起動すると開発モード（1プロセス、コード変更時に自動再起動）
+- --prod を付けると本番モード（WEB_WORKERS 個のワーカープロセス、自動再起動なし）
+  検索は各ワーカーが行い、ベクトルDBへの書き込みは Chroma サーバー1か所に集める。
+  CHROMA_MODE=embedded のままなら VECTOR_DB_DIR を開く Chroma サーバーをこのスクリプトが起動し、
+  ワーカーと reindex.py はそこへ http で接続する（CHROMA_MODE=http なら既存のサーバーを使う）
+
+使い方:
+    python run.py                       # 開発モード
+    python run.py --prod                # 本番モード（WEB_WORKERS 個。0ならCPUコア数）
+    python run.py --prod --workers 8 --port 8080
 """
 
-import sys
+import argparse
 import os
+import sys
+
 import uvicorn
+from dotenv import load_dotenv
 
 # プロジェクトルートディレクトリをPythonパスに追加
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
+from app.core import chroma_server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="RAG API サーバーの起動")
+    parser.add_argument("--prod", action="store_true",
+                        help="本番モード（複数ワーカー、自動再起動なし）")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="ワーカープロセス数（--prod のみ。既定: WEB_WORKERS、0ならCPUコア数）")
+    parser.add_argument("--host", default="0.0.0.0", help="待ち受けるアドレス（既定: 0.0.0.0）")
+    parser.add_argument("--port", type=int, default=8000, help="待ち受けるポート（既定: 8000）")
+    return parser.parse_args()
+
+
+def run_production(args):
+    """複数ワーカーで起動する"""
+    workers = args.workers if args.workers is not None else int(os.getenv("WEB_WORKERS", "0"))
+    workers = workers or os.cpu_count() or 1
+
+    chroma_process = None
+    if os.getenv("CHROMA_MODE", "embedded") == "embedded":
+        # 複数プロセスが同じディレクトリを直接開くと書き込みが衝突し、他プロセスの更新も見えないため、
+        # Chroma サーバーを1つだけ起動して、全ワーカーをそこへ接続させる（環境変数はワーカーに引き継がれる）。
+        # ワーカーが1つでも起動しておき、reindex.py も同じサーバー経由で書き込めるようにする
+        host = os.getenv("CHROMA_HOST", "127.0.0.1")
+        port = int(os.getenv("CHROMA_PORT", "8001"))
+        chroma_process = chroma_server.start(os.getenv("VECTOR_DB_DIR"), host, port)
+        os.environ.update(CHROMA_MODE="http", CHROMA_HOST=host, CHROMA_PORT=str(port))
+
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=workers)
+    finally:
+        if chroma_process is not None:
+            chroma_process.terminate()
+            chroma_process.wait()
+
+
 if __name__ == "__main__":
-    # FastAPIサーバーを起動
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    args = parse_args()
+    # .env の設定（CHROMA_MODE・VECTOR_DB_DIR など）を読み込む
+    load_dotenv()
+    if args.prod:
+        run_production(args)
+    else:
+        # FastAPIサーバーを起動
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)
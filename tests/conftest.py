@@ -0,0 +1,100 @@
+"""
+【conftest.py の役割】
+-----------------------------------------------------
+- app を import する前に、ベクトルDB・キャッシュ・マニフェストの保存先を一時ディレクトリに切り替える
+  （.env に本番の設定があっても、テストが本番のデータに触れないようにする）。
+- google.generativeai はベンチマーク用の偽物（benchmarks/fake_genai）に差し替え、ネットワークを使わない。
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="rag-tests-"))
+
+os.environ.update(
+    LLM_API_KEY="test",
+    LLM_EMBED_MODEL="models/test-embedding",
+    LLM_GEN_MODEL="test-generation",
+    VECTOR_DB_DIR=str(WORKDIR / "chroma_db"),
+    VECTOR_COLLECTION_NAME="rag_test",
+    EMBED_BACKEND="hashing",
+    EMBED_HASH_DIM="64",
+    EMBED_RATE_LIMIT_PER_MIN="0",
+    CHROMA_MODE="embedded",
+    LOG_LEVEL="WARNING",
+    ANONYMIZED_TELEMETRY="False",
+)
+
+# 設定値を用意した後で genai を差し替える
+from benchmarks import fake_genai  # noqa: E402
+
+fake_genai.install(dim=64)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def fake_calls():
+    """偽の genai の呼び出し回数（0から数える）"""
+    fake_genai.reset_calls()
+    return fake_genai.CALLS
+
+
+class _Spy:
+    """メソッドの呼び出し回数を数えながら、元のオブジェクトに処理を任せる"""
+
+    def __init__(self, target):
+        self._target = target
+        self.calls = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return attribute(*args, **kwargs)
+        return call
+
+
+@pytest.fixture
+def counting_embedder():
+    """ローカルの埋め込みバックエンドに差し替え、embed の呼び出しごとのテキスト数を記録する"""
+    from app.services.embedder import HashingEmbedder, set_embedder
+
+    class CountingEmbedder(HashingEmbedder):
+        def __init__(self):
+            super().__init__(dim=64)
+            self.calls = []
+
+        def embed(self, texts, task_type="retrieval_document"):
+            self.calls.append(len(texts))
+            return super().embed(texts, task_type)
+
+    embedder = CountingEmbedder()
+    set_embedder(embedder)
+    yield embedder
+    set_embedder(None)
+
+
+@pytest.fixture
+def scratch_collection():
+    """テストごとの空のコレクション（書き込み系のメソッドの呼び出し回数を数える）"""
+    from app.core.chromadb_client import drop_collection, get_collection
+
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    spy = _Spy(get_collection(name))
+    yield spy
+    drop_collection(name)
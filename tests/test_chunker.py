@@ -0,0 +1,80 @@
+from app.services.embed_service import (
+    CHUNK_OVERLAP,
+    MAX_CHUNK_SIZE,
+    iter_lines,
+    iter_qa_chunks,
+    split_into_chunks,
+    split_qa_into_chunks,
+)
+
+
+def _sentences(count: int) -> str:
+    return "".join(f"これは{i}番目の文で、チャンク分割の確認に使う内容です。" for i in range(count))
+
+
+def _contents(chunks):
+    return [(chunk["metadata"]["content_type"], chunk["text"]) for chunk in chunks]
+
+
+def test_split_into_chunks_bounds_length_and_overlaps():
+    chunks = split_into_chunks(_sentences(60))
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert len(chunk) <= MAX_CHUNK_SIZE + CHUNK_OVERLAP
+        # 直前のチャンクの末尾を次のチャンクの先頭に重ねる
+        assert chunk.startswith(previous[-CHUNK_OVERLAP:].strip()[:10])
+
+
+def test_long_sentence_without_terminator_is_split():
+    chunks = split_into_chunks("あ" * (MAX_CHUNK_SIZE * 3))
+    assert len(chunks) >= 3
+    assert all(len(chunk) <= MAX_CHUNK_SIZE + CHUNK_OVERLAP for chunk in chunks)
+
+
+def test_streaming_matches_whole_text():
+    text = _sentences(40) + "\n" + _sentences(25)
+    whole = list(iter_qa_chunks(iter_lines([text])))
+    pieces = [text[i:i + 37] for i in range(0, len(text), 37)]
+    assert list(iter_qa_chunks(iter_lines(pieces))) == whole
+    # QA形式でない文書は split_into_chunks と同じ結果になる
+    assert [chunk["text"] for chunk in whole] == split_into_chunks(text)
+
+
+def test_qa_pairs_and_surrounding_text():
+    text = (
+        "はじめに。\n"
+        "Q: 出張費の申請方法は？\n"
+        "A: ポータルから申請します。\n"
+        "上長の承認が必要です。\n"
+        "---\n"
+        "質問: 有給休暇は何日？\n"
+        "回答: 年20日です。\n"
+        "\n"
+        "おわりに。\n"
+    )
+    chunks = split_qa_into_chunks(text)
+    assert _contents(chunks) == [
+        ("text", "はじめに。"),
+        ("qa_pair", "質問: 出張費の申請方法は？\n回答: ポータルから申請します。\n上長の承認が必要です。"),
+        ("qa_pair", "質問: 有給休暇は何日？\n回答: 年20日です。"),
+        ("text", "おわりに。"),
+    ]
+    assert chunks[1]["metadata"]["question"] == "出張費の申請方法は？"
+    assert chunks[2]["metadata"]["answer"] == "年20日です。"
+
+
+def test_answer_is_bounded_and_overflow_becomes_text():
+    text = "Q: 長い回答の質問\nA: 最初の行\n" + "続きの説明です。\n" * 200
+    chunks = split_qa_into_chunks(text)
+    assert chunks[0]["metadata"]["content_type"] == "qa_pair"
+    assert len(chunks[0]["metadata"]["answer"]) <= MAX_CHUNK_SIZE
+    assert all(chunk["metadata"]["content_type"] == "text" for chunk in chunks[1:])
+    assert all(len(chunk["text"]) <= MAX_CHUNK_SIZE + CHUNK_OVERLAP for chunk in chunks)
+    # 回答に入らなかった部分も失われない
+    assert sum(chunk["text"].count("続きの説明です") for chunk in chunks) >= 200
+
+
+def test_question_without_answer_is_text():
+    chunks = split_qa_into_chunks("Q: 回答の無い質問\n" + "本文です。\n" * 100)
+    assert all(chunk["metadata"]["content_type"] == "text" for chunk in chunks)
+    assert "回答の無い質問" in chunks[0]["text"]
@@ -0,0 +1,50 @@
+from app.services.context_service import estimate_tokens, pack_context
+
+
+def _doc(text, document_id="doc", content_type="text"):
+    return {"text": text, "metadata": {"document_id": document_id, "content_type": content_type}, "score": 1.0}
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("日本語") == 3
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("abc日本") == 3
+
+
+def test_duplicates_are_removed():
+    text = "同じ内容のチャンクです。" * 3
+    packed, stats = pack_context([_doc(text, "a"), _doc(text, "b"), _doc(text[:12], "a")], budget=0)
+    assert [doc["text"] for doc in packed] == [text]
+    assert stats["duplicates"] == 2
+    assert stats["documents"] == 1
+
+
+def test_overlap_of_neighbouring_chunks_is_trimmed():
+    first = "前半の本文です。" * 5 + "ここが重なっている部分です。"
+    second = "ここが重なっている部分です。" + "後半の本文です。" * 5
+    packed, stats = pack_context([_doc(first), _doc(second)], budget=0)
+    assert packed[1]["text"] == "後半の本文です。" * 5
+    assert stats["overlap_chars"] == len("ここが重なっている部分です。")
+
+    # 別の文書やQ&Aのチャンクは重なりを取り除かない
+    packed, _ = pack_context([_doc(first), _doc(second, "other")], budget=0)
+    assert packed[1]["text"] == second
+    packed, _ = pack_context([_doc(first), _doc(second, content_type="qa_pair")], budget=0)
+    assert packed[1]["text"] == second
+
+
+def test_budget_truncates_or_drops():
+    docs = [_doc("あ" * 100, "a"), _doc("い" * 100, "b"), _doc("う" * 100, "c")]
+    packed, stats = pack_context(docs, budget=180)
+    assert len(packed) == 2
+    assert packed[1]["text"].endswith("…")
+    assert stats["truncated"] == 1
+    assert stats["dropped"] == 1
+    assert stats["tokens"] <= 180
+    assert stats["tokens"] == sum(estimate_tokens(doc["text"]) for doc in packed) + estimate_tokens("\n\n")
+
+    # 残りが少なすぎる場合は途中で切らずにあきらめる
+    packed, stats = pack_context(docs, budget=130)
+    assert [doc["text"] for doc in packed] == ["あ" * 100]
+    assert (stats["truncated"], stats["dropped"]) == (0, 2)
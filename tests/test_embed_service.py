@@ -0,0 +1,83 @@
+import math
+
+from app.services.embed_service import embed_content, split_qa_into_chunks
+
+
+def _document(count: int) -> str:
+    return "".join(f"第{i}条の規定は、社内の手続きに関する重要な内容を定めたものです。" * 4 + "\n\n" for i in range(count))
+
+
+def test_embeds_and_writes_once_per_batch(counting_embedder, scratch_collection):
+    text = _document(60)
+    expected = len({chunk["text"] for chunk in split_qa_into_chunks(text)})
+    batch_size = 5
+    assert expected > batch_size * 2
+
+    stored = embed_content(text, "batches.txt", batch_size=batch_size, collection=scratch_collection)
+
+    batches = math.ceil(expected / batch_size)
+    assert stored == expected
+    assert len(counting_embedder.calls) == batches
+    assert all(count <= batch_size for count in counting_embedder.calls)
+    assert scratch_collection.calls["upsert"] == batches
+    assert scratch_collection.count() == expected
+
+
+def test_progress_is_reported_per_batch(counting_embedder, scratch_collection):
+    progress = []
+    stored = embed_content(_document(20), "progress.txt", batch_size=8,
+                           progress_callback=progress.append, collection=scratch_collection)
+    assert progress == sorted(progress)
+    assert progress[-1] == stored
+    assert len(progress) == math.ceil(stored / 8)
+
+
+def _faq(answers) -> str:
+    return "".join(f"Q: 質問{i}について\nA: {answer}\n---\n" for i, answer in enumerate(answers))
+
+
+def _stored(collection, filename):
+    stored = collection.get(where={"document_id": filename[:-4]}, include=["metadatas"])
+    return {chunk_id: metadata["chunk_index"] for chunk_id, metadata in zip(stored["ids"], stored["metadatas"])}
+
+
+def test_reingest_embeds_only_changed_chunks(counting_embedder, scratch_collection):
+    answers = [f"回答{i}の内容です。" for i in range(10)]
+    embed_content(_faq(answers), "faq.txt", collection=scratch_collection)
+    assert sum(counting_embedder.calls) == 10
+    original = _stored(scratch_collection, "faq.txt")
+
+    # 同じ内容を登録し直してもベクトル化しない
+    counting_embedder.calls.clear()
+    embed_content(_faq(answers), "faq.txt", collection=scratch_collection)
+    assert counting_embedder.calls == []
+    assert _stored(scratch_collection, "faq.txt") == original
+
+    # 1つの回答を書き換えると、そのチャンクだけをベクトル化し、古いチャンクを削除する
+    answers[5] = "書き換えた回答です。"
+    embed_content(_faq(answers), "faq.txt", collection=scratch_collection)
+    assert counting_embedder.calls == [1]
+    edited = _stored(scratch_collection, "faq.txt")
+    assert len(edited) == 10
+    assert len(set(edited) - set(original)) == 1
+    assert len(set(original) - set(edited)) == 1
+
+
+def test_reingest_updates_moved_chunks_without_embedding(counting_embedder, scratch_collection):
+    answers = [f"移動の確認{i}です。" for i in range(6)]
+    embed_content(_faq(answers), "moved.txt", collection=scratch_collection)
+    before = _stored(scratch_collection, "moved.txt")
+    counting_embedder.calls.clear()
+    scratch_collection.calls.clear()
+
+    # 先頭のQ&Aを消すと、残りは位置（chunk_index）だけが変わる
+    stored = embed_content(_faq(answers)[len(_faq(answers[:1])):], "moved.txt", collection=scratch_collection)
+    after = _stored(scratch_collection, "moved.txt")
+    assert stored == 5
+    assert counting_embedder.calls == []
+    assert "upsert" not in scratch_collection.calls
+    assert scratch_collection.calls["update"] == 1
+    assert scratch_collection.calls["delete"] == 1
+    assert set(after) < set(before)
+    assert sorted(after.values()) == list(range(5))
+    assert all(after[chunk_id] == before[chunk_id] - 1 for chunk_id in after)
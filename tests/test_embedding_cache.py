@@ -0,0 +1,52 @@
+import pytest
+
+from app.core import embedding_cache
+from app.services import embed_service
+from app.services.embedder import GeminiEmbedder, set_embedder
+
+
+@pytest.fixture
+def remote_embedder():
+    """埋め込みAPI（偽の genai）を呼ぶバックエンドに差し替える"""
+    embedder = GeminiEmbedder("models/test-cache")
+    set_embedder(embedder)
+    yield embedder
+    set_embedder(None)
+
+
+def test_second_call_is_served_from_cache(remote_embedder, fake_calls):
+    texts = ["キャッシュの確認1", "キャッシュの確認2"]
+    first = embed_service.embed_texts(texts)
+    assert fake_calls["embed_requests"] == 1
+    assert fake_calls["embed_texts"] == 2
+
+    # キャッシュは float32 で保存するので、誤差の範囲で一致すればよい
+    assert embed_service.embed_texts(texts) == [pytest.approx(vector, abs=1e-6) for vector in first]
+    assert fake_calls["embed_requests"] == 1
+
+
+def test_only_missing_texts_are_sent_once(remote_embedder, fake_calls):
+    embed_service.embed_texts(["登録済みの文"])
+    fake_calls["embed_texts"] = 0
+    vectors = embed_service.embed_texts(["登録済みの文", "新しい文", "新しい文"])
+    assert fake_calls["embed_texts"] == 1
+    assert len(vectors) == 3
+    assert vectors[1] == vectors[2]
+
+
+def test_task_type_and_model_are_part_of_the_key(remote_embedder, fake_calls):
+    embed_service.embed_texts(["同じ文"], task_type="retrieval_document")
+    embed_service.embed_texts(["同じ文"], task_type="retrieval_query")
+    assert fake_calls["embed_requests"] == 2
+
+    document_key = embedding_cache.make_key(remote_embedder.name, "retrieval_document", "同じ文")
+    other_model_key = embedding_cache.make_key("models/other", "retrieval_document", "同じ文")
+    assert document_key != other_model_key
+    assert set(embedding_cache.get_many([document_key, other_model_key])) == {document_key}
+
+
+def test_local_backend_does_not_use_cache(fake_calls):
+    before = embedding_cache.stats()["entries"]
+    embed_service.embed_texts(["ローカルで計算する文"])
+    assert embedding_cache.stats()["entries"] == before
+    assert fake_calls["embed_requests"] == 0
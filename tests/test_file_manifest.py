@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from app.core import file_manifest
+
+
+def _stat(size, mtime):
+    return os.stat_result((0o100644, 0, 0, 1, 0, 0, size, mtime, mtime, mtime))
+
+
+@pytest.fixture
+def files():
+    """同じサイズ・更新日時を含むファイルの記録を用意する"""
+    for filename in list(file_manifest.get_all()):
+        file_manifest.remove(filename)
+    entries = {
+        f"{prefix}{i:02d}.txt": (i % 3 * 100, 1000.0 + i % 4)
+        for prefix in ("doc_", "faq_")
+        for i in range(10)
+    }
+    for filename, (size, mtime) in entries.items():
+        file_manifest.record(filename, _stat(size, mtime), "0" * 64, 1)
+    yield entries
+    for filename in entries:
+        file_manifest.remove(filename)
+
+
+def _all_pages(limit, **kwargs):
+    records, cursor = file_manifest.list_page(limit=limit, **kwargs)
+    pages = [records]
+    while cursor:
+        records, cursor = file_manifest.list_page(limit=limit, cursor=cursor, **kwargs)
+        pages.append(records)
+    return pages
+
+
+@pytest.mark.parametrize("sort, column", [("modified", "mtime"), ("size", "size"), ("name", "filename")])
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_cover_every_record_once_in_order(files, sort, column, descending):
+    pages = _all_pages(3, sort=sort, descending=descending)
+    assert all(len(page) == 3 for page in pages[:-1])
+    names = [record["filename"] for page in pages for record in page]
+
+    # 同じ値の中はファイル名順（並べ替えの向きに合わせる）
+    def key(name):
+        size, mtime = files[name]
+        return {"filename": (name,), "size": (size, name), "mtime": (mtime, name)}[column]
+
+    assert names == sorted(files, key=key, reverse=descending)
+
+
+def test_prefix_filters_records(files):
+    pages = _all_pages(4, sort="name", descending=False, prefix="faq_")
+    names = [record["filename"] for page in pages for record in page]
+    assert names == sorted(name for name in files if name.startswith("faq_"))
+
+
+def test_last_page_has_no_cursor(files):
+    records, cursor = file_manifest.list_page(limit=len(files))
+    assert len(records) == len(files)
+    assert cursor is None
+
+
+def test_invalid_sort_and_cursor_raise_value_error(files):
+    with pytest.raises(ValueError):
+        file_manifest.list_page(sort="chunks")
+    with pytest.raises(ValueError):
+        file_manifest.list_page(cursor="not-a-cursor")
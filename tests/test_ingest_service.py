@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+
+import pytest
+
+from app.core import file_manifest
+from app.core.chromadb_client import get_collection
+from app.services import ingest_service
+from app.services.embed_service import chunk_hash, split_qa_into_chunks
+from app.services.embedder import HashingEmbedder, set_embedder
+
+
+class GatedEmbedder(HashingEmbedder):
+    """最初の embed 呼び出しを、release されるまで止める"""
+
+    def __init__(self):
+        super().__init__(dim=64)
+        self.entered = threading.Event()
+        self.released = threading.Event()
+
+    def embed(self, texts, task_type="retrieval_document"):
+        self.entered.set()
+        assert self.released.wait(10)
+        return super().embed(texts, task_type)
+
+
+@pytest.fixture
+def gated_embedder():
+    embedder = GatedEmbedder()
+    set_embedder(embedder)
+    yield embedder
+    embedder.released.set()
+    set_embedder(None)
+
+
+def _write(file_path, text):
+    """アップロードと同じく、一時ファイルに書いてから置き換える"""
+    tmp_path = file_path.with_name(f".{file_path.name}.uploading")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, file_path)
+    file_manifest.mark_uploaded(file_path.name, file_path.stat())
+
+
+def _wait(job):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        current = ingest_service.get_job(job["job_id"])
+        if current["status"] in ("completed", "failed"):
+            return current
+        time.sleep(0.01)
+    raise AssertionError(f"ジョブが終わりません: {current}")
+
+
+def _stored_hashes(filename):
+    stored = get_collection().get(where={"document_id": filename[:-4]}, include=["metadatas"])
+    return {metadata["content_hash"] for metadata in stored["metadatas"]}
+
+
+def _hashes(text):
+    return {chunk_hash(chunk["text"]) for chunk in split_qa_into_chunks(text)}
+
+
+def test_later_upload_wins_over_a_running_job(tmp_path, gated_embedder):
+    file_path = tmp_path / "ingest_race.txt"
+    old, new = "古い版の規程です。" * 30, "新しい版の規程です。" * 30
+    _write(file_path, old)
+    first = ingest_service.submit(file_path)
+    assert gated_embedder.entered.wait(10)
+
+    # 登録中に上書きアップロードされても、後のジョブは前のジョブが終わるまで始まらない
+    _write(file_path, new)
+    second = ingest_service.submit(file_path)
+    time.sleep(0.1)
+    assert ingest_service.get_job(second["job_id"])["status"] == "queued"
+    gated_embedder.released.set()
+
+    assert _wait(first)["status"] == "failed"
+    assert _wait(second)["status"] == "completed"
+    assert _stored_hashes(file_path.name) == _hashes(new)
+    assert file_manifest.get(file_path.name)["sha256"] == file_manifest.hash_file(file_path)
+
+    ingest_service.delete_file(file_path)
+
+
+def test_delete_waits_for_the_running_job(tmp_path, gated_embedder):
+    file_path = tmp_path / "ingest_delete.txt"
+    _write(file_path, "削除される文書です。" * 30)
+    job = ingest_service.submit(file_path)
+    assert gated_embedder.entered.wait(10)
+
+    deleting = threading.Thread(target=ingest_service.delete_file, args=(file_path,))
+    deleting.start()
+    time.sleep(0.1)
+    assert file_path.exists()
+    gated_embedder.released.set()
+    deleting.join(10)
+
+    assert _wait(job)["status"] == "completed"
+    assert _stored_hashes(file_path.name) == set()
+    assert file_manifest.get(file_path.name) is None
+
+
+def test_file_removed_during_a_job_is_not_registered(tmp_path, gated_embedder):
+    file_path = tmp_path / "ingest_removed.txt"
+    _write(file_path, "外から削除される文書です。" * 30)
+    job = ingest_service.submit(file_path)
+    assert gated_embedder.entered.wait(10)
+    file_path.unlink()
+    gated_embedder.released.set()
+
+    assert _wait(job)["status"] == "failed"
+    assert _stored_hashes(file_path.name) == set()
+    assert file_manifest.get(file_path.name) is None
+
+
+def test_total_is_estimated_while_running(tmp_path, gated_embedder):
+    file_path = tmp_path / "ingest_progress.txt"
+    _write(file_path, "".join(f"第{i}条は進捗の見積もりを確かめるための文です。" for i in range(300)))
+    job = ingest_service.submit(file_path)
+    assert gated_embedder.entered.wait(10)
+    running = ingest_service.get_job(job["job_id"])
+    gated_embedder.released.set()
+
+    done = _wait(job)
+    assert done["chunks_total"] == done["chunks_embedded"] > 1
+    # 見積もりは実際のチャンク数から大きく外れない
+    assert done["chunks_total"] / 2 <= running["chunks_total"] <= done["chunks_total"] * 2
+
+    ingest_service.delete_file(file_path)
@@ -0,0 +1,95 @@
+import random
+import uuid
+
+import pytest
+
+from app.core.chromadb_client import get_collection
+from app.services import keyword_index
+from app.services.embedder import HashingEmbedder
+
+
+@pytest.fixture
+def index():
+    """検索中のコレクションとキーワードインデックスにチャンクを登録する（テスト後に削除する）"""
+    collection = get_collection()
+    embedder = HashingEmbedder(dim=64)
+    added = {}
+
+    def add(texts, filename=None):
+        filename = filename or f"{uuid.uuid4().hex[:8]}.txt"
+        ids = [f"{filename}_{uuid.uuid4().hex[:8]}" for _ in texts]
+        metadatas = [{"filename": filename, "document_id": filename[:-4]} for _ in texts]
+        keyword_index.ensure_ready()
+        collection.upsert(ids=ids, documents=texts, metadatas=metadatas, embeddings=embedder.embed(texts))
+        keyword_index.update_chunks(ids, texts, metadatas)
+        added.update(zip(ids, texts))
+        return ids
+
+    add.texts = added
+    yield add
+    if added:
+        collection.delete(ids=list(added))
+        keyword_index.remove_chunks(list(added))
+
+
+def _naive(texts, keyword):
+    keyword = keyword.lower()
+    return {chunk_id for chunk_id, text in texts.items() if keyword in text.lower()}
+
+
+def test_long_keyword_matches_only_full_occurrences(index):
+    keyword = "あいうえおかきくけこさしすせそたちつてと"
+    full, = index([f"前置き{keyword}後書き"])
+    index([f"別の文書{keyword[9:]}です" for _ in range(30)])
+    index([f"{keyword[:10]}で終わる文書"])
+
+    assert keyword_index.match_content(keyword) & set(index.texts) == {full}
+
+
+def test_matches_equal_naive_scan(index):
+    rng = random.Random(0)
+    alphabet = "あいうえおアイウabcAB"
+    texts = ["".join(rng.choice(alphabet) for _ in range(rng.randint(5, 80))) for _ in range(200)]
+    index(texts)
+
+    keywords = ["a", "あ", "ab", "Ab"]
+    for text in rng.sample(texts, 40):
+        start = rng.randrange(len(text))
+        keywords.append(text[start:start + rng.randint(2, 30)])
+    keywords += ["".join(rng.choice(alphabet) for _ in range(rng.randint(3, 25))) for _ in range(40)]
+
+    for keyword in keywords:
+        assert keyword_index.match_content(keyword) & set(index.texts) == _naive(index.texts, keyword), keyword
+
+
+def test_update_and_remove_chunks(index):
+    chunk_id, other_id = index(["最初の本文です", "もう一つの本文です"], filename="規程集.txt")
+    assert keyword_index.match_content("最初の本文") == {chunk_id}
+    assert keyword_index.match_filename("規程") >= {chunk_id, other_id}
+
+    # 同じIDは置き換え、削除と合わせて1回で反映する
+    keyword_index.update_chunks(
+        [chunk_id], ["書き換えた本文です"], [{"filename": "規程集.txt"}], removed_ids=[other_id]
+    )
+    assert keyword_index.match_content("最初の本文") == set()
+    assert keyword_index.match_content("書き換えた本文") == {chunk_id}
+    assert keyword_index.match_content("もう一つの本文") == set()
+
+    # ファイルのチャンクが無くなればファイル名でも一致しない
+    keyword_index.remove_chunks([chunk_id])
+    assert keyword_index.match_filename("規程集") == set()
+    keyword_index.update_chunks([chunk_id], ["書き換えた本文です"], [{"filename": "規程集.txt"}])
+
+
+def test_rebuilds_after_format_version_change(index):
+    chunk_id, = index(["作り直しの確認に使う本文です"])
+    conn = keyword_index._connect()
+    with conn:
+        conn.execute("UPDATE meta SET value = value - 1 WHERE key = 'format_version'")
+    # 保存形式の確認はプロセスで最初の1回だけなので、確認前の状態に戻す
+    keyword_index._checked = False
+
+    assert keyword_index.size() == get_collection().count()
+    assert conn.execute("SELECT value FROM meta WHERE key = 'format_version'").fetchone()[0] \
+        == keyword_index._FORMAT_VERSION
+    assert keyword_index.match_content("作り直しの確認") == {chunk_id}
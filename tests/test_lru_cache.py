@@ -0,0 +1,58 @@
+from app.core import lru_cache
+from app.core.lru_cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a を使ったので、次に捨てられるのは b
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_max_bytes_evicts_oldest_and_skips_oversized():
+    cache = LRUCache(10, max_bytes=10, sizeof=lambda key, value: len(value))
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("c", "xxxx")
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 8
+
+    # 1件で上限を超える値は保存しない（既存のエントリも捨てない）
+    cache.put("big", "x" * 11)
+    assert cache.get("big") is None
+    assert cache.get("b") == "xxxx"
+
+
+def test_ttl_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lru_cache.time, "monotonic", lambda: now[0])
+    cache = LRUCache(10, ttl=5)
+    cache.put("a", 1)
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_when_max_entries_is_zero():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_stats_count_hits_and_misses():
+    cache = LRUCache(10)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["hits"] == 1
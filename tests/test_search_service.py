@@ -0,0 +1,71 @@
+import pytest
+
+from app.core.config import RRF_K
+from app.services import keyword_index
+from app.services.generate_service import QA_WITH_ORIGINAL_QUESTION_TEMPLATE, build_prompt, select_template
+from app.services.search_service import fuse_results, merge_results, select_diverse
+
+
+def _candidate(chunk_id, document_id="doc", score=0.0):
+    return {"id": chunk_id, "text": f"{chunk_id} の本文", "metadata": {"document_id": document_id}, "score": score}
+
+
+def test_rrf_sums_reciprocal_ranks_across_lists():
+    vector = [_candidate("a", "d1"), _candidate("b", "d2"), _candidate("c", "d3")]
+    sparse = [[("c", 9.0), ("b", 5.0)], [("b", 1.0)]]
+    results = fuse_results(sparse, vector, top_k=3)
+
+    expected = {
+        "a": 1 / (RRF_K + 1),
+        "b": 1 / (RRF_K + 2) + 1 / (RRF_K + 2) + 1 / (RRF_K + 1),
+        "c": 1 / (RRF_K + 3) + 1 / (RRF_K + 1),
+    }
+    assert [doc["id"] for doc in results] == sorted(expected, key=expected.get, reverse=True)
+    for doc in results:
+        assert doc["score"] == pytest.approx(expected[doc["id"]], abs=1e-6)
+
+
+def test_rrf_uses_rank_not_raw_score():
+    vector = [_candidate("a", "d1", score=100.0), _candidate("b", "d2", score=0.1)]
+    results = fuse_results([[("b", 0.001), ("a", 1000.0)]], vector, top_k=2)
+    # どちらも順位の合計は同じなので、スコアの大小ではなく同点になる
+    assert results[0]["score"] == results[1]["score"]
+
+
+def test_select_diverse_limits_chunks_per_document():
+    docs = [_candidate(f"a{i}", "a") for i in range(4)] + [_candidate("b0", "b"), _candidate("c0", "c")]
+    assert [doc["id"] for doc in select_diverse(docs, top_k=4, max_per_document=2)] == ["a0", "a1", "b0", "c0"]
+    # 0 なら無制限
+    assert [doc["id"] for doc in select_diverse(docs, top_k=4, max_per_document=0)] == ["a0", "a1", "a2", "a3"]
+
+
+def test_select_diverse_skips_duplicate_chunks():
+    docs = [_candidate("a0", "a"), _candidate("a0", "a"), _candidate("a1", "a")]
+    assert [doc["id"] for doc in select_diverse(docs, top_k=5, max_per_document=2)] == ["a0", "a1"]
+
+
+def test_same_chunk_from_keyword_and_vector_search_appears_once():
+    vector = [_candidate("a0", "a", score=30.0), _candidate("b0", "b", score=20.0)]
+    # ファイル名検索の候補は本文を持たない（スコアの低い方は選ばれない）
+    keyword = [{"id": "a0", "text": None, "metadata": {"document_id": "a"}, "score": 10.0}]
+    results = merge_results(keyword, vector, top_k=5)
+    assert [doc["id"] for doc in results] == ["a0", "b0"]
+    assert results[0]["score"] == 30.0
+
+    fused = fuse_results([[("a0", 3.0)], [("a0", 1.0)]], vector, top_k=5)
+    assert [doc["id"] for doc in fused] == ["a0", "b0"]
+
+
+def test_filename_match_qa_chunk_carries_original_question(monkeypatch):
+    text = "質問: 出張費の申請方法は？\n回答: ポータルから申請します。"
+    metadata = {"document_id": "faq", "filename": "faq.txt", "content_type": "qa_pair", "question": "出張費の申請方法は？"}
+    monkeypatch.setattr(keyword_index, "get_chunks", lambda ids: [(chunk_id, text, metadata) for chunk_id in ids])
+
+    keyword = [{"id": "faq_0", "text": None, "metadata": {"document_id": "faq"}, "score": 50.0}]
+    results = merge_results(keyword, [], top_k=5)
+    assert results[0]["text"] == "元の質問: 出張費の申請方法は？\n" + text
+
+    # 元の質問を使うテンプレートが選ばれるなら、文脈にも元の質問が入っている
+    prompt = build_prompt(results, "出張費は？")
+    assert select_template(results) == QA_WITH_ORIGINAL_QUESTION_TEMPLATE
+    assert "元の質問: 出張費の申請方法は？" in prompt